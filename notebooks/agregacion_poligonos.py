@@ -0,0 +1,216 @@
+"""
+Motor de agregación por polígono basado en códigos enteros
+
+Sustituye los groupby con lambdas por conteos vectorizados: cada dimensión
+(severidad, categoría, parte del día, día de la semana) se codifica a enteros
+y el conteo polígono × valor se obtiene con un solo np.bincount sobre el
+código combinado. El resultado son matrices densas (DataFrames anchos con
+índice CVE_COL y una columna por valor de la dimensión), que se pueden apilar
+en una tabla larga (CVE_COL, dimension, valor, incidentes) para exportar.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Órdenes canónicos (los valores no listados se agregan al final, ordenados)
+ORDEN_SEVERIDAD = ['ALTA', 'MEDIA', 'BAJA']
+ORDEN_PARTE_DIA = ['Madrugada', 'Mañana', 'Tarde', 'Noche']
+ORDEN_DIA_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+# nombre de la matriz → (columna de incidentes, orden canónico)
+DIMENSIONES = {
+    'severidad': ('Nivel_Severidad', ORDEN_SEVERIDAD),
+    'categoria': ('Categoria_Incidente', None),
+    'parte_dia': ('ParteDelDia', ORDEN_PARTE_DIA),
+    'dia_semana': ('DiaDeLaSemana', ORDEN_DIA_SEMANA),
+}
+
+
+def codificar(valores, orden=None):
+    """
+    Codificar una columna a enteros 0..k-1 (-1 para nulos)
+
+    Returns:
+        (codigos, etiquetas): array int64 y pd.Index con la etiqueta de cada código
+    """
+    codigos, etiquetas = pd.factorize(pd.Series(valores), sort=True)
+    if orden is not None:
+        extra = [e for e in etiquetas if e not in orden]
+        etiquetas_finales = pd.Index([e for e in orden] + extra)
+        remapeo = etiquetas_finales.get_indexer(etiquetas)
+        codigos = np.where(codigos >= 0, remapeo[np.maximum(codigos, 0)], -1)
+        etiquetas = etiquetas_finales
+    return codigos.astype(np.int64), pd.Index(etiquetas)
+
+
+def conteo_matriz(cod_fila, n_filas, cod_col, n_cols, pesos=None):
+    """Matriz densa (n_filas × n_cols) de conteos; ignora códigos negativos"""
+    validos = (cod_fila >= 0) & (cod_col >= 0)
+    combinado = cod_fila[validos] * n_cols + cod_col[validos]
+    w = None if pesos is None else np.asarray(pesos)[validos]
+    conteo = np.bincount(combinado, weights=w, minlength=n_filas * n_cols)
+    if pesos is None:
+        conteo = conteo.astype(np.int64)
+    return conteo.reshape(n_filas, n_cols)
+
+
+def codigos_poligono(incidentes, cve_poligonos):
+    """Posición de cada incidente en la lista de polígonos (-1 si no está)"""
+    return pd.Index(cve_poligonos).get_indexer(incidentes['CVE_COL'])
+
+
+def matrices_por_poligono(incidentes, cve_poligonos, dimensiones=DIMENSIONES, cod_pol=None, pesos=None):
+    """
+    Matrices densas de conteo polígono × valor para cada dimensión
+
+    Args:
+        incidentes: DataFrame con CVE_COL y las columnas de las dimensiones
+        cve_poligonos: CVE_COL de todos los polígonos (define las filas)
+        dimensiones: dict nombre → (columna, orden canónico)
+        pesos: conteo por fila (p.ej. la columna 'incidentes' de un cubo
+            pre-agregado); None cuenta una vez cada fila
+
+    Returns:
+        dict nombre → DataFrame (índice CVE_COL, una columna por valor)
+    """
+    idx = pd.Index(cve_poligonos, name='CVE_COL')
+    if cod_pol is None:
+        cod_pol = codigos_poligono(incidentes, idx)
+
+    matrices = {}
+    for nombre, (columna, orden) in dimensiones.items():
+        if columna not in incidentes.columns:
+            continue
+        cod, etiquetas = codificar(incidentes[columna], orden)
+        matriz = conteo_matriz(cod_pol, len(idx), cod, len(etiquetas), pesos)
+        if pesos is not None:
+            matriz = np.rint(matriz).astype(np.int64)
+        matrices[nombre] = pd.DataFrame(matriz, index=idx, columns=etiquetas.rename(columna))
+    return matrices
+
+
+def conteos_por_poligono(incidentes, cve_poligonos):
+    """
+    Métricas base por polígono + matrices de conteo, sin lambdas por grupo
+
+    Returns:
+        (base, matrices): base es un DataFrame con índice CVE_COL y columnas
+        total_incidentes, incidentes_fin_semana, incidentes_quincena,
+        fecha_inicio, fecha_fin; matrices como en matrices_por_poligono
+    """
+    idx = pd.Index(cve_poligonos, name='CVE_COL')
+    n = len(idx)
+    cod_pol = codigos_poligono(incidentes, idx)
+    validos = cod_pol >= 0
+    cod_validos = cod_pol[validos]
+
+    def suma(columna):
+        pesos = pd.to_numeric(incidentes[columna], errors='coerce').fillna(0).to_numpy(dtype=float)
+        return np.bincount(cod_validos, weights=pesos[validos], minlength=n).astype(np.int64)
+
+    base = pd.DataFrame(index=idx)
+    base['total_incidentes'] = np.bincount(
+        cod_validos,
+        weights=incidentes['TIPO DE INCIDENTE'].notna().to_numpy()[validos],
+        minlength=n
+    ).astype(np.int64)
+    if 'EsFinDeSemana' in incidentes.columns:
+        base['incidentes_fin_semana'] = suma('EsFinDeSemana')
+    if 'EsQuincena' in incidentes.columns:
+        base['incidentes_quincena'] = suma('EsQuincena')
+
+    # Fechas extremas: groupby sobre códigos enteros (agregación cythonizada)
+    fechas = pd.Series(incidentes['Timestamp'].to_numpy()[validos]).groupby(cod_validos).agg(['min', 'max'])
+    base['fecha_inicio'] = fechas['min'].reindex(range(n)).to_numpy()
+    base['fecha_fin'] = fechas['max'].reindex(range(n)).to_numpy()
+
+    matrices = matrices_por_poligono(incidentes, idx, cod_pol=cod_pol)
+    return base, matrices
+
+
+def conteos_desde_cubo(cubo, cve_poligonos):
+    """
+    Mismo resultado que conteos_por_poligono, sumando las particiones de un
+    cubo pre-agregado (ver agregados_mensuales) en lugar de incidentes sueltos
+    """
+    idx = pd.Index(cve_poligonos, name='CVE_COL')
+    n = len(idx)
+    cod_pol = codigos_poligono(cubo, idx)
+    validos = cod_pol >= 0
+    cod_validos = cod_pol[validos]
+
+    def suma(columna):
+        pesos = cubo[columna].to_numpy(dtype=float)[validos]
+        return np.rint(np.bincount(cod_validos, weights=pesos, minlength=n)).astype(np.int64)
+
+    base = pd.DataFrame(index=idx)
+    # Como en conteos_por_poligono: solo incidentes con TIPO DE INCIDENTE
+    base['total_incidentes'] = suma('con_tipo')
+    base['incidentes_fin_semana'] = suma('fin_semana')
+    base['incidentes_quincena'] = suma('quincena')
+
+    fecha_min = pd.Series(cubo['fecha_min'].to_numpy()[validos]).groupby(cod_validos).min()
+    fecha_max = pd.Series(cubo['fecha_max'].to_numpy()[validos]).groupby(cod_validos).max()
+    base['fecha_inicio'] = fecha_min.reindex(range(n)).to_numpy()
+    base['fecha_fin'] = fecha_max.reindex(range(n)).to_numpy()
+
+    matrices = matrices_por_poligono(cubo, idx, cod_pol=cod_pol, pesos=cubo['incidentes'].to_numpy())
+    return base, matrices
+
+
+def recientes_por_poligono(incidentes, cve_poligonos, dias=30):
+    """
+    Incidentes de los últimos `dias` días de cada polígono, contados desde
+    su incidente más reciente (una sola pasada; arreglo alineado con
+    cve_poligonos)
+    """
+    idx = pd.Index(cve_poligonos, name='CVE_COL')
+    n = len(idx)
+    cod_pol = codigos_poligono(incidentes, idx)
+    ts = pd.to_datetime(incidentes['Timestamp'])
+    validos = (cod_pol >= 0) & ts.notna().to_numpy()
+    cod = cod_pol[validos]
+    ns = ts.to_numpy().astype('datetime64[ns]').view(np.int64)[validos]
+
+    ultimo = np.full(n, np.iinfo(np.int64).min)
+    np.maximum.at(ultimo, cod, ns)
+    recientes = ns >= ultimo[cod] - pd.Timedelta(days=dias).value
+    return np.bincount(cod[recientes], minlength=n)
+
+
+def a_formato_largo(matrices):
+    """
+    Apilar matrices de conteo en una tabla larga columnar
+
+    Returns:
+        DataFrame con columnas CVE_COL, dimension, valor, incidentes
+        (solo conteos > 0, ordenado por CVE_COL, dimensión y conteo descendente)
+    """
+    partes = []
+    for nombre, matriz in matrices.items():
+        valores = matriz.to_numpy()
+        fila, col = np.nonzero(valores)
+        partes.append(pd.DataFrame({
+            'CVE_COL': matriz.index.to_numpy()[fila],
+            'dimension': nombre,
+            'valor': np.asarray(matriz.columns, dtype=object)[col],
+            'incidentes': valores[fila, col],
+        }))
+    if not partes:
+        return pd.DataFrame(columns=['CVE_COL', 'dimension', 'valor', 'incidentes'])
+    largo = pd.concat(partes, ignore_index=True)
+    largo = largo.sort_values(['CVE_COL', 'dimension', 'incidentes'],
+                              ascending=[True, True, False], kind='stable')
+    return largo.reset_index(drop=True)
+
+
+def top_por_poligono(desglose, dimension, n=3):
+    """{CVE_COL: [(valor, incidentes), ...]} con los n valores más frecuentes de una dimensión"""
+    sub = desglose[desglose['dimension'] == dimension]
+    sub = sub.sort_values(['CVE_COL', 'incidentes'], ascending=[True, False], kind='stable')
+    sub = sub.groupby('CVE_COL', sort=False).head(n)
+    top = {}
+    for cve, valor, incidentes in zip(sub['CVE_COL'], sub['valor'], sub['incidentes']):
+        top.setdefault(cve, []).append((valor, int(incidentes)))
+    return top
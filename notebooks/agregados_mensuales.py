@@ -0,0 +1,208 @@
+"""
+Agregados mensuales materializados por polígono
+
+Recalcular las métricas de cada polígono a partir de todo el historial de
+incidentes en cada ejecución es trabajo repetido: los meses cerrados no
+cambian. Este módulo materializa un cubo de conteos por
+
+    (CVE_COL, anio_mes, Categoria_Incidente, Nivel_Severidad, ParteDelDia, DiaDeLaSemana)
+
+con una partición Parquet por mes en data/interim/agregados_mensuales/:
+
+    - anio_mes=YYYYMM.parquet   conteos del mes (incidentes, con_tipo,
+                                fin_semana, quincena, fecha_min, fecha_max)
+    - meta.json                 versión de las entradas y huella por mes
+
+Cada mes se identifica por una huella de su contenido (hash de las filas que
+entran al cubo, independiente del orden): en cada ejecución solo se recalculan
+los meses nuevos y aquellos cuyos incidentes cambiaron (altas, bajas o
+reclasificaciones, aunque el número de filas sea el mismo); el resto se lee de
+disco.
+
+Costo: lo que se ahorra es la agregación (proporcional a los meses que
+cambiaron). La huella sí recorre todas las filas del historial en cada
+ejecución (~0.05 s por 200k incidentes), y unificar_datos_poligonos carga y
+une espacialmente el historial completo antes de llegar aquí, porque también
+publica la tabla completa de incidentes. Una ejecución sigue siendo
+O(historial), aunque con una constante mucho menor que reagregar todo. Para
+saltar meses sin leer sus filas haría falta que el CSV interim estuviera
+particionado por mes. Las métricas por polígono
+(total_incidentes, severidad, fechas extremas, desglose) se obtienen sumando
+particiones con agregacion_poligonos.conteos_desde_cubo.
+
+Requiere pyarrow; sin pyarrow el cubo se recalcula completo en memoria.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from almacen_poligonos import cargar_almacen, version_fuente
+
+
+project_root = Path(__file__).parent.parent
+AGREGADOS_DIR = project_root / 'data' / 'interim' / 'agregados_mensuales'
+
+# Dimensiones del cubo (además de CVE_COL y anio_mes)
+DIMENSIONES_CUBO = ['Categoria_Incidente', 'Nivel_Severidad', 'ParteDelDia', 'DiaDeLaSemana']
+
+# Columnas de los incidentes que determinan el contenido del cubo
+COLUMNAS_HUELLA = ['CVE_COL', 'Timestamp', 'TIPO DE INCIDENTE'] + DIMENSIONES_CUBO + ['EsFinDeSemana', 'EsQuincena']
+
+# Entradas que determinan el CVE_COL de cada incidente y las definiciones de
+# categoría/severidad (si cambian, se reconstruye todo). Los cambios en los
+# propios incidentes se detectan mes a mes con huella_por_mes.
+ENTRADAS_VERSION = [
+    project_root / 'data' / 'processed' / 'mapeo_colonias_reportes_911.csv',
+    project_root / 'data' / 'processed' / 'colonias_reportes_911_con_coordenadas.csv',
+    Path(__file__).parent / 'make_interim_data.py',
+]
+
+# Cambiar si cambia el esquema de las particiones o el cálculo de la huella
+FORMATO_AGREGADOS = 3
+
+
+def version_agregados(entradas=ENTRADAS_VERSION):
+    """Huella combinada del almacén de polígonos + mapeo + coordenadas + reglas de categorización"""
+    h = hashlib.sha1(f'{FORMATO_AGREGADOS}:{cargar_almacen().version}'.encode())
+    for ruta in entradas:
+        if Path(ruta).exists():
+            h.update(version_fuente(ruta).encode())
+    return h.hexdigest()
+
+
+def clave_mes(timestamps):
+    """Clave entera YYYYMM por incidente (0 si no tiene fecha)"""
+    ts = pd.to_datetime(timestamps)
+    return (ts.dt.year * 100 + ts.dt.month).fillna(0).to_numpy(dtype=np.int64)
+
+
+def huella_por_mes(incidentes, meses):
+    """
+    Huella del contenido de cada mes: suma (módulo 2**64) del hash de cada fila
+    sobre COLUMNAS_HUELLA, de modo que no depende del orden de las filas
+
+    Returns:
+        dict {mes (str): huella hexadecimal}
+    """
+    columnas = [c for c in COLUMNAS_HUELLA if c in incidentes.columns]
+    filas = pd.util.hash_pandas_object(incidentes[columnas], index=False).to_numpy(dtype=np.uint64)
+    orden = np.argsort(meses, kind='stable')
+    meses_ordenados = meses[orden]
+    unicos, inicios = np.unique(meses_ordenados, return_index=True)
+    sumas = np.add.reduceat(filas[orden], inicios) if len(filas) else np.array([], dtype=np.uint64)
+    conteos = np.diff(np.append(inicios, len(meses_ordenados)))
+    return {str(int(m)): f'{int(n)}:{int(s):016x}' for m, n, s in zip(unicos, conteos, sumas)}
+
+
+def agregar_mensual(incidentes):
+    """
+    Cubo de conteos para un conjunto de incidentes (típicamente un mes)
+
+    Returns:
+        DataFrame con CVE_COL, anio_mes, DIMENSIONES_CUBO y las métricas
+        incidentes (filas), con_tipo (filas con TIPO DE INCIDENTE, la base
+        de total_incidentes), fin_semana, quincena, fecha_min, fecha_max
+    """
+    dims = [c for c in DIMENSIONES_CUBO if c in incidentes.columns]
+    datos = pd.DataFrame({
+        'CVE_COL': incidentes['CVE_COL'].to_numpy(),
+        'anio_mes': clave_mes(incidentes['Timestamp']),
+        'Timestamp': pd.to_datetime(incidentes['Timestamp']).to_numpy(),
+    })
+    for columna in dims:
+        datos[columna] = incidentes[columna].to_numpy()
+    if 'TIPO DE INCIDENTE' in incidentes.columns:
+        datos['con_tipo'] = incidentes['TIPO DE INCIDENTE'].notna().to_numpy(dtype=np.int64)
+    else:
+        datos['con_tipo'] = 1
+    for columna, destino in [('EsFinDeSemana', 'fin_semana'), ('EsQuincena', 'quincena')]:
+        if columna in incidentes.columns:
+            datos[destino] = pd.to_numeric(incidentes[columna], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+        else:
+            datos[destino] = 0
+
+    cubo = datos.groupby(['CVE_COL', 'anio_mes'] + dims, dropna=False, sort=True).agg(
+        incidentes=('Timestamp', 'size'),
+        con_tipo=('con_tipo', 'sum'),
+        fin_semana=('fin_semana', 'sum'),
+        quincena=('quincena', 'sum'),
+        fecha_min=('Timestamp', 'min'),
+        fecha_max=('Timestamp', 'max'),
+    )
+    return cubo.reset_index()
+
+
+def _ruta_particion(directorio, mes):
+    return Path(directorio) / f'anio_mes={int(mes)}.parquet'
+
+
+def actualizar_agregados(incidentes, version=None, directorio=AGREGADOS_DIR, reconstruir=False):
+    """
+    Fusionar los meses nuevos (o modificados) en el cubo materializado
+
+    Solo se agregan los meses cuya huella cambió; calcular las huellas recorre
+    todas las filas de `incidentes` (ver la nota de costo del módulo).
+
+    Args:
+        incidentes: incidentes con CVE_COL válido (todo el historial disponible)
+        version: huella de las entradas (ver version_agregados); si difiere de
+            la materializada se reconstruyen todas las particiones
+        reconstruir: forzar el recálculo de todos los meses
+
+    Returns:
+        cubo completo (concatenación de todas las particiones)
+    """
+    directorio = Path(directorio)
+    meta_path = directorio / 'meta.json'
+    meses = clave_mes(incidentes['Timestamp'])
+    huellas_actuales = huella_por_mes(incidentes, meses)
+
+    meta = {}
+    if not reconstruir and meta_path.exists():
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+        if meta.get('version') != version:
+            meta = {}
+    huellas_guardadas = meta.get('huella_por_mes', {})
+
+    pendientes = [
+        mes for mes, huella in huellas_actuales.items()
+        if huellas_guardadas.get(mes) != huella
+        or not _ruta_particion(directorio, mes).exists()
+    ]
+    print(f"   Meses en el historial: {len(huellas_actuales):,} "
+          f"(a recalcular: {len(pendientes):,}, reutilizados: {len(huellas_actuales) - len(pendientes):,})")
+
+    particiones = {}
+    if pendientes:
+        mascara = np.isin(meses, [int(m) for m in pendientes])
+        nuevos = agregar_mensual(incidentes[mascara])
+        for mes, cubo_mes in nuevos.groupby('anio_mes', sort=True):
+            particiones[str(int(mes))] = cubo_mes.reset_index(drop=True)
+
+    try:
+        for mes in huellas_actuales:
+            if mes not in particiones:
+                particiones[mes] = pd.read_parquet(_ruta_particion(directorio, mes))
+        directorio.mkdir(parents=True, exist_ok=True)
+        for mes in pendientes:
+            particiones[mes].to_parquet(_ruta_particion(directorio, mes), index=False)
+        # Meses que ya no están en el historial
+        for mes in set(huellas_guardadas) - set(huellas_actuales):
+            _ruta_particion(directorio, mes).unlink(missing_ok=True)
+        meta = {'version': version, 'huella_por_mes': huellas_actuales}
+        meta_path.write_text(json.dumps(meta, indent=2), encoding='utf-8')
+    except ImportError:
+        print("   ADVERTENCIA: pyarrow no disponible, agregados mensuales no persistidos")
+        faltantes = [int(m) for m in huellas_actuales if m not in particiones]
+        if faltantes:
+            resto = agregar_mensual(incidentes[np.isin(meses, faltantes)])
+            for mes, cubo_mes in resto.groupby('anio_mes', sort=True):
+                particiones[str(int(mes))] = cubo_mes.reset_index(drop=True)
+
+    if not particiones:
+        return agregar_mensual(incidentes.iloc[:0])
+    return pd.concat([particiones[m] for m in sorted(particiones, key=int)], ignore_index=True)
@@ -0,0 +1,291 @@
+"""
+Almacén persistente de polígonos de colonias (INE)
+
+Parsear el WKT de poligonos_hermosillo.csv y construir un índice espacial en
+cada script es trabajo repetido. Este módulo lo hace una sola vez por versión
+del CSV fuente y guarda en data/interim/poligonos/:
+
+    - poligonos.parquet   GeoParquet (geometrías en WKB + atributos)
+    - indice_grid.npz     índice espacial de malla regular (CSR celda → polígonos)
+    - geometria.parquet   área proyectada (km², EPSG:32612), centroide, punto
+                          representativo y bounding box de cada polígono
+    - meta.json           versión (sha1 del CSV fuente) y parámetros del índice
+
+Todos los scripts comparten la API por lotes:
+
+    almacen = cargar_almacen()
+    cve_col = almacen.locate(puntos)          # un CVE_COL por punto (nulo si ninguno)
+    idx_pt, idx_pol = almacen.localizar_pares(x, y)   # todas las coincidencias
+    area = almacen.geometria_por_cve(cves)['area_km2']  # sin reproyectar
+
+Requiere pyarrow para el GeoParquet; sin pyarrow se parsea el WKT en cada
+ejecución (mismo resultado, sin caché).
+"""
+
+from functools import lru_cache
+import hashlib
+import json
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+
+project_root = Path(__file__).parent.parent
+POLIGONOS_CSV = project_root / 'data' / 'raw' / 'poligonos_hermosillo.csv'
+ALMACEN_DIR = project_root / 'data' / 'interim' / 'poligonos'
+
+# Celdas por eje de la malla del índice (64x64 ≈ 4k celdas para ~700 polígonos)
+CELDAS_POR_EJE = 64
+
+# CRS métrico para áreas (UTM zona 12N, Hermosillo)
+CRS_METRICO = 'EPSG:32612'
+
+
+def version_fuente(fuente):
+    """Huella (sha1) del CSV fuente; cambia si cambian los polígonos"""
+    h = hashlib.sha1()
+    with open(fuente, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def leer_poligonos_csv(fuente=POLIGONOS_CSV):
+    """Leer poligonos_hermosillo.csv y convertir WKT a geometría (vectorizado)"""
+    poligonos = pd.read_csv(fuente)
+
+    # Detectar columna WKT y convertir a geometría (acepta 'POLIGONO_WKT' o 'geometry')
+    if 'POLIGONO_WKT' in poligonos.columns:
+        wkt_col = 'POLIGONO_WKT'
+    elif 'geometry' in poligonos.columns:
+        wkt_col = 'geometry'
+    else:
+        raise KeyError("No WKT column found in poligonos_hermosillo.csv (expected 'POLIGONO_WKT' or 'geometry')")
+
+    geometrias = shapely.from_wkt(poligonos[wkt_col].to_numpy())
+    return gpd.GeoDataFrame(
+        poligonos.drop(columns=[wkt_col]),
+        geometry=gpd.GeoSeries(geometrias, index=poligonos.index, crs='EPSG:4326'),
+    )
+
+
+def construir_indice_grid(geometrias, celdas=CELDAS_POR_EJE):
+    """
+    Construir índice de malla regular sobre los bounding boxes de los polígonos.
+
+    Returns:
+        dict con 'bounds' (minx, miny, maxx, maxy), 'celdas' (nx, ny),
+        'offsets' (CSR, n_celdas + 1) y 'poligonos' (posiciones por celda)
+    """
+    cajas = shapely.bounds(geometrias)
+    minx, miny = cajas[:, 0].min(), cajas[:, 1].min()
+    maxx, maxy = cajas[:, 2].max(), cajas[:, 3].max()
+    dx = (maxx - minx) / celdas
+    dy = (maxy - miny) / celdas
+
+    ix0 = np.clip(((cajas[:, 0] - minx) / dx).astype(np.int64), 0, celdas - 1)
+    ix1 = np.clip(((cajas[:, 2] - minx) / dx).astype(np.int64), 0, celdas - 1)
+    iy0 = np.clip(((cajas[:, 1] - miny) / dy).astype(np.int64), 0, celdas - 1)
+    iy1 = np.clip(((cajas[:, 3] - miny) / dy).astype(np.int64), 0, celdas - 1)
+
+    celda_lista, poligono_lista = [], []
+    for pos in range(len(cajas)):
+        xs = np.arange(ix0[pos], ix1[pos] + 1)
+        ys = np.arange(iy0[pos], iy1[pos] + 1)
+        ids = (ys[:, None] * celdas + xs[None, :]).ravel()
+        celda_lista.append(ids)
+        poligono_lista.append(np.full(len(ids), pos, dtype=np.int32))
+
+    celda = np.concatenate(celda_lista)
+    poligono = np.concatenate(poligono_lista)
+    # Orden estable: dentro de cada celda, polígonos en su orden original
+    orden = np.argsort(celda, kind='stable')
+    conteo = np.bincount(celda, minlength=celdas * celdas)
+
+    return {
+        'bounds': np.array([minx, miny, maxx, maxy]),
+        'celdas': np.array([celdas, celdas]),
+        'offsets': np.concatenate([[0], np.cumsum(conteo)]).astype(np.int64),
+        'poligonos': poligono[orden],
+    }
+
+
+def calcular_geometria(gdf):
+    """
+    Atributos geométricos por polígono (una fila por polígono, mismo orden que gdf)
+
+    Returns:
+        DataFrame con area_km2 (proyectada a CRS_METRICO), centroide_x/y y
+        punto_x/y (punto representativo) en EPSG:4326, y minx/miny/maxx/maxy
+    """
+    geometrias = np.asarray(gdf.geometry.values)
+    area_km2 = gdf.geometry.to_crs(CRS_METRICO).area.to_numpy() / 1e6
+    centroides = shapely.centroid(geometrias)
+    puntos = shapely.point_on_surface(geometrias)
+    cajas = shapely.bounds(geometrias)
+    col_cve = 'CVE_COL' if 'CVE_COL' in gdf.columns else 'cve_col'
+    return pd.DataFrame({
+        col_cve: gdf[col_cve].to_numpy(),
+        'area_km2': area_km2,
+        'centroide_x': shapely.get_x(centroides),
+        'centroide_y': shapely.get_y(centroides),
+        'punto_x': shapely.get_x(puntos),
+        'punto_y': shapely.get_y(puntos),
+        'minx': cajas[:, 0],
+        'miny': cajas[:, 1],
+        'maxx': cajas[:, 2],
+        'maxy': cajas[:, 3],
+    })
+
+
+def _coordenadas(puntos):
+    """Aceptar (x, y), GeoSeries/array de Points o DataFrame con LONGITUD/LATITUD"""
+    if isinstance(puntos, tuple) and len(puntos) == 2:
+        x, y = puntos
+        return np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if isinstance(puntos, pd.DataFrame) and not isinstance(puntos, gpd.GeoDataFrame):
+        return puntos['LONGITUD'].to_numpy(dtype=float), puntos['LATITUD'].to_numpy(dtype=float)
+    if isinstance(puntos, gpd.GeoDataFrame):
+        puntos = puntos.geometry
+    geoms = np.asarray(puntos.values if hasattr(puntos, 'values') else puntos)
+    return shapely.get_x(geoms), shapely.get_y(geoms)
+
+
+class AlmacenPoligonos:
+    """Polígonos + índice espacial persistido, con búsqueda de puntos por lotes"""
+
+    def __init__(self, gdf, indice, version=None, geometria=None):
+        self.gdf = gdf
+        self.indice = indice
+        self.version = version
+        self.geometria = calcular_geometria(gdf) if geometria is None else geometria
+        self.geometrias = np.asarray(gdf.geometry.values)
+        shapely.prepare(self.geometrias)
+
+    @property
+    def col_cve(self):
+        return 'CVE_COL' if 'CVE_COL' in self.gdf.columns else 'cve_col'
+
+    @classmethod
+    def cargar(cls, fuente=POLIGONOS_CSV, directorio=ALMACEN_DIR, reconstruir=False):
+        """
+        Cargar el almacén desde disco; reconstruirlo si falta o si cambió el CSV fuente
+        """
+        fuente, directorio = Path(fuente), Path(directorio)
+        version = version_fuente(fuente)
+        meta_path = directorio / 'meta.json'
+        parquet_path = directorio / 'poligonos.parquet'
+        indice_path = directorio / 'indice_grid.npz'
+        geometria_path = directorio / 'geometria.parquet'
+
+        if not reconstruir and meta_path.exists() and parquet_path.exists() and indice_path.exists():
+            meta = json.loads(meta_path.read_text(encoding='utf-8'))
+            if meta.get('version') == version:
+                try:
+                    gdf = gpd.read_parquet(parquet_path)
+                    with np.load(indice_path) as npz:
+                        indice = {k: npz[k] for k in npz.files}
+                    if geometria_path.exists():
+                        return cls(gdf, indice, version, pd.read_parquet(geometria_path))
+                    # Almacén anterior sin atributos geométricos: calcularlos una vez
+                    almacen = cls(gdf, indice, version)
+                    almacen.geometria.to_parquet(geometria_path, index=False)
+                    return almacen
+                except ImportError:
+                    pass
+
+        print(f"   Construyendo almacén de polígonos desde {fuente.name}...")
+        gdf = leer_poligonos_csv(fuente)
+        indice = construir_indice_grid(np.asarray(gdf.geometry.values))
+        almacen = cls(gdf, indice, version)
+        almacen.guardar(directorio)
+        return almacen
+
+    def guardar(self, directorio=ALMACEN_DIR):
+        """Persistir GeoParquet + índice + metadatos"""
+        directorio = Path(directorio)
+        directorio.mkdir(parents=True, exist_ok=True)
+        try:
+            self.gdf.to_parquet(directorio / 'poligonos.parquet', index=False)
+        except ImportError:
+            print("   ADVERTENCIA: pyarrow no disponible, almacén de polígonos no persistido")
+            return
+        np.savez(directorio / 'indice_grid.npz', **self.indice)
+        self.geometria.to_parquet(directorio / 'geometria.parquet', index=False)
+        meta = {
+            'version': self.version,
+            'n_poligonos': int(len(self.gdf)),
+            'celdas': self.indice['celdas'].tolist(),
+            'bounds': self.indice['bounds'].tolist(),
+        }
+        (directorio / 'meta.json').write_text(json.dumps(meta, indent=2), encoding='utf-8')
+
+    def localizar_pares(self, x, y):
+        """
+        Todas las parejas (punto, polígono) con el punto estrictamente dentro del polígono
+        (mismo predicado que sjoin(predicate='within')).
+
+        Returns:
+            (idx_punto, idx_poligono): arrays de posiciones, ordenados por punto y,
+            dentro de cada punto, por el orden original de los polígonos
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        minx, miny, maxx, maxy = self.indice['bounds']
+        nx, ny = self.indice['celdas']
+        offsets = self.indice['offsets']
+
+        dentro = (x >= minx) & (x <= maxx) & (y >= miny) & (y <= maxy)
+        pts = np.flatnonzero(dentro)
+        ix = np.clip(((x[pts] - minx) / ((maxx - minx) / nx)).astype(np.int64), 0, nx - 1)
+        iy = np.clip(((y[pts] - miny) / ((maxy - miny) / ny)).astype(np.int64), 0, ny - 1)
+        celda = iy * nx + ix
+
+        # Expandir candidatos de cada punto (rango CSR de su celda)
+        inicio = offsets[celda]
+        conteo = offsets[celda + 1] - inicio
+        idx_punto = np.repeat(pts, conteo)
+        desplazamiento = np.arange(conteo.sum()) - np.repeat(np.cumsum(conteo) - conteo, conteo)
+        idx_poligono = self.indice['poligonos'][np.repeat(inicio, conteo) + desplazamiento]
+
+        ok = shapely.contains_xy(self.geometrias[idx_poligono], x[idx_punto], y[idx_punto])
+        return idx_punto[ok], idx_poligono[ok].astype(np.int64)
+
+    def localizar_indices(self, puntos):
+        """Posición del primer polígono que contiene cada punto (-1 si ninguno)"""
+        x, y = _coordenadas(puntos)
+        idx_punto, idx_poligono = self.localizar_pares(x, y)
+        resultado = np.full(len(x), -1, dtype=np.int64)
+        # Asignar en orden inverso para que gane la primera coincidencia de cada punto
+        resultado[idx_punto[::-1]] = idx_poligono[::-1]
+        return resultado
+
+    def locate(self, puntos):
+        """
+        CVE_COL del polígono que contiene cada punto (nulo si ninguno), con el
+        tipo de la columna original: las claves enteras se devuelven como Int64
+        (sin pasar por float) y las de texto como texto.
+
+        Args:
+            puntos: (x, y), GeoSeries/array de Points o DataFrame con LONGITUD/LATITUD
+        """
+        pos = self.localizar_indices(puntos)
+        cve = self.gdf[self.col_cve]
+        if pd.api.types.is_integer_dtype(cve.dtype):
+            cve = cve.astype('Int64')
+        return cve.array.take(pos, allow_fill=True)
+
+    localizar = locate
+
+    def geometria_por_cve(self, cves):
+        """Atributos geométricos (ver calcular_geometria) alineados a una secuencia de CVE_COL"""
+        return self.geometria.set_index(self.col_cve).reindex(np.asarray(cves))
+
+
+@lru_cache(maxsize=4)
+def cargar_almacen(fuente=POLIGONOS_CSV, directorio=ALMACEN_DIR):
+    """Almacén compartido por proceso (el runner del pipeline lo carga una sola vez)"""
+    return AlmacenPoligonos.cargar(fuente, directorio)
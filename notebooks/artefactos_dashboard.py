@@ -0,0 +1,160 @@
+"""
+Artefactos precalculados del dashboard en data/processed/unificado/dashboard/
+
+El dashboard solo consulta el cubo de conteos (cubo_incidentes) y los
+índices por dimensión (indice_incidentes). Ambos se guardan como arreglos
+NumPy columnares (un .npy por arreglo) más meta.json con la tabla de días,
+las etiquetas y la tabla de ubicaciones:
+
+    - meta.json                     versión, subdirectorio vigente, días, etiquetas, ubicaciones
+    - <generación>/cubo_<campo>.npy     celdas del cubo (ubicacion, dia, hora, ..., conteo)
+    - <generación>/indice_<campo>.npy   códigos, órdenes y offsets del índice
+
+Cada reconstrucción escribe sus arreglos en un subdirectorio nuevo y al final
+reemplaza meta.json de forma atómica (os.replace) para apuntar a él. Nunca se
+sobrescribe un .npy que un dashboard en ejecución tenga mapeado: los procesos
+que ya arrancaron siguen leyendo la generación anterior y los nuevos toman la
+nueva. Las generaciones anteriores se borran después (en POSIX el borrado no
+invalida los mapeos abiertos; si el sistema lo impide, se dejan).
+
+Al arrancar se abren con np.load(mmap_mode='r'): no se lee ni expande la
+tabla de incidentes, las páginas se cargan bajo demanda y varios procesos
+comparten la misma copia en la caché de páginas del sistema operativo.
+
+Se regeneran si cambia la versión de los incidentes unificados, una huella
+del contenido de los archivos (no de su fecha de modificación: copiarlos o
+tocarlos no obliga a reconstruir); unificar_datos_poligonos.py los
+reconstruye al final del pipeline. Si ningún incidente tiene fecha, la tabla
+de días queda vacía.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from almacen_poligonos import version_fuente
+from cubo_incidentes import COLUMNAS_UBICACION, CuboIncidentes
+from datos_unificados import INCIDENTES, UNIFICADO_DIR, cargar_incidentes_unificados
+from indice_incidentes import IndiceIncidentes
+
+
+# Se incrementa cuando cambia la codificación de los arreglos (p. ej. día/hora
+# -1 para incidentes sin fecha): invalida los artefactos guardados
+FORMATO_ARTEFACTOS = 2
+
+
+def directorio_artefactos(data_dir=UNIFICADO_DIR):
+    return Path(data_dir) / 'dashboard'
+
+
+def version_incidentes(data_dir=UNIFICADO_DIR):
+    """Huella del contenido de los incidentes unificados (hechos + diccionarios, o CSV) y del formato"""
+    data_dir = Path(data_dir)
+    h = hashlib.sha1()
+    for ruta in sorted(data_dir.glob('incidentes_*.parquet')) + [data_dir / f'{INCIDENTES}.csv']:
+        if ruta.exists():
+            h.update(f'{ruta.name}:{version_fuente(ruta)};'.encode())
+    return f'{FORMATO_ARTEFACTOS}:{h.hexdigest()}'
+
+
+def _tabla_dias(inicio, n_dias):
+    """Días consecutivos desde inicio; vacía si no hay incidentes con fecha"""
+    if not n_dias:
+        return pd.DatetimeIndex([], dtype='datetime64[ns]')
+    return pd.date_range(inicio, periods=n_dias, freq='D')
+
+
+def _borrar_generaciones(directorio, vigente):
+    """Eliminar subdirectorios de generaciones anteriores (si el sistema lo permite)"""
+    for sub in directorio.iterdir():
+        if sub.is_dir() and sub.name != vigente:
+            shutil.rmtree(sub, ignore_errors=True)
+
+
+def guardar_artefactos(cubo, indice, version, directorio):
+    """
+    Escribir los arreglos del cubo y del índice en una generación nueva y
+    publicarla reemplazando meta.json atómicamente
+    """
+    directorio = Path(directorio)
+    generacion = f'gen_{time.time_ns():x}_{os.getpid()}'
+    destino = directorio / generacion
+    destino.mkdir(parents=True)
+    for nombre, arreglo in cubo.celdas.items():
+        np.save(destino / f'cubo_{nombre}.npy', np.ascontiguousarray(arreglo))
+    for nombre, arreglo in indice.arreglos.items():
+        np.save(destino / f'indice_{nombre}.npy', np.ascontiguousarray(arreglo))
+    meta = {
+        'version': version,
+        'generacion': generacion,
+        'inicio': str(cubo.dias[0].date()) if len(cubo.dias) else None,
+        'n_dias': len(cubo.dias),
+        'etiquetas': {dim: list(map(str, etiquetas)) for dim, etiquetas in cubo.etiquetas.items()},
+        'ubicacion': {col: cubo.ubicacion[col].tolist() for col in COLUMNAS_UBICACION},
+        'campos_cubo': list(cubo.celdas),
+        'campos_indice': list(indice.arreglos),
+    }
+    # El meta se publica al final y de forma atómica: apunta a una generación completa
+    temporal = directorio / f'meta.json.{generacion}.tmp'
+    temporal.write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+    os.replace(temporal, directorio / 'meta.json')
+    _borrar_generaciones(directorio, generacion)
+
+
+def cargar_artefactos(version=None, directorio=None, mmap_mode='r'):
+    """
+    (cubo, indice) desde los arreglos en disco, o None si no existen o si
+    version no coincide con la guardada
+    """
+    directorio = directorio_artefactos() if directorio is None else Path(directorio)
+    meta_path = directorio / 'meta.json'
+    if not meta_path.exists():
+        return None
+    meta = json.loads(meta_path.read_text(encoding='utf-8'))
+    if version is not None and meta['version'] != version:
+        return None
+
+    dias = _tabla_dias(meta['inicio'], meta['n_dias'])
+    etiquetas = {dim: pd.Index(valores) for dim, valores in meta['etiquetas'].items()}
+    ubicacion = pd.DataFrame(meta['ubicacion'])
+    if 'generacion' not in meta:
+        # Formato anterior (arreglos sueltos en directorio): se reconstruye
+        return None
+    generacion = directorio / meta['generacion']
+    try:
+        celdas = {c: np.load(generacion / f'cubo_{c}.npy', mmap_mode=mmap_mode) for c in meta['campos_cubo']}
+        arreglos = {c: np.load(generacion / f'indice_{c}.npy', mmap_mode=mmap_mode) for c in meta['campos_indice']}
+    except FileNotFoundError:
+        # Generación reemplazada y borrada entre leer meta.json y abrir los arreglos
+        return None
+    return (CuboIncidentes(celdas, dias, ubicacion, etiquetas),
+            IndiceIncidentes(arreglos, dias, ubicacion, etiquetas))
+
+
+def preparar_artefactos(data_dir=UNIFICADO_DIR, reconstruir=False):
+    """
+    Cubo e índice del dashboard: mapeados desde disco si están al día; si
+    no, se construyen desde los incidentes unificados y se guardan
+    """
+    directorio = directorio_artefactos(data_dir)
+    version = version_incidentes(data_dir)
+    if not reconstruir:
+        artefactos = cargar_artefactos(version, directorio)
+        if artefactos is not None:
+            return artefactos
+
+    print("   Construyendo artefactos del dashboard (cubo + índices)...")
+    incidentes = cargar_incidentes_unificados(data_dir)
+    # Ordenados por Timestamp: los rangos de días del índice son rebanadas contiguas
+    incidentes = incidentes.sort_values('Timestamp', kind='stable').reset_index(drop=True)
+    cubo = CuboIncidentes.desde_incidentes(incidentes)
+    indice = IndiceIncidentes.desde_incidentes(incidentes)
+    guardar_artefactos(cubo, indice, version, directorio)
+    print(f"   Guardado: {directorio.name}/ ({len(cubo):,} celdas, {indice.n:,} incidentes)")
+    return cargar_artefactos(version, directorio)
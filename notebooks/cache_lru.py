@@ -0,0 +1,137 @@
+"""
+Caché LRU acotada en disco para resultados de callbacks
+
+Los usuarios del dashboard alternan entre pocas combinaciones de filtros; en
+lugar de recalcular estadísticas, mapa y gráficas en cada cambio, el
+resultado se guarda (pickle) en una base SQLite local indexada por las
+entradas normalizadas del callback.
+
+SQLite en modo WAL permite que varios procesos (p. ej. workers de gunicorn)
+compartan la misma caché en disco. La caché está acotada por tamaño total en
+bytes: al superarlo se eliminan las entradas usadas hace más tiempo.
+
+    cache = CacheLRU(CACHE_DIR / 'dashboard.sqlite', max_bytes=256 * 2**20, version=v)
+
+    @cache.memoizar
+    def calcular_vista(modo, año, ...):
+        ...
+"""
+
+import contextlib
+import functools
+import hashlib
+import json
+import pickle
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+project_root = Path(__file__).parent.parent
+CACHE_DIR = project_root / 'data' / 'interim' / 'cache_dashboard'
+
+
+def version_archivos(rutas):
+    """Huella barata (tamaño + mtime) de archivos de datos; cambia si se regeneran"""
+    h = hashlib.sha1()
+    for ruta in rutas:
+        ruta = Path(ruta)
+        if ruta.exists():
+            st = ruta.stat()
+            h.update(f'{ruta.name}:{st.st_size}:{st.st_mtime_ns};'.encode())
+    return h.hexdigest()
+
+
+def _normalizar(valor):
+    """Entradas de callback → valores JSON estables (tuplas → listas, NumPy → Python)"""
+    if isinstance(valor, (list, tuple)):
+        return [_normalizar(v) for v in valor]
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return valor
+
+
+class CacheLRU:
+    """Caché clave → objeto (pickle) en SQLite, acotada por bytes con desalojo LRU"""
+
+    def __init__(self, ruta, max_bytes=256 * 2**20, version=''):
+        self.ruta = Path(ruta)
+        self.max_bytes = max_bytes
+        self.version = version
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        with self._conectar() as con:
+            con.execute('PRAGMA journal_mode=WAL')
+            con.execute(
+                'CREATE TABLE IF NOT EXISTS entradas ('
+                ' clave TEXT PRIMARY KEY, valor BLOB, bytes INTEGER, acceso REAL)'
+            )
+            con.execute('CREATE INDEX IF NOT EXISTS idx_acceso ON entradas (acceso)')
+
+    @contextlib.contextmanager
+    def _conectar(self):
+        """
+        Conexión para una operación: transacción (commit/rollback) y cierre
+        al salir, para no dejar descriptores ni lectores WAL abiertos en los
+        workers. Una conexión por operación es segura entre hilos y procesos
+        """
+        con = sqlite3.connect(self.ruta, timeout=30)
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def clave(self, nombre, *args):
+        texto = json.dumps([self.version, nombre, _normalizar(args)], default=str)
+        return hashlib.sha1(texto.encode()).hexdigest()
+
+    def obtener(self, clave):
+        """(True, valor) si la clave está en caché, (False, None) si no"""
+        with self._conectar() as con:
+            fila = con.execute('SELECT valor FROM entradas WHERE clave = ?', (clave,)).fetchone()
+            if fila is None:
+                return False, None
+            con.execute('UPDATE entradas SET acceso = ? WHERE clave = ?', (time.time(), clave))
+        return True, pickle.loads(fila[0])
+
+    def guardar(self, clave, valor):
+        datos = pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(datos) > self.max_bytes:
+            return
+        with self._conectar() as con:
+            con.execute('INSERT OR REPLACE INTO entradas VALUES (?, ?, ?, ?)',
+                        (clave, datos, len(datos), time.time()))
+            self._desalojar(con)
+
+    def _desalojar(self, con):
+        """Eliminar las entradas menos recientes hasta quedar bajo max_bytes"""
+        total = con.execute('SELECT COALESCE(SUM(bytes), 0) FROM entradas').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        exceso = total - self.max_bytes
+        liberado = 0
+        viejas = []
+        for clave, n in con.execute('SELECT clave, bytes FROM entradas ORDER BY acceso'):
+            viejas.append((clave,))
+            liberado += n
+            if liberado >= exceso:
+                break
+        con.executemany('DELETE FROM entradas WHERE clave = ?', viejas)
+
+    def limpiar(self):
+        with self._conectar() as con:
+            con.execute('DELETE FROM entradas')
+
+    def memoizar(self, funcion):
+        """Decorador: resultado de funcion(*args) en caché según args normalizados"""
+        @functools.wraps(funcion)
+        def envoltura(*args):
+            clave = self.clave(funcion.__name__, *args)
+            encontrado, valor = self.obtener(clave)
+            if not encontrado:
+                valor = funcion(*args)
+                self.guardar(clave, valor)
+            return valor
+        return envoltura
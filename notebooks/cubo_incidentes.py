@@ -0,0 +1,320 @@
+"""
+Cubo de conteos de incidentes para el dashboard
+
+En lugar de copiar y filtrar la tabla de incidentes en cada callback, el
+dashboard consulta un cubo disperso precalculado una sola vez: una fila por
+celda no vacía de
+
+    (ubicación, día, hora, categoría, severidad) → conteo
+
+con cada dimensión como código entero. La ubicación determina CVE_COL (y las
+coordenadas) y el día determina año/mes/día, así que los filtros de los
+dropdowns se resuelven como máscaras sobre arreglos enteros (los de fecha,
+sobre la tabla pequeña de días) y las respuestas son sumas con np.bincount.
+
+Los incidentes sin fecha (Timestamp NaT, make_interim_data usa
+errors='coerce') llevan día y hora -1, como los nulos de categoría: cuentan
+sin filtros de fecha/hora y quedan fuera de cualquier filtro de fecha, de la
+matriz diaria y de las series temporales.
+
+    cubo = CuboIncidentes.desde_incidentes(df_incidentes)
+    m = cubo.mascara(año=2021, categoria='Robo')
+    cubo.total(m), cubo.por_poligono(m), cubo.serie_diaria(m)
+"""
+
+import numpy as np
+import pandas as pd
+
+
+COLUMNAS_UBICACION = ['CVE_COL', 'COLONIA_POLIGONO', 'LATITUD', 'LONGITUD']
+
+
+def _codigos(serie):
+    """(códigos, etiquetas) de una columna; reutiliza los de un Categorical"""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy().astype(np.int64), pd.Index(serie.cat.categories)
+    codigos, etiquetas = pd.factorize(serie, sort=True)
+    return codigos.astype(np.int64), pd.Index(etiquetas)
+
+
+def codificar_ubicacion(incidentes):
+    """
+    (código de ubicación por fila, DataFrame código → COLUMNAS_UBICACION)
+
+    Usa id_ubicacion de la tabla de hechos si está presente.
+    """
+    if 'id_ubicacion' in incidentes.columns:
+        cod_ubic = incidentes['id_ubicacion'].to_numpy().astype(np.int64)
+    else:
+        cod_ubic = incidentes.groupby(COLUMNAS_UBICACION, sort=True, dropna=False).ngroup().to_numpy()
+    n_ubic = int(cod_ubic.max()) + 1 if len(cod_ubic) else 0
+    primeros = np.full(n_ubic, -1, dtype=np.int64)
+    primeros[cod_ubic[::-1]] = np.arange(len(cod_ubic))[::-1]
+    ubicacion = pd.DataFrame({
+        col: np.asarray(incidentes[col].to_numpy()[np.maximum(primeros, 0)])
+        for col in COLUMNAS_UBICACION
+    })
+    return cod_ubic, ubicacion
+
+
+def codificar_dias(timestamps):
+    """
+    (código de día por fila, DatetimeIndex diario desde el primer día);
+    código -1 para filas sin fecha (NaT)
+    """
+    fechas = pd.to_datetime(timestamps).dt.normalize()
+    con_fecha = fechas.notna().to_numpy()
+    if not con_fecha.any():
+        return np.full(len(fechas), -1, dtype=np.int64), pd.DatetimeIndex([])
+    inicio = fechas.min()
+    cod_dia = np.full(len(fechas), -1, dtype=np.int64)
+    cod_dia[con_fecha] = (fechas[con_fecha] - inicio).dt.days.to_numpy()
+    n_dias = int(cod_dia.max()) + 1
+    return cod_dia, pd.date_range(inicio, periods=n_dias, freq='D')
+
+
+def codificar_horas(timestamps):
+    """Hora (0-23) por fila; -1 para filas sin fecha (NaT)"""
+    return pd.to_datetime(timestamps).dt.hour.fillna(-1).to_numpy().astype(np.int64)
+
+
+def _sin_filtro(valor):
+    return valor is None or valor in ('todos', 'todas')
+
+
+def filtro_fechas(dias, año=None, mes=None, dia=None, rango_dias=None):
+    """
+    Máscara de días para los filtros de fecha, o None si no restringen nada
+    (rango_dias que cubre todos los días cuenta como sin filtro). Con None
+    también entran los incidentes sin fecha
+    """
+    if rango_dias is not None and rango_dias[0] <= 0 and rango_dias[1] >= len(dias) - 1:
+        rango_dias = None
+    if _sin_filtro(año) and _sin_filtro(mes) and _sin_filtro(dia) and rango_dias is None:
+        return None
+    return seleccionar_dias(dias, año, mes, dia, rango_dias)
+
+
+def en_dias(sel_dia, cod_dia):
+    """sel_dia evaluada por código de día; los códigos -1 (sin fecha) nunca coinciden"""
+    con_fecha = cod_dia >= 0
+    m = np.zeros(len(cod_dia), dtype=bool)
+    m[con_fecha] = sel_dia[cod_dia[con_fecha]]
+    return m
+
+
+def seleccionar_dias(dias, año=None, mes=None, dia=None, rango_dias=None):
+    """
+    Máscara sobre la tabla de días (DatetimeIndex) para los filtros de fecha
+
+    rango_dias: (primero, último) como códigos de día inclusivos (los valores
+    del slider de fechas); None = sin restricción
+    """
+    sel = np.ones(len(dias), dtype=bool)
+    if rango_dias is not None:
+        primero, ultimo = rango_dias
+        sel[:max(int(primero), 0)] = False
+        sel[int(ultimo) + 1:] = False
+    if not _sin_filtro(año):
+        sel &= dias.year.to_numpy() == año
+    if not _sin_filtro(mes):
+        sel &= dias.month.to_numpy() == mes
+    if not _sin_filtro(dia):
+        sel &= dias.day.to_numpy() == dia
+    return sel
+
+
+class CuboIncidentes:
+    """Cubo disperso (celdas no vacías) con consultas por máscara + bincount"""
+
+    def __init__(self, celdas, dias, ubicacion, etiquetas):
+        self.celdas = celdas          # dict de arreglos: ubicacion, dia, hora, categoria, severidad, conteo
+        self.dias = dias              # DatetimeIndex: código de día → fecha
+        self.ubicacion = ubicacion    # DataFrame: código de ubicación → CVE_COL, COLONIA_POLIGONO, LAT, LON
+        self.etiquetas = etiquetas    # {'categoria': Index, 'severidad': Index}
+        # CVE_COL por código de ubicación → posición de polígono (para bincount)
+        self.cod_poligono, self.cve_poligonos = pd.factorize(ubicacion['CVE_COL'], sort=True)
+
+        # Matriz densa día × categoría × severidad (códigos +1: el nulo va en 0)
+        # para series temporales sin recorrer las celdas; sin las celdas sin fecha
+        n_cat, n_sev = len(etiquetas['categoria']) + 1, len(etiquetas['severidad']) + 1
+        con_fecha = celdas['dia'] >= 0
+        idx = ((celdas['dia'][con_fecha].astype(np.int64) * n_cat + (celdas['categoria'][con_fecha] + 1)) * n_sev
+               + (celdas['severidad'][con_fecha] + 1))
+        self.diario = np.bincount(idx, weights=celdas['conteo'][con_fecha], minlength=len(dias) * n_cat * n_sev
+                                  ).astype(np.int32).reshape(len(dias), n_cat, n_sev)
+        # Periodo de cada día por frecuencia de la serie (códigos no decrecientes + fecha de inicio)
+        self.periodos = {'D': (np.arange(len(dias)), dias)}
+        for frecuencia, periodo in [('W', 'W'), ('M', 'M')]:
+            codigos, etiquetas_periodo = pd.factorize(dias.to_period(periodo))
+            self.periodos[frecuencia] = (codigos, pd.PeriodIndex(etiquetas_periodo).start_time)
+
+    @classmethod
+    def desde_incidentes(cls, incidentes):
+        """
+        Construir el cubo a partir de la tabla de incidentes (vista de
+        datos_unificados.cargar_incidentes_unificados o CSV equivalente)
+        """
+        cod_ubic, ubicacion = codificar_ubicacion(incidentes)
+
+        ts = pd.to_datetime(incidentes['Timestamp'])
+        cod_dia, dias = codificar_dias(ts)
+        n_dias = len(dias)
+        hora = codificar_horas(ts)
+
+        cod_cat, cat = _codigos(incidentes['Categoria_Incidente'])
+        cod_sev, sev = _codigos(incidentes['Nivel_Severidad'])
+
+        # Clave combinada (códigos +1 para que el nulo/sin fecha -1 quede en 0)
+        n_dia, n_hora, n_cat, n_sev = n_dias + 1, 25, len(cat) + 1, len(sev) + 1
+        clave = ((((cod_ubic * n_dia + (cod_dia + 1)) * n_hora + (hora + 1)) * n_cat + (cod_cat + 1)) * n_sev
+                 + (cod_sev + 1))
+        claves, conteo = np.unique(clave, return_counts=True)
+
+        claves, c_sev = np.divmod(claves, n_sev)
+        claves, c_cat = np.divmod(claves, n_cat)
+        claves, c_hora = np.divmod(claves, n_hora)
+        c_ubic, c_dia = np.divmod(claves, n_dia)
+        celdas = {
+            'ubicacion': c_ubic.astype(np.int32),
+            'dia': (c_dia - 1).astype(np.int32),
+            'hora': (c_hora - 1).astype(np.int8),
+            'categoria': (c_cat - 1).astype(np.int16),
+            'severidad': (c_sev - 1).astype(np.int8),
+            'conteo': conteo.astype(np.int32),
+        }
+        return cls(celdas, dias, ubicacion, {'categoria': cat, 'severidad': sev})
+
+    def __len__(self):
+        return len(self.celdas['conteo'])
+
+    def _codigo(self, dimension, valor):
+        etiquetas = self.etiquetas[dimension]
+        return etiquetas.get_loc(valor) if valor in etiquetas else -2
+
+    def mascara(self, año=None, mes=None, dia=None, hora=None, categoria=None, severidad=None,
+                rango_dias=None):
+        """Celdas que cumplen los filtros ('todos'/'todas'/None = sin filtro)"""
+        sel_dia = filtro_fechas(self.dias, año, mes, dia, rango_dias)
+        if sel_dia is None:
+            m = np.ones(len(self), dtype=bool)
+        else:
+            m = en_dias(sel_dia, self.celdas['dia'])
+        if not _sin_filtro(hora):
+            m &= self.celdas['hora'] == hora
+        if not _sin_filtro(categoria):
+            m &= self.celdas['categoria'] == self._codigo('categoria', categoria)
+        if not _sin_filtro(severidad):
+            m &= self.celdas['severidad'] == self._codigo('severidad', severidad)
+        return m
+
+    def _suma(self, dimension, m, n):
+        """Conteo por código de la dimensión (los códigos -1 no se cuentan)"""
+        m = m & (self.celdas[dimension] >= 0)
+        return np.bincount(self.celdas[dimension][m], weights=self.celdas['conteo'][m], minlength=n).astype(np.int64)
+
+    def total(self, m):
+        return int(self.celdas['conteo'][m].sum())
+
+    def total_severidad(self, m, severidad):
+        return self.total(m & (self.celdas['severidad'] == self._codigo('severidad', severidad)))
+
+    def por_ubicacion(self, m):
+        """Conteo por código de ubicación"""
+        return self._suma('ubicacion', m, len(self.ubicacion))
+
+    def por_poligono(self, m, severidades=('ALTA', 'MEDIA', 'BAJA')):
+        """
+        DataFrame CVE_COL, total_filtrado y una columna por severidad (en
+        minúsculas), solo polígonos con al menos un incidente
+        """
+        n = len(self.cve_poligonos)
+        pol = self.cod_poligono[self.celdas['ubicacion'][m]]
+        pesos = self.celdas['conteo'][m]
+        datos = {'total_filtrado': np.bincount(pol, weights=pesos, minlength=n).astype(np.int64)}
+        sev = self.celdas['severidad'][m]
+        for nombre in severidades:
+            sel = sev == self._codigo('severidad', nombre)
+            datos[nombre.lower()] = np.bincount(pol[sel], weights=pesos[sel], minlength=n).astype(np.int64)
+        tabla = pd.DataFrame(datos)
+        tabla.insert(0, 'CVE_COL', np.asarray(self.cve_poligonos))
+        return tabla[tabla['total_filtrado'] > 0].reset_index(drop=True)
+
+    def n_poligonos(self, m):
+        return int((np.bincount(self.cod_poligono[self.celdas['ubicacion'][m]],
+                                minlength=len(self.cve_poligonos)) > 0).sum())
+
+    def serie_diaria(self, m):
+        """Serie de incidentes por día (solo días con incidentes)"""
+        conteo = self._suma('dia', m, len(self.dias))
+        dias = conteo > 0
+        return pd.Series(conteo[dias], index=self.dias[dias], name='Incidentes')
+
+    def _posicion_diario(self, dimension, valor):
+        """Posición del valor en su eje de la matriz diaria (lista vacía si no existe)"""
+        codigo = self._codigo(dimension, valor)
+        return [] if codigo < 0 else [codigo + 1]
+
+    def serie_temporal(self, año=None, mes=None, dia=None, hora=None, categoria=None, severidad=None,
+                       rango_dias=None, max_puntos=None):
+        """
+        Serie de incidentes desde la matriz diaria, con reducción opcional
+
+        Sin filtro de hora, los conteos por día salen de la matriz
+        día × categoría × severidad (O(días)); con filtro de hora se suman
+        las celdas. Los periodos se obtienen como diferencias de la suma
+        acumulada en sus límites. Con max_puntos se usa la frecuencia más
+        fina (diaria, semanal o mensual) que no exceda ese número de
+        periodos en el rango seleccionado.
+
+        Returns:
+            (Series periodo → incidentes, solo periodos con incidentes;
+             frecuencia 'D', 'W' o 'M')
+        """
+        if len(self.dias) == 0:
+            # Ningún incidente con fecha
+            return pd.Series([], index=pd.DatetimeIndex([]), dtype=np.int64, name='Incidentes'), 'D'
+        sel_dia = seleccionar_dias(self.dias, año, mes, dia, rango_dias)
+        if _sin_filtro(hora):
+            sub = self.diario
+            if not _sin_filtro(categoria):
+                sub = sub[:, self._posicion_diario('categoria', categoria)]
+            if not _sin_filtro(severidad):
+                sub = sub[:, :, self._posicion_diario('severidad', severidad)]
+            por_dia = sub.sum(axis=(1, 2), dtype=np.int64) * sel_dia
+        else:
+            por_dia = self._suma('dia', self.mascara(año, mes, dia, hora, categoria, severidad, rango_dias), len(self.dias))
+
+        frecuencia = 'D'
+        seleccionados = np.flatnonzero(sel_dia)
+        if max_puntos is not None and len(seleccionados):
+            primero, ultimo = seleccionados[0], seleccionados[-1]
+            for frecuencia in ('D', 'W', 'M'):
+                codigos = self.periodos[frecuencia][0]
+                if codigos[ultimo] - codigos[primero] + 1 <= max_puntos:
+                    break
+
+        codigos, inicios = self.periodos[frecuencia]
+        limites = np.flatnonzero(np.r_[True, codigos[1:] != codigos[:-1], True])
+        acumulado = np.r_[0, np.cumsum(por_dia)]
+        conteo = acumulado[limites[1:]] - acumulado[limites[:-1]]
+        con_datos = conteo > 0
+        return pd.Series(conteo[con_datos], index=inicios[con_datos], name='Incidentes'), frecuencia
+
+    def rango_fechas(self, m):
+        """(primer día, último día) con incidentes, o (None, None)"""
+        dias = np.flatnonzero(self._suma('dia', m, len(self.dias)))
+        if len(dias) == 0:
+            return None, None
+        return self.dias[dias[0]], self.dias[dias[-1]]
+
+    def por_categoria(self, m):
+        """Conteo por categoría, de mayor a menor (solo categorías presentes)"""
+        cat = self.celdas['categoria'][m]
+        pesos = self.celdas['conteo'][m]
+        validas = cat >= 0
+        conteo = np.bincount(cat[validas], weights=pesos[validas],
+                             minlength=len(self.etiquetas['categoria'])).astype(np.int64)
+        serie = pd.Series(conteo, index=self.etiquetas['categoria'], name='count')
+        serie = serie[serie > 0]
+        return serie.iloc[np.argsort(-serie.to_numpy(), kind='stable')]
@@ -1,5 +1,8 @@
+import functools
+
 import dash
-from dash import dcc, html, Input, Output, callback
+from dash import dcc, html, Input, Output, State, Patch, callback, ctx, no_update
+from dash.exceptions import MissingCallbackContextException
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
@@ -7,8 +10,14 @@ import geopandas as gpd
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
+import warnings
 import numpy as np
 
+from artefactos_dashboard import preparar_artefactos
+from cache_lru import CACHE_DIR, CacheLRU, version_archivos
+from datos_unificados import cargar_poligonos_unificados
+from geometria_simplificada import cargar_niveles, geojson_por_nivel, nivel_por_zoom
+
 # =============================================
 # CONFIGURACIÓN Y CARGA DE DATOS
 # =============================================
@@ -17,42 +26,71 @@ print("Cargando datos...")
 project_root = Path(__file__).parent.parent
 data_dir = project_root / 'data' / 'processed' / 'unificado'
 
-# Polígonos con datos agregados
-gdf_poligonos = gpd.read_file(data_dir / 'poligonos_unificados_completo.geojson')
+# Polígonos con datos agregados (GeoParquet)
+gdf_poligonos = cargar_poligonos_unificados(data_dir)
 
-# >> CARGA E INTEGRACIÓN DE DATOS PCA <<
-try:
-    df_pca = pd.read_csv(data_dir / 'colonias_pca_puntuaciones.csv')
-    gdf_poligonos = gdf_poligonos.merge(df_pca, on='COLONIA', how='left')
-    
+# Cubo de conteos (ubicación, día, hora, categoría, severidad) e índices por
+# dimensión (modo puntos), mapeados desde data/processed/unificado/dashboard/;
+# la tabla de incidentes solo se lee si hay que reconstruirlos
+cubo, indice = preparar_artefactos(data_dir)
+
+# Geometría de los polígonos serializada una sola vez por nivel de detalle
+# (id de feature = CVE_COL); los callbacks solo envían valores por polígono en
+# el mismo orden y la geometría se cambia de nivel al cruzar umbrales de zoom
+geojson_niveles = geojson_por_nivel(gdf_poligonos, cargar_niveles(gdf_poligonos, data_dir))
+ZOOM_INICIAL = 10.5
+NIVEL_INICIAL = nivel_por_zoom(ZOOM_INICIAL)
+ids_poligonos = gdf_poligonos['CVE_COL'].astype(str).tolist()
+atributos_poligonos = pd.DataFrame(gdf_poligonos.drop(columns='geometry'))
+
+
+@functools.lru_cache(maxsize=None)
+def puntuaciones_pca():
+    """
+    CP1-CP8 alineados con atributos_poligonos (se leen al primer uso del modo
+    PCA, no al arrancar)
+    """
+    columnas = [f'CP{i}' for i in range(1, 9)]
+    try:
+        df_pca = pd.read_csv(data_dir / 'colonias_pca_puntuaciones.csv')
+        print(f"✓ PCA scores (CP1-CP8) merged.")
+    except FileNotFoundError:
+        print("❌ ADVERTENCIA: No se encontró el archivo colonias_pca_puntuaciones.csv. Los índices PCA no estarán disponibles.")
+        return pd.DataFrame(0, index=atributos_poligonos.index, columns=columnas)
+    df_pca = df_pca.drop_duplicates('COLONIA')
+    pca = atributos_poligonos[['COLONIA']].merge(df_pca, on='COLONIA', how='left')
     # Rellenar NaN en las columnas CPx con 0
-    for i in range(1, 9):
-        col_name = f'CP{i}'
-        if col_name in gdf_poligonos.columns:
-            gdf_poligonos[col_name] = gdf_poligonos[col_name].fillna(0)
-    print(f"✓ PCA scores (CP1-CP8) merged.")
-
-except FileNotFoundError:
-    print("❌ ADVERTENCIA: No se encontró el archivo colonias_pca_puntuaciones.csv. Los índices PCA no estarán disponibles.")
-    for i in range(1, 9):
-        gdf_poligonos[f'CP{i}'] = 0 
-# >> FIN DE CARGA PCA <<
-
-
-# Incidentes individuales con timestamp
-df_incidentes = pd.read_csv(data_dir / 'incidentes_con_poligono_temporal.csv')
-df_incidentes['Timestamp'] = pd.to_datetime(df_incidentes['Timestamp'])
-
-# Extraer componentes temporales para filtros
-df_incidentes['Año'] = df_incidentes['Timestamp'].dt.year
-df_incidentes['Mes'] = df_incidentes['Timestamp'].dt.month
-df_incidentes['Dia'] = df_incidentes['Timestamp'].dt.day
-df_incidentes['Hora'] = df_incidentes['Timestamp'].dt.hour
-df_incidentes['FechaStr'] = df_incidentes['Timestamp'].dt.strftime('%Y-%m-%d')
+    return pca.reindex(columns=columnas).fillna(0).set_axis(atributos_poligonos.index)
+
+
+# Dominio del slider de fechas: códigos de día (0 = primer día con datos)
+dias_calendario = cubo.dias
+ultimo_dia = max(len(dias_calendario) - 1, 0)
+if len(dias_calendario) > 0:
+    marcas_fechas = {0: dias_calendario[0].strftime('%Y-%m'),
+                     ultimo_dia: dias_calendario[-1].strftime('%Y-%m')}
+    marcas_fechas.update({int(i): str(dias_calendario[i].year)
+                          for i in np.flatnonzero(dias_calendario.dayofyear == 1) if i > 0})
+else:
+    # Ningún incidente con fecha: el slider queda deshabilitado
+    marcas_fechas = {0: 'Sin fechas'}
+
+# Caché LRU en disco de resultados por combinación de filtros, compartida
+# entre procesos; se invalida si cambian los datos, este script o los módulos
+# que calculan los resultados
+MODULOS_DASHBOARD = ['artefactos_dashboard.py', 'cache_lru.py', 'cubo_incidentes.py', 'datos_unificados.py',
+                     'geometria_simplificada.py', 'indice_incidentes.py']
+cache = CacheLRU(CACHE_DIR / 'dashboard.sqlite', max_bytes=256 * 2**20, version=version_archivos(
+    [Path(__file__), *(Path(__file__).parent / m for m in MODULOS_DASHBOARD),
+     *sorted(data_dir.glob('*.parquet')), data_dir / 'colonias_pca_puntuaciones.csv']))
 
 print(f"✓ Polígonos: {len(gdf_poligonos):,}")
-print(f"✓ Incidentes: {len(df_incidentes):,}")
-print(f"✓ Periodo: {df_incidentes['Timestamp'].min()} a {df_incidentes['Timestamp'].max()}")
+print(f"✓ Incidentes: {indice.n:,}")
+print(f"✓ Cubo: {len(cubo):,} celdas")
+if len(dias_calendario) > 0:
+    print(f"✓ Periodo: {dias_calendario[0].date()} a {dias_calendario[-1].date()}")
+else:
+    print("⚠ Ningún incidente tiene fecha")
 
 # =============================================
 # INICIALIZAR APP DASH
@@ -60,11 +98,18 @@ print(f"✓ Periodo: {df_incidentes['Timestamp'].min()} a {df_incidentes['Timest
 
 app = dash.Dash(__name__)
 app.title = "Índice Delictivo Hermosillo"
+# Aplicación WSGI para servidores con varios workers, p. ej.:
+#   gunicorn --chdir notebooks -w 4 --preload dashboard_mapa_interactivo:server
+server = app.server
 
 # =============================================
 # LAYOUT DEL DASHBOARD
 # =============================================
 
+# Máximo de periodos en la serie temporal antes de pasar a semanal/mensual
+MAX_PUNTOS_SERIE = 400
+NOMBRES_FRECUENCIA = {'D': 'diaria', 'W': 'semanal', 'M': 'mensual'}
+
 # Definiciones de los CPs para el Dropdown (usando los nombres interpretados)
 pca_options_list = [
     {'label': 'CP1: Demanda Emergencia General', 'value': 'CP1'},
@@ -102,7 +147,7 @@ app.layout = html.Div([
                     {'label': ' PCA: Perfil Delictivo (Seleccionar Abajo)', 'value': 'pca_selector'}, 
                     
                     {'label': ' Severidad: Alta/Media/Baja', 'value': 'severidad'},
-                    {'label': ' Puntos: Incidentes individuales', 'value': 'puntos'},
+                    {'label': ' Puntos: Incidentes por ubicación', 'value': 'puntos'},
                 ],
                 value='total',
                 style={'marginBottom': 15}
@@ -127,7 +172,7 @@ app.layout = html.Div([
                 dcc.Dropdown(
                     id='filtro-año',
                     options=[{'label': 'Todos', 'value': 'todos'}] + 
-                            [{'label': str(año), 'value': año} for año in sorted(df_incidentes['Año'].unique())],
+                            [{'label': str(año), 'value': año} for año in sorted(set(dias_calendario.year))],
                     value='todos',
                     clearable=False
                 ),
@@ -177,7 +222,7 @@ app.layout = html.Div([
                 dcc.Dropdown(
                     id='filtro-categoria',
                     options=[{'label': 'Todas', 'value': 'todas'}] + 
-                            [{'label': cat, 'value': cat} for cat in sorted(df_incidentes['Categoria_Incidente'].unique())],
+                            [{'label': cat, 'value': cat} for cat in sorted(cubo.etiquetas['categoria'])],
                     value='todas',
                     clearable=False
                 ),
@@ -204,13 +249,11 @@ app.layout = html.Div([
             dcc.RangeSlider(
                 id='slider-fechas',
                 min=0,
-                max=len(df_incidentes['FechaStr'].unique()) - 1,
+                max=ultimo_dia,
                 step=1,
-                value=[0, len(df_incidentes['FechaStr'].unique()) - 1],
-                marks={
-                    0: df_incidentes['Timestamp'].min().strftime('%Y-%m'),
-                    len(df_incidentes['FechaStr'].unique()) - 1: df_incidentes['Timestamp'].max().strftime('%Y-%m')
-                },
+                value=[0, ultimo_dia],
+                marks=marcas_fechas,
+                disabled=len(dias_calendario) == 0,
                 tooltip={"placement": "bottom", "always_visible": False}
             ),
         ], style={'marginBottom': 20}),
@@ -242,6 +285,8 @@ app.layout = html.Div([
         style={'height': '700px'},
         config={'displayModeBar': True, 'scrollZoom': True}
     ),
+    # Nivel de geometría enviado al navegador (según el zoom actual)
+    dcc.Store(id='nivel-geometria', data=NIVEL_INICIAL),
     
     # =============================================
     # GRÁFICAS AUXILIARES
@@ -274,111 +319,103 @@ def toggle_pca_dropdown(modo):
 
 
 # CALLBACK PRINCIPAL
-@app.callback(
-    [Output('mapa-principal', 'figure'),
-     Output('estadisticas-panel', 'children'),
-     Output('grafica-temporal', 'figure'),
-     Output('grafica-categorias', 'figure')],
-    [Input('modo-visualizacion', 'value'),
-     Input('filtro-año', 'value'),
-     Input('filtro-mes', 'value'),
-     Input('filtro-dia', 'value'),
-     Input('filtro-hora', 'value'),
-     Input('filtro-categoria', 'value'),
-     Input('filtro-severidad', 'value'),
-     Input('slider-fechas', 'value'),
-     Input('filtro-pca-cp', 'value')]
-)
-def actualizar_visualizacion(modo, año, mes, dia, hora, categoria, severidad, rango_fechas, cp_seleccionado):
-    """Actualizar mapa y gráficas según filtros"""
-    
-    # FILTRAR INCIDENTES
-    df_filtrado = df_incidentes.copy()
+def _figura_completa():
+    """True si el mapa debe enviarse completo (carga inicial o cambio de modo)"""
+    try:
+        disparador = ctx.triggered_id
+    except MissingCallbackContextException:
+        return True  # llamada directa, fuera de un callback
+    return disparador is None or disparador == 'modo-visualizacion'
+
+
+@cache.memoizar
+def calcular_vista(modo, año, mes, dia, hora, categoria, severidad, rango_fechas, cp_seleccionado):
+    """
+    Estadísticas, datos del mapa y gráficas para una combinación de filtros
+
+    Returns:
+        (mapa, stats, fig_temporal, fig_categorias); mapa es la figura de
+        puntos o, en modos de polígonos, un dict con z, customdata,
+        hovertemplate, colorbar_title y colorscale (sin geometría)
+    """
     
-    if año != 'todos':
-        df_filtrado = df_filtrado[df_filtrado['Año'] == año]
-    if mes != 'todos':
-        df_filtrado = df_filtrado[df_filtrado['Mes'] == mes]
-    if dia != 'todos':
-        df_filtrado = df_filtrado[df_filtrado['Dia'] == dia]
-    if hora != 'todas':
-        df_filtrado = df_filtrado[df_filtrado['Hora'] == hora]
-    if categoria != 'todas':
-        df_filtrado = df_filtrado[df_filtrado['Categoria_Incidente'] == categoria]
-    if severidad != 'todas':
-        df_filtrado = df_filtrado[df_filtrado['Nivel_Severidad'] == severidad]
+    # FILTRAR (máscara sobre las celdas del cubo, sin copiar incidentes)
+    rango_dias = tuple(rango_fechas) if rango_fechas else None
+    m = cubo.mascara(año, mes, dia, hora, categoria, severidad, rango_dias)
+    total_filtrado = cubo.total(m)
+    fecha_inicio, fecha_fin = cubo.rango_fechas(m)
     
     # PANEL DE ESTADÍSTICAS
     stats = html.Div([
         html.Div([
-            html.H3(f"{len(df_filtrado):,}", style={'color': '#e74c3c', 'margin': 0}),
+            html.H3(f"{total_filtrado:,}", style={'color': '#e74c3c', 'margin': 0}),
             html.P("Incidentes", style={'margin': 0}),
         ], style={'width': '20%', 'display': 'inline-block', 'textAlign': 'center'}),
         
         html.Div([
-            html.H3(f"{df_filtrado['CVE_COL'].nunique():,}", style={'color': '#3498db', 'margin': 0}),
+            html.H3(f"{cubo.n_poligonos(m):,}", style={'color': '#3498db', 'margin': 0}),
             html.P("Colonias Afectadas", style={'margin': 0}),
         ], style={'width': '20%', 'display': 'inline-block', 'textAlign': 'center'}),
         
         html.Div([
-            html.H3(f"{(df_filtrado['Nivel_Severidad']=='ALTA').sum():,}", style={'color': '#e67e22', 'margin': 0}),
+            html.H3(f"{cubo.total_severidad(m, 'ALTA'):,}", style={'color': '#e67e22', 'margin': 0}),
             html.P("Alta Severidad", style={'margin': 0}),
         ], style={'width': '20%', 'display': 'inline-block', 'textAlign': 'center'}),
         
         html.Div([
-            html.H3(f"{df_filtrado['Timestamp'].min().strftime('%Y-%m-%d') if len(df_filtrado) > 0 else 'N/A'}", 
+            html.H3(f"{fecha_inicio.strftime('%Y-%m-%d') if fecha_inicio is not None else 'N/A'}", 
                    style={'color': '#2ecc71', 'margin': 0, 'fontSize': '20px'}),
             html.P("Fecha Inicio", style={'margin': 0}),
         ], style={'width': '20%', 'display': 'inline-block', 'textAlign': 'center'}),
         
         html.Div([
-            html.H3(f"{df_filtrado['Timestamp'].max().strftime('%Y-%m-%d') if len(df_filtrado) > 0 else 'N/A'}", 
+            html.H3(f"{fecha_fin.strftime('%Y-%m-%d') if fecha_fin is not None else 'N/A'}", 
                    style={'color': '#9b59b6', 'margin': 0, 'fontSize': '20px'}),
             html.P("Fecha Fin", style={'margin': 0}),
         ], style={'width': '20%', 'display': 'inline-block', 'textAlign': 'center'}),
     ])
     
-    # CREAR MAPA
-    fig_mapa = go.Figure()
-    
+    # DATOS DEL MAPA
     if modo == 'puntos':
-        # Modo puntos: incidentes individuales
-        if len(df_filtrado) > 0:
+        # Modo puntos: incidentes seleccionados apilados por punto geocodificado
+        # (un marcador por ubicación con su conteo, no uno por incidente)
+        mapa = go.Figure()
+        puntos = indice.por_ubicacion(indice.filtrar(año, mes, dia, hora, categoria, severidad, rango_dias))
+        if len(puntos) > 0:
             color_map = {'ALTA': '#e74c3c', 'MEDIA': '#f39c12', 'BAJA': '#3498db'}
-            df_filtrado['color'] = df_filtrado['Nivel_Severidad'].map(color_map)
+            niveles = np.array(['ALTA', 'MEDIA', 'BAJA'])
+            predominante = niveles[puntos[['alta', 'media', 'baja']].to_numpy().argmax(axis=1)]
+            colores = pd.Series(predominante).map(color_map)
+            tamaños = 6 + 24 * np.sqrt(puntos['incidentes'] / puntos['incidentes'].max())
+            
+            # Texto de hover vectorizado (operaciones de columna, sin apply por fila)
+            texto = ("<b>" + puntos['COLONIA_POLIGONO'].astype(str) + "</b><br>" +
+                     puntos['incidentes'].map('{:,}'.format) + " incidentes<br>" +
+                     "Alta: " + puntos['alta'].astype(str) +
+                     " | Media: " + puntos['media'].astype(str) +
+                     " | Baja: " + puntos['baja'].astype(str) + "<br>" +
+                     "Último: " + puntos['ultimo'].dt.strftime('%Y-%m-%d %H:%M').fillna('sin fecha'))
             
-            fig_mapa.add_trace(go.Scattermapbox(
-                lat=df_filtrado['LATITUD'],
-                lon=df_filtrado['LONGITUD'],
+            mapa.add_trace(go.Scattermapbox(
+                lat=puntos['LATITUD'],
+                lon=puntos['LONGITUD'],
                 mode='markers',
                 marker=dict(
-                    size=6,
-                    color=df_filtrado['color'],
+                    size=tamaños,
+                    color=colores,
                     opacity=0.6
                 ),
-                text=df_filtrado.apply(lambda x: f"<b>{x['COLONIA_POLIGONO']}</b><br>" +
-                                                  f"{x['TIPO DE INCIDENTE']}<br>" +
-                                                  f"Severidad: {x['Nivel_Severidad']}<br>" +
-                                                  f"{x['Timestamp'].strftime('%Y-%m-%d %H:%M')}", axis=1),
+                text=texto,
                 hoverinfo='text',
                 name='Incidentes'
             ))
     else:
         # Modo polígonos: mapa de calor
         # Agregar incidentes filtrados por polígono
-        agg_filtrado = df_filtrado.groupby('CVE_COL').agg({
-            'TIPO DE INCIDENTE': 'count',
-            'Nivel_Severidad': [
-                ('alta', lambda x: (x == 'ALTA').sum()),
-                ('media', lambda x: (x == 'MEDIA').sum()),
-                ('baja', lambda x: (x == 'BAJA').sum())
-            ]
-        })
-        agg_filtrado.columns = ['total_filtrado', 'alta', 'media', 'baja']
-        agg_filtrado = agg_filtrado.reset_index()
+        agg_filtrado = cubo.por_poligono(m)
         
-        # Unir con polígonos
-        gdf_temp = gdf_poligonos.merge(agg_filtrado, on='CVE_COL', how='left')
+        # Unir con atributos de polígonos (sin geometría; mismo orden que ids_poligonos)
+        gdf_temp = atributos_poligonos.merge(agg_filtrado, on='CVE_COL', how='left')
         gdf_temp['total_filtrado'] = gdf_temp['total_filtrado'].fillna(0)
         
         # Elegir métrica según modo
@@ -397,7 +434,7 @@ def actualizar_visualizacion(modo, año, mes, dia, hora, categoria, severidad, r
             
         elif modo == 'pca_selector':
             # Lógica para CP1 a CP8 usando el selector
-            gdf_temp['valor'] = gdf_temp[cp_seleccionado]
+            gdf_temp['valor'] = puntuaciones_pca()[cp_seleccionado].to_numpy()
             
             # Buscar el nombre descriptivo usando la lista de opciones
             description_map = {opt['value']: opt['label'].split(':')[-1].strip() for opt in pca_options_list}
@@ -421,61 +458,29 @@ def actualizar_visualizacion(modo, año, mes, dia, hora, categoria, severidad, r
             colorbar_title = "Score Severidad"
             colorscale = "Inferno"
         
-        # Lógica de Choropleth para modos que no son puntos
-        # Convertir a GeoJSON
-        gdf_for_json = gdf_temp.copy()
-        
-        # Normalizar columnas
-        for col in gdf_for_json.columns:
-            if pd.api.types.is_datetime64_any_dtype(gdf_for_json[col]):
-                gdf_for_json[col] = gdf_for_json[col].astype(str)
-            elif pd.api.types.is_object_dtype(gdf_for_json[col]):
-                gdf_for_json[col] = gdf_for_json[col].apply(
-                    lambda x: x.isoformat() if (hasattr(x, 'isoformat') and not isinstance(x, str)) else x
-                )
-        
-        geojson = json.loads(gdf_for_json.to_json())
-        
-        # Agregar choropleth
-        fig_mapa.add_trace(go.Choroplethmapbox(
-            geojson=geojson,
-            locations=gdf_temp.index,
-            z=gdf_temp['valor'],
-            colorscale=colorscale,
-            marker_opacity=0.6,
-            marker_line_width=1,
-            marker_line_color='white',
-            colorbar=dict(title=colorbar_title),
-            hovertemplate='<b>%{customdata[0]}</b><br>' +
+        hovertemplate = ('<b>%{customdata[0]}</b><br>' +
                          f'{colorbar_title}: ' + '%{z:.2f}<br>' +
                          'Población: %{customdata[1]:,}<br>' +
                          'Incidentes (filtrados): %{customdata[2]:,}<br>' +
-                         '<extra></extra>',
-            customdata=gdf_temp[['COLONIA', 'poblacion_total', 'total_filtrado']].values
-        ))
-    
-    # Layout del mapa
-    fig_mapa.update_layout(
-        mapbox=dict(
-            style="open-street-map",
-            center=dict(lat=29.0892, lon=-110.9615),
-            zoom=10.5
-        ),
-        margin=dict(l=0, r=0, t=0, b=0),
-        showlegend=False
-    )
+                         '<extra></extra>')
+        customdata = gdf_temp[['COLONIA', 'poblacion_total', 'total_filtrado']].values
+        
+        mapa = dict(z=gdf_temp['valor'].to_numpy(), customdata=customdata, hovertemplate=hovertemplate,
+                    colorbar_title=colorbar_title, colorscale=colorscale)
     
     # GRÁFICAS AUXILIARES (NO MODIFICADAS)
-    if len(df_filtrado) > 0:
-        temporal = df_filtrado.groupby(df_filtrado['Timestamp'].dt.to_period('D')).size().reset_index()
+    if total_filtrado > 0:
+        # Desde la matriz diaria; semanal/mensual si el rango es largo
+        serie, frecuencia = cubo.serie_temporal(año, mes, dia, hora, categoria, severidad, rango_dias,
+                                                max_puntos=MAX_PUNTOS_SERIE)
+        temporal = serie.reset_index()
         temporal.columns = ['Periodo', 'Incidentes']
-        temporal['Periodo'] = temporal['Periodo'].dt.to_timestamp()
         
         fig_temporal = px.line(
             temporal, 
             x='Periodo', 
             y='Incidentes',
-            title='Serie Temporal de Incidentes'
+            title=f'Serie Temporal de Incidentes ({NOMBRES_FRECUENCIA[frecuencia]})'
         )
         fig_temporal.update_traces(line_color='#e74c3c')
     else:
@@ -485,8 +490,8 @@ def actualizar_visualizacion(modo, año, mes, dia, hora, categoria, severidad, r
     
     fig_temporal.update_layout(height=300, margin=dict(l=40, r=40, t=40, b=40))
     
-    if len(df_filtrado) > 0:
-        categorias = df_filtrado['Categoria_Incidente'].value_counts().head(10).reset_index()
+    if total_filtrado > 0:
+        categorias = cubo.por_categoria(m).head(10).reset_index()
         categorias.columns = ['Categoria', 'Cantidad']
         
         fig_categorias = px.bar(
@@ -504,18 +509,160 @@ def actualizar_visualizacion(modo, año, mes, dia, hora, categoria, severidad, r
     
     fig_categorias.update_layout(height=300, margin=dict(l=40, r=40, t=40, b=40))
     
+    return mapa, stats, fig_temporal, fig_categorias
+
+
+@app.callback(
+    [Output('mapa-principal', 'figure'),
+     Output('estadisticas-panel', 'children'),
+     Output('grafica-temporal', 'figure'),
+     Output('grafica-categorias', 'figure')],
+    [Input('modo-visualizacion', 'value'),
+     Input('filtro-año', 'value'),
+     Input('filtro-mes', 'value'),
+     Input('filtro-dia', 'value'),
+     Input('filtro-hora', 'value'),
+     Input('filtro-categoria', 'value'),
+     Input('filtro-severidad', 'value'),
+     Input('slider-fechas', 'value'),
+     Input('filtro-pca-cp', 'value')],
+    [State('nivel-geometria', 'data')]
+)
+def actualizar_visualizacion(modo, año, mes, dia, hora, categoria, severidad, rango_fechas, cp_seleccionado,
+                             nivel_geometria=None):
+    """Actualizar mapa y gráficas según filtros"""
+    mapa, stats, fig_temporal, fig_categorias = calcular_vista(
+        modo, año, mes, dia, hora, categoria, severidad, rango_fechas, cp_seleccionado)
+    
+    if modo == 'puntos':
+        fig_mapa = mapa
+    elif not _figura_completa():
+        # Mismo modo que la figura en pantalla: actualización parcial, el
+        # navegador conserva la geometría y solo recibe valores
+        fig_mapa = Patch()
+        fig_mapa['data'][0]['z'] = mapa['z']
+        fig_mapa['data'][0]['customdata'] = mapa['customdata']
+        fig_mapa['data'][0]['hovertemplate'] = mapa['hovertemplate']
+        fig_mapa['data'][0]['colorbar']['title']['text'] = mapa['colorbar_title']
+        return fig_mapa, stats, fig_temporal, fig_categorias
+    else:
+        fig_mapa = go.Figure(go.Choroplethmapbox(
+            geojson=geojson_niveles[nivel_geometria or NIVEL_INICIAL],
+            locations=ids_poligonos,
+            z=mapa['z'],
+            colorscale=mapa['colorscale'],
+            marker_opacity=0.6,
+            marker_line_width=1,
+            marker_line_color='white',
+            colorbar=dict(title=mapa['colorbar_title']),
+            hovertemplate=mapa['hovertemplate'],
+            customdata=mapa['customdata']
+        ))
+    
+    # Layout del mapa
+    fig_mapa.update_layout(
+        mapbox=dict(
+            style="open-street-map",
+            center=dict(lat=29.0892, lon=-110.9615),
+            zoom=ZOOM_INICIAL
+        ),
+        margin=dict(l=0, r=0, t=0, b=0),
+        showlegend=False,
+        # Conservar zoom/centro del usuario al redibujar
+        uirevision='mapa'
+    )
+    
     return fig_mapa, stats, fig_temporal, fig_categorias
 
 
+@app.callback(
+    [Output('mapa-principal', 'figure', allow_duplicate=True),
+     Output('nivel-geometria', 'data')],
+    [Input('mapa-principal', 'relayoutData')],
+    [State('nivel-geometria', 'data'),
+     State('modo-visualizacion', 'value')],
+    prevent_initial_call=True
+)
+def ajustar_geometria(relayout, nivel_actual, modo):
+    """Cambiar el nivel de detalle de los polígonos al cruzar un umbral de zoom"""
+    zoom = (relayout or {}).get('mapbox.zoom')
+    if zoom is None:
+        return no_update, no_update
+    nivel = nivel_por_zoom(zoom)
+    if nivel == nivel_actual:
+        return no_update, no_update
+    if modo == 'puntos':
+        # Sin polígonos en pantalla: solo se recuerda el nivel para el próximo modo
+        return no_update, nivel
+    fig_mapa = Patch()
+    fig_mapa['data'][0]['geojson'] = geojson_niveles[nivel]
+    return fig_mapa, nivel
+
+
 # =============================================
 # EJECUTAR APP
 # =============================================
 
+def servir_produccion(host, port, workers):
+    """
+    Servir con varios workers WSGI (sin debug)
+
+    Con gunicorn (Linux/macOS) se usa preload: el módulo se carga una vez en
+    el proceso maestro y los workers heredan por fork el cubo y los índices
+    mapeados en memoria (solo lectura), por lo que comparten las mismas
+    páginas físicas; la caché de resultados en SQLite también es común. Sin
+    gunicorn (p. ej. Windows) se usa waitress con varios hilos en un proceso.
+    Ambos están en requirements.txt; si faltan se emite una advertencia y se
+    recurre al servidor de desarrollo de Flask.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+    
+    if BaseApplication is not None:
+        class ServidorGunicorn(BaseApplication):
+            def load_config(self):
+                self.cfg.set('bind', f'{host}:{port}')
+                self.cfg.set('workers', workers)
+                self.cfg.set('preload_app', True)
+            
+            def load(self):
+                return server
+        
+        print(f"gunicorn: {workers} workers (preload)")
+        ServidorGunicorn().run()
+        return
+    
+    try:
+        from waitress import serve
+    except ImportError:
+        warnings.warn("gunicorn/waitress no instalados (ver requirements.txt); "
+                      "se usa el servidor de desarrollo de Flask (sin debug), no apto para producción")
+        app.run(debug=False, host=host, port=port, threaded=True)
+        return
+    print(f"waitress: {workers * 4} hilos")
+    serve(server, host=host, port=port, threads=workers * 4)
+
+
 if __name__ == '__main__':
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Dashboard interactivo del índice delictivo")
+    parser.add_argument('--produccion', action='store_true',
+                        help="Servir con varios workers WSGI (gunicorn o waitress) en lugar del modo debug")
+    parser.add_argument('--workers', type=int, default=4, help="Workers de gunicorn (default: 4)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    args = parser.parse_args()
+    
     print("\n" + "="*70)
     print("🚀 INICIANDO DASHBOARD CON OPCIONES PCA SELECTIVAS (Rojo=Máximo Riesgo)")
     print("="*70)
-    print("\nAbriendo en: http://127.0.0.1:8050/")
+    print(f"\nAbriendo en: http://{args.host}:{args.port}/")
     print("Presiona Ctrl+C para detener\n")
     
-    app.run(debug=True, host='127.0.0.1', port=8050)
\ No newline at end of file
+    if args.produccion:
+        servir_produccion(args.host, args.port, args.workers)
+    else:
+        app.run(debug=True, host=args.host, port=args.port)
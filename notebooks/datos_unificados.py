@@ -0,0 +1,197 @@
+"""
+Lectura/escritura de los artefactos de data/processed/unificado/
+
+El artefacto principal es (Geo)Parquet: columnar, binario y sin reparsear
+coordenadas en texto, por lo que el mapa folium y el dashboard arrancan mucho
+más rápido que con gpd.read_file sobre el GeoJSON.
+
+    - poligonos_unificados_completo.parquet      GeoParquet de polígonos + métricas
+    - incidentes_hechos.parquet                  tabla de hechos compacta de incidentes
+    - incidentes_dim_<dimensión>.parquet         diccionarios de etiquetas por dimensión
+    - desglose_poligonos.parquet                 desglose en formato largo
+
+La tabla de hechos guarda por incidente solo el Timestamp y claves enteras
+(int8/int16/int32) a las dimensiones; las etiquetas repetidas (tipo,
+categoría, severidad, ...) viven en los diccionarios y la ubicación
+(CVE_COL, COLONIA_POLIGONO, LATITUD, LONGITUD) es una dimensión con una fila
+por punto geocodificado. cargar_incidentes_unificados() la expande a las
+columnas de siempre, con Categoricals sobre los mismos códigos.
+
+Los CSV se siguen escribiendo para análisis externos; el GeoJSON es opcional
+(unificar_datos_poligonos.py --geojson). Los lectores caen al GeoJSON/CSV si
+falta el Parquet o pyarrow.
+"""
+
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+
+project_root = Path(__file__).parent.parent
+UNIFICADO_DIR = project_root / 'data' / 'processed' / 'unificado'
+
+POLIGONOS = 'poligonos_unificados_completo'
+INCIDENTES = 'incidentes_con_poligono_temporal'
+DESGLOSE = 'desglose_poligonos'
+HECHOS = 'incidentes_hechos'
+
+# dimensión → columnas de la tabla de incidentes que agrupa
+DIMENSIONES_INCIDENTES = {
+    'ubicacion': ['CVE_COL', 'COLONIA_POLIGONO', 'LATITUD', 'LONGITUD'],
+    'tipo': ['TIPO DE INCIDENTE'],
+    'parte_dia': ['ParteDelDia'],
+    'dia_semana': ['DiaDeLaSemana'],
+    'categoria': ['Categoria_Incidente'],
+    'severidad': ['Nivel_Severidad'],
+}
+
+# Orden de columnas de la vista expandida (igual que el CSV)
+COLUMNAS_INCIDENTES = ['CVE_COL', 'COLONIA_POLIGONO', 'TIPO DE INCIDENTE', 'Timestamp',
+                       'ParteDelDia', 'DiaDeLaSemana', 'Categoria_Incidente',
+                       'Nivel_Severidad', 'LATITUD', 'LONGITUD']
+
+
+def guardar_parquet(df, nombre, data_dir=UNIFICADO_DIR):
+    """Escribir <nombre>.parquet (GeoParquet si df es GeoDataFrame); False si no hay pyarrow"""
+    ruta = Path(data_dir) / f'{nombre}.parquet'
+    try:
+        df.to_parquet(ruta, index=False)
+    except ImportError:
+        print(f"   ADVERTENCIA: pyarrow no disponible, {ruta.name} no generado")
+        return False
+    print(f"Guardado: {ruta.name}")
+    return True
+
+
+def _leer_parquet(ruta, lector, **kwargs):
+    if not ruta.exists():
+        return None
+    try:
+        return lector(ruta, **kwargs)
+    except ImportError:
+        return None
+
+
+def cargar_poligonos_unificados(data_dir=UNIFICADO_DIR):
+    """GeoDataFrame de polígonos unificados (GeoParquet, o GeoJSON como respaldo)"""
+    data_dir = Path(data_dir)
+    gdf = _leer_parquet(data_dir / f'{POLIGONOS}.parquet', gpd.read_parquet)
+    if gdf is None:
+        gdf = gpd.read_file(data_dir / f'{POLIGONOS}.geojson')
+    return gdf
+
+
+def _entero_minimo(n):
+    """Tipo entero con signo más chico que representa 0..n-1 y -1 (nulo)"""
+    for tipo in (np.int8, np.int16, np.int32):
+        if n <= np.iinfo(tipo).max:
+            return tipo
+    return np.int64
+
+
+def compactar_incidentes(incidentes):
+    """
+    Convertir la tabla de incidentes a hechos con claves enteras + diccionarios
+
+    Returns:
+        (hechos, dimensiones): hechos con Timestamp e id_<dimensión> por incidente;
+        dimensiones es un dict nombre → DataFrame (id_<dimensión> + columnas)
+    """
+    hechos = pd.DataFrame({'Timestamp': pd.to_datetime(incidentes['Timestamp']).to_numpy()})
+    dimensiones = {}
+    for nombre, columnas in DIMENSIONES_INCIDENTES.items():
+        clave = f'id_{nombre}'
+        if len(columnas) == 1:
+            codigos, etiquetas = pd.factorize(incidentes[columnas[0]], sort=True)
+            tabla = pd.DataFrame({columnas[0]: np.asarray(etiquetas)})
+        else:
+            codigos = incidentes.groupby(columnas, sort=True, dropna=False).ngroup().to_numpy()
+            primeros = np.unique(codigos, return_index=True)[1]
+            tabla = incidentes[columnas].iloc[primeros].reset_index(drop=True)
+        tabla.insert(0, clave, np.arange(len(tabla), dtype=np.int64))
+        hechos[clave] = codigos.astype(_entero_minimo(len(tabla)))
+        dimensiones[nombre] = tabla
+    return hechos, dimensiones
+
+
+def expandir_incidentes(hechos, dimensiones, columnas=None):
+    """
+    Vista con las columnas de siempre a partir de hechos + diccionarios
+
+    Las etiquetas son Categoricals sobre los códigos de la tabla de hechos (sin
+    copiar strings por fila); CVE_COL, LATITUD y LONGITUD se toman de la
+    dimensión de ubicación. Se conserva id_ubicacion para agrupar por punto.
+    """
+    columnas = COLUMNAS_INCIDENTES if columnas is None else columnas
+    datos = {}
+    ubicacion = dimensiones['ubicacion']
+    id_ubicacion = hechos['id_ubicacion'].to_numpy()
+    for columna in columnas:
+        if columna == 'Timestamp':
+            datos[columna] = hechos['Timestamp'].to_numpy()
+        elif columna in ('CVE_COL', 'LATITUD', 'LONGITUD'):
+            datos[columna] = ubicacion[columna].to_numpy()[id_ubicacion]
+        elif columna == 'COLONIA_POLIGONO':
+            codigos, etiquetas = pd.factorize(ubicacion[columna], sort=True)
+            datos[columna] = pd.Categorical.from_codes(codigos.astype(np.int32)[id_ubicacion], etiquetas)
+        else:
+            nombre = next(n for n, cols in DIMENSIONES_INCIDENTES.items() if cols == [columna])
+            etiquetas = dimensiones[nombre][columna]
+            datos[columna] = pd.Categorical.from_codes(hechos[f'id_{nombre}'].to_numpy(), etiquetas)
+    datos['id_ubicacion'] = id_ubicacion
+    return pd.DataFrame(datos)
+
+
+def guardar_incidentes_compactos(incidentes, data_dir=UNIFICADO_DIR):
+    """Escribir la tabla de hechos y un diccionario por dimensión; False si no hay pyarrow"""
+    hechos, dimensiones = compactar_incidentes(incidentes)
+    if not guardar_parquet(hechos, HECHOS, data_dir):
+        return False
+    for nombre, tabla in dimensiones.items():
+        guardar_parquet(tabla, f'incidentes_dim_{nombre}', data_dir)
+    return True
+
+
+def cargar_incidentes_compactos(data_dir=UNIFICADO_DIR):
+    """(hechos, dimensiones) tal como están en disco, o None si no existen"""
+    data_dir = Path(data_dir)
+    hechos = _leer_parquet(data_dir / f'{HECHOS}.parquet', pd.read_parquet)
+    if hechos is None:
+        return None
+    dimensiones = {
+        nombre: pd.read_parquet(data_dir / f'incidentes_dim_{nombre}.parquet')
+        for nombre in DIMENSIONES_INCIDENTES
+    }
+    return hechos, dimensiones
+
+
+def cargar_incidentes_unificados(data_dir=UNIFICADO_DIR, columnas=None):
+    """
+    Incidentes con CVE_COL y Timestamp como datetime
+
+    Lee la tabla de hechos compacta (vista con Categoricals); si no existe, el
+    Parquet plano o el CSV de incidentes.
+    """
+    data_dir = Path(data_dir)
+    compactos = cargar_incidentes_compactos(data_dir)
+    if compactos is not None:
+        return expandir_incidentes(*compactos, columnas=columnas)
+    df = _leer_parquet(data_dir / f'{INCIDENTES}.parquet', pd.read_parquet, columns=columnas)
+    if df is None:
+        df = pd.read_csv(data_dir / f'{INCIDENTES}.csv', usecols=columnas)
+    if 'Timestamp' in df.columns:
+        df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+    return df
+
+
+def cargar_desglose(data_dir=UNIFICADO_DIR):
+    """Desglose por polígono en formato largo (vacío si aún no se ha generado)"""
+    data_dir = Path(data_dir)
+    df = _leer_parquet(data_dir / f'{DESGLOSE}.parquet', pd.read_parquet)
+    if df is None and (data_dir / f'{DESGLOSE}.csv').exists():
+        df = pd.read_csv(data_dir / f'{DESGLOSE}.csv')
+    if df is None:
+        df = pd.DataFrame(columns=['CVE_COL', 'dimension', 'valor', 'incidentes'])
+    return df
@@ -8,10 +8,11 @@ Diagnóstico: Analizar demografías que NO cayeron en polígonos
 
 import pandas as pd
 import geopandas as gpd
-from shapely import wkt
 from pathlib import Path
 import numpy as np
 
+from almacen_poligonos import cargar_almacen
+
 def cargar_datos():
     """Cargar datos necesarios"""
     print("="*70)
@@ -22,12 +23,7 @@ def cargar_datos():
     
     # Polígonos
     print("\n[1/3] Polígonos...")
-    poligonos = pd.read_csv(project_root / 'data' / 'raw' / 'poligonos_hermosillo.csv')
-    gdf_poligonos = gpd.GeoDataFrame(
-        poligonos,
-        geometry=poligonos['geometry'].apply(wkt.loads),
-        crs='EPSG:4326'
-    )
+    gdf_poligonos = cargar_almacen().gdf.copy()
     print(f"   {len(gdf_poligonos):,} polígonos")
     
     # Demografía
@@ -63,13 +59,15 @@ def spatial_join_con_diagnostico(gdf_poligonos, demografia, demografia_coords):
         crs='EPSG:4326'
     )
     
-    # Spatial join
+    # Spatial join (índice persistido del almacén de polígonos)
     print("\nRealizando spatial join...")
-    demo_en_poli = gpd.sjoin(
-        gdf_demografia.rename(columns={'nom_col': 'nom_col_demo'}),
-        gdf_poligonos[['cve_col', 'nom_col', 'geometry']].rename(columns={'nom_col': 'nom_col_poli'}),
-        how='left',
-        predicate='within'
+    pos = cargar_almacen().localizar_indices(gdf_demografia)
+    con_match = pos >= 0
+    poligono = gdf_poligonos.iloc[np.maximum(pos, 0)]
+    demo_en_poli = gdf_demografia.rename(columns={'nom_col': 'nom_col_demo'}).assign(
+        index_right=np.where(con_match, poligono.index, np.nan),
+        cve_col=np.where(con_match, poligono['cve_col'].to_numpy(dtype=float), np.nan),
+        nom_col_poli=np.where(con_match, poligono['nom_col'].to_numpy(), None)
     )
     
     # Separar exitosos vs fallidos
@@ -5,10 +5,12 @@ Investigar por qué 255 polígonos (36.8%) no tienen datos demográficos
 
 import pandas as pd
 import geopandas as gpd
-from shapely import wkt
 from pathlib import Path
 import numpy as np
 
+from almacen_poligonos import cargar_almacen
+from datos_unificados import cargar_poligonos_unificados
+
 def cargar_datos():
     """Cargar datos necesarios"""
     print("="*70)
@@ -19,28 +21,12 @@ def cargar_datos():
     
     # Polígonos unificados
     print("\n[1/4] Polígonos unificados...")
-    gdf_unificado = gpd.read_file(
-        project_root / 'data' / 'processed' / 'unificado' / 'poligonos_unificados_completo.geojson'
-    )
+    gdf_unificado = cargar_poligonos_unificados()
     print(f"   {len(gdf_unificado):,} polígonos")
     
     # Polígonos originales
     print("\n[2/4] Polígonos originales...")
-    poligonos = pd.read_csv(project_root / 'data' / 'raw' / 'poligonos_hermosillo.csv')
-
-    # Detectar columna WKT y convertir a geometría (acepta 'POLIGONO_WKT' o 'geometry')
-    if 'POLIGONO_WKT' in poligonos.columns:
-        wkt_col = 'POLIGONO_WKT'
-    elif 'geometry' in poligonos.columns:
-        wkt_col = 'geometry'
-    else:
-        raise KeyError("No WKT column found in poligonos_hermosillo.csv (expected 'POLIGONO_WKT' or 'geometry')")
-
-    gdf_poligonos = gpd.GeoDataFrame(
-        poligonos,
-        geometry=poligonos[wkt_col].apply(wkt.loads),
-        crs='EPSG:4326'
-    )
+    gdf_poligonos = cargar_almacen().gdf.copy()
 
     # Normalizar nombres de columnas para compatibilidad con el resto del script
     col_map = {}
@@ -245,12 +231,13 @@ def analizar_area_geografica(sin_demo, con_demo):
     print("ANÁLISIS GEOGRÁFICO")
     print("="*70)
     
-    # Calcular área
-    sin_demo_utm = sin_demo.to_crs('EPSG:32612')
-    con_demo_utm = con_demo.to_crs('EPSG:32612')
+    # Área proyectada y centroides precalculados en el almacén de polígonos
+    almacen = cargar_almacen()
+    geo_sin_demo = almacen.geometria_por_cve(sin_demo['CVE_COL'])
+    geo_con_demo = almacen.geometria_por_cve(con_demo['CVE_COL'])
     
-    area_sin_demo = sin_demo_utm.geometry.area.sum() / 1e6  # km²
-    area_con_demo = con_demo_utm.geometry.area.sum() / 1e6
+    area_sin_demo = geo_sin_demo['area_km2'].sum()  # km²
+    area_con_demo = geo_con_demo['area_km2'].sum()
     
     print(f"\n📏 Área total:")
     print(f"   Con demografía: {area_con_demo:.2f} km²")
@@ -261,12 +248,13 @@ def analizar_area_geografica(sin_demo, con_demo):
     # Calcular centroide de Hermosillo
     centro_hermosillo = [29.0892, -110.9615]
     
-    # Distancia promedio al centro
-    from shapely.geometry import Point
-    centro_point = Point(centro_hermosillo[1], centro_hermosillo[0])
+    # Distancia promedio al centro (grados → km aprox)
+    def distancia_centro(geo):
+        return np.hypot(geo['centroide_x'].to_numpy() - centro_hermosillo[1],
+                        geo['centroide_y'].to_numpy() - centro_hermosillo[0]) * 111
     
-    sin_demo['dist_centro'] = sin_demo.geometry.centroid.distance(centro_point) * 111  # km aprox
-    con_demo['dist_centro'] = con_demo.geometry.centroid.distance(centro_point) * 111
+    sin_demo['dist_centro'] = distancia_centro(geo_sin_demo)
+    con_demo['dist_centro'] = distancia_centro(geo_con_demo)
     
     print(f"\n📍 Distancia al centro de Hermosillo:")
     print(f"   Con demografía: {con_demo['dist_centro'].mean():.2f} km promedio")
@@ -6,9 +6,10 @@ Investigar la calidad del matching entre nombres de colonias
 import pandas as pd
 import geopandas as gpd
 from pathlib import Path
-from shapely import wkt
 import numpy as np
 
+from almacen_poligonos import cargar_almacen
+
 def cargar_datos():
     """Cargar todos los datasets"""
     project_root = Path(__file__).parent.parent
@@ -74,18 +75,10 @@ def analizar_spatial_join(poligonos, reportes, coords, mapeo):
     print("ANÁLISIS SPATIAL JOIN")
     print("="*70)
     
-    # Crear GeoDataFrame de polígonos
-    print("\nCreando GeoDataFrame de polígonos...")
-    if 'POLIGONO_WKT' in poligonos.columns:
-        wkt_col = 'POLIGONO_WKT'
-    elif 'geometry' in poligonos.columns:
-        wkt_col = 'geometry'
-    
-    gdf_poligonos = gpd.GeoDataFrame(
-        poligonos,
-        geometry=poligonos[wkt_col].apply(wkt.loads),
-        crs='EPSG:4326'
-    )
+    # GeoDataFrame de polígonos desde el almacén persistente
+    print("\nCargando almacén de polígonos...")
+    almacen = cargar_almacen()
+    gdf_poligonos = almacen.gdf.copy()
     
     # Normalizar columnas
     if 'cve_col' in gdf_poligonos.columns:
@@ -116,13 +109,10 @@ def analizar_spatial_join(poligonos, reportes, coords, mapeo):
     
     print(f"  Reportes con coordenadas: {len(gdf_reportes):,}")
     
-    # Spatial join
+    # Spatial join (índice persistido del almacén de polígonos)
     print("\nRealizando spatial join...")
-    incidentes_en_poligonos = gpd.sjoin(
-        gdf_reportes,
-        gdf_poligonos[['CVE_COL', 'COLONIA', 'geometry']],
-        how='left',
-        predicate='within'
+    incidentes_en_poligonos = gdf_reportes.assign(
+        CVE_COL=almacen.locate((gdf_reportes['LONGITUD'], gdf_reportes['LATITUD']))
     )
     
     con_poligono = incidentes_en_poligonos['CVE_COL'].notna().sum()
@@ -0,0 +1,111 @@
+"""
+Runner del pipeline en un solo proceso de Python
+
+Equivalente a run_pipeline.ps1 pero ejecutando cada etapa en proceso
+(importando el módulo y llamando a su función principal), de modo que no se
+paga el arranque del intérprete ni la importación de pandas/geopandas por etapa.
+
+Uso:
+    python notebooks/ejecutar_pipeline.py
+    python notebooks/ejecutar_pipeline.py --desde unificar
+    GEOCODIFICADOR=centroides python notebooks/ejecutar_pipeline.py
+"""
+
+import argparse
+import importlib
+from pathlib import Path
+import time
+
+from servicio_geocodificacion import crear_servicio
+
+
+project_root = Path(__file__).parent.parent
+
+
+def etapa_poligonos():
+    if (project_root / 'data' / 'raw' / 'poligonos_hermosillo.csv').exists():
+        print("✅ Archivo de polígonos ya existe. Omitiendo procesamiento.")
+        return
+    importlib.import_module('colonias_poligonos').main()
+
+
+def etapa_descarga():
+    modulo = importlib.import_module('download_raw_data')
+    raw_dir = project_root / 'data' / 'raw'
+    if (raw_dir / modulo.OUTPUT_FILE).exists():
+        print("✅ Archivo raw ya existe. Omitiendo descarga.")
+        return
+    if modulo.fetch_and_consolidate_raw_data(output_dir=raw_dir) is None:
+        raise RuntimeError("download_raw_data: no se pudo descargar el archivo raw")
+
+
+def etapa_interim():
+    modulo = importlib.import_module('make_interim_data')
+    ok = modulo.process_raw_to_interim(
+        input_dir=project_root / 'data' / 'raw',
+        output_dir=project_root / 'data' / 'interim',
+    )
+    if not ok:
+        raise RuntimeError("make_interim_data: error durante el procesamiento")
+
+
+def etapa_geocodificar(servicio):
+    importlib.import_module('geocodificar_colonias_reportes_911').main(servicio=servicio)
+
+
+def etapa_unificar():
+    importlib.import_module('unificar_datos_poligonos').main()
+
+
+def etapa_mapa():
+    importlib.import_module('mapa_interactivo_folium_avanzado').main()
+
+
+ETAPAS = [
+    ('poligonos', etapa_poligonos),
+    ('descarga', etapa_descarga),
+    ('interim', etapa_interim),
+    ('geocodificar', etapa_geocodificar),
+    ('unificar', etapa_unificar),
+    ('mapa', etapa_mapa),
+]
+
+
+def ejecutar(desde=None, hasta=None, servicio=None):
+    """Ejecutar las etapas del pipeline en orden dentro del proceso actual"""
+    nombres = [nombre for nombre, _ in ETAPAS]
+    inicio_idx = nombres.index(desde) if desde else 0
+    fin_idx = nombres.index(hasta) if hasta else len(ETAPAS) - 1
+
+    if servicio is None:
+        servicio = crear_servicio()
+
+    inicio_total = time.time()
+    for i, (nombre, funcion) in enumerate(ETAPAS[inicio_idx:fin_idx + 1], start=inicio_idx):
+        print("\n" + "=" * 70)
+        print(f"[{i}/{len(ETAPAS) - 1}] ETAPA: {nombre}")
+        print("=" * 70)
+        inicio = time.time()
+        if nombre == 'geocodificar':
+            funcion(servicio)
+        else:
+            funcion()
+        print(f"✓ Etapa '{nombre}' completada en {time.time() - inicio:.1f} s")
+
+    print(f"\n✅ Pipeline completado en {time.time() - inicio_total:.1f} s")
+
+
+def main():
+    nombres = [nombre for nombre, _ in ETAPAS]
+    parser = argparse.ArgumentParser(description="Pipeline completo en un solo proceso")
+    parser.add_argument('--desde', choices=nombres, help="Etapa inicial")
+    parser.add_argument('--hasta', choices=nombres, help="Etapa final")
+    parser.add_argument('--geocodificador', choices=['google', 'centroides', 'local'],
+                        help="Backend de geocodificación (default: GEOCODIFICADOR o 'google')")
+    args = parser.parse_args()
+
+    ejecutar(desde=args.desde, hasta=args.hasta, servicio=crear_servicio(args.geocodificador))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,61 +4,35 @@ Procesa el archivo de colonias únicas del dataset demográfico
 """
 
 import pandas as pd
-import googlemaps
 import time
-import os
 from datetime import datetime
-from dotenv import load_dotenv
 
+from servicio_geocodificacion import ServicioGeocodificacion, crear_servicio
 
-# Cargar variables de entorno desde archivo .env
-load_dotenv()
 
-# Configurar API key de Google Maps desde variable de entorno
-API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY')
-
-if not API_KEY:
-    raise ValueError(
-        "❌ ERROR: No se encontró la variable de entorno GOOGLE_MAPS_API_KEY\n"
-        "Por favor, crea un archivo .env en la raíz del proyecto con:\n"
-        "GOOGLE_MAPS_API_KEY=tu_api_key_aqui"
-    )
-
-gmaps = googlemaps.Client(key=API_KEY)
-
-
-def obtener_coordenadas_google(colonia, ciudad="Hermosillo", estado="Sonora", pais="México"):
+def obtener_coordenadas_google(colonia, ciudad="Hermosillo", estado="Sonora", pais="México",
+                               servicio=None):
     """
-    Obtiene coordenadas y información de una colonia usando Google Maps Geocoding API
+    Obtiene coordenadas y información de una colonia usando el servicio de geocodificación
+    (Google Maps Geocoding API por defecto)
     
     Args:
         colonia: Nombre de la colonia
         ciudad: Ciudad (default: Hermosillo)
         estado: Estado (default: Sonora)
         pais: País (default: México)
+        servicio: ServicioGeocodificacion a usar (default: el configurado por entorno)
     
     Returns:
         tuple: (dict con información de ubicación, tipo de resultado)
                tipo de resultado: 'success', 'not_found', 'error'
     """
-    # Construir la dirección
-    direccion = f"{colonia}, {ciudad}, {estado}, {pais}"
-    
-    try:
-        # Geocodificar
-        resultado = gmaps.geocode(direccion)
-        
-        if resultado:
-            return resultado[0], 'success'
-        else:
-            print(f"  ⚠️  No se encontró: {colonia}")
-            return None, 'not_found'
-    except Exception as e:
-        print(f"  ❌ Error con {colonia}: {e}")
-        return None, 'error'
+    if servicio is None:
+        servicio = crear_servicio()
+    return ServicioGeocodificacion(servicio.backend, ciudad, estado, pais).geocodificar(colonia)
 
 
-def procesar_colonias(archivo_colonias, archivo_salida, limite=None, delay=0.1):
+def procesar_colonias(archivo_colonias, archivo_salida, limite=None, delay=0.1, servicio=None):
     """
     Procesa el archivo de colonias únicas y obtiene coordenadas para cada una
     
@@ -67,7 +41,11 @@ def procesar_colonias(archivo_colonias, archivo_salida, limite=None, delay=0.1):
         archivo_salida: Ruta donde guardar el resultado
         limite: Número máximo de colonias a procesar (None = todas)
         delay: Segundos de espera entre peticiones (para no exceder límites de API)
+        servicio: ServicioGeocodificacion a usar (default: el configurado por entorno)
     """
+    if servicio is None:
+        servicio = crear_servicio()
+    
     print("="*70)
     print("GEOCODIFICACIÓN DE COLONIAS - DEMOGRAFÍA HERMOSILLO")
     print("="*70)
@@ -84,7 +62,7 @@ def procesar_colonias(archivo_colonias, archivo_salida, limite=None, delay=0.1):
         df_colonias = df_colonias.head(limite)
         print(f"⚠️  Limitando a: {limite} colonias")
     
-    print(f"\n🌍 Iniciando geocodificación...")
+    print(f"\n🌍 Iniciando geocodificación (backend: {servicio.nombre})...")
     print(f"⏱️  Delay entre peticiones: {delay}s")
     print("-"*70)
     
@@ -106,7 +84,7 @@ def procesar_colonias(archivo_colonias, archivo_salida, limite=None, delay=0.1):
             print(f"Procesando: {idx + 1}/{len(df_colonias)} ({(idx+1)/len(df_colonias)*100:.1f}%)")
         
         # Obtener coordenadas
-        info, tipo_resultado = obtener_coordenadas_google(colonia)
+        info, tipo_resultado = servicio.geocodificar(colonia)
         
         if tipo_resultado == 'success':
             # Extraer información relevante
@@ -190,7 +168,11 @@ def procesar_colonias(archivo_colonias, archivo_salida, limite=None, delay=0.1):
     return df_resultados
 
 
-def main():
+def main(servicio=None):
+    """Geocodificación completa; importable desde el runner del pipeline"""
+    if servicio is None:
+        servicio = crear_servicio()
+    
     # Rutas de archivos (usar rutas absolutas basadas en directorio del script)
     from pathlib import Path
     script_dir = Path(__file__).parent
@@ -207,7 +189,8 @@ def main():
         archivo_colonias=str(archivo_colonias),
         archivo_salida=str(archivo_salida),
         limite=None,  # None = procesar todas las colonias
-        delay=0.2     # 0.2 segundos entre peticiones (más seguro)
+        delay=0.2 if servicio.nombre == 'google' else 0,  # 0.2 s entre peticiones a la API
+        servicio=servicio
     )
     
     # Mostrar ejemplos de resultados exitosos
@@ -4,77 +4,44 @@ Procesa el archivo de colonias únicas y genera un archivo con coordenadas
 """
 
 import pandas as pd
-import googlemaps
 import time
 import os
-import sys
 from datetime import datetime
-from dotenv import load_dotenv
 from pathlib import Path
 
+from servicio_geocodificacion import ServicioGeocodificacion, crear_servicio
 
-# Cargar variables de entorno desde archivo .env
-load_dotenv()
 
-# --- DEFINICIÓN DE RUTAS GLOBALES (MOVIDA AQUÍ) ---
+# --- DEFINICIÓN DE RUTAS GLOBALES ---
 project_root = Path(__file__).parent.parent
 archivo_colonias = project_root / 'data' / 'processed' / 'colonias_unicas_reportes_911.csv'
 archivo_salida = project_root / 'data' / 'processed' / 'colonias_reportes_911_con_coordenadas.csv'
 # ---------------------------------------------------
 
 
-# Configurar API key de Google Maps desde variable de entorno
-API_KEY = os.environ.get('GOOGLE_MAPS_API_KEY')
-
-if not API_KEY:
-    # Lógica de omisión si la clave no está
-    if archivo_salida.exists():
-        print(f"⚠️  ADVERTENCIA: Clave API no encontrada. Saltando geocodificación.")
-        print(f"✅ Continuando porque el archivo de salida requerido ya existe: {archivo_salida}")
-        sys.exit(0) # Salir con código 0 (éxito)
-    else:
-        # Si la clave no está Y el archivo tampoco existe, lanzamos el error original
-        raise ValueError(
-            "❌ ERROR: No se encontró la variable de entorno GOOGLE_MAPS_API_KEY\n"
-            "Y el archivo de coordenadas no existe. ¡No se puede continuar!\n"
-            "Por favor, crea un archivo .env o asegura la existencia del archivo de salida."
-        )
-
-gmaps = googlemaps.Client(key=API_KEY)
-
-
-def obtener_coordenadas_google(colonia, ciudad="Hermosillo", estado="Sonora", pais="México"):
+def obtener_coordenadas_google(colonia, ciudad="Hermosillo", estado="Sonora", pais="México",
+                               servicio=None):
     """
-    Obtiene coordenadas y información de una colonia usando Google Maps Geocoding API
+    Obtiene coordenadas y información de una colonia usando el servicio de geocodificación
+    (Google Maps Geocoding API por defecto)
     
     Args:
         colonia: Nombre de la colonia
         ciudad: Ciudad (default: Hermosillo)
         estado: Estado (default: Sonora)
         pais: País (default: México)
+        servicio: ServicioGeocodificacion a usar (default: el configurado por entorno)
     
     Returns:
         tuple: (dict con información de ubicación, tipo de resultado)
                tipo de resultado: 'success', 'not_found', 'error'
     """
-    # Construir la dirección
-    direccion = f"{colonia}, {ciudad}, {estado}, {pais}"
-    
-    try:
-        # Geocodificar
-        resultado = gmaps.geocode(direccion)
-        
-        if resultado:
-            return resultado[0], 'success'
-        else:
-            print(f"  ⚠️  No se encontró: {colonia}")
-            return None, 'not_found'
-    except Exception as e:
-        print(f"  ❌ Error con {colonia}: {e}")
-        return None, 'error'
+    if servicio is None:
+        servicio = crear_servicio()
+    return ServicioGeocodificacion(servicio.backend, ciudad, estado, pais).geocodificar(colonia)
 
 
-def procesar_colonias(archivo_colonias, archivo_salida, limite=None, delay=0.1):
+def procesar_colonias(archivo_colonias, archivo_salida, limite=None, delay=0.1, servicio=None):
     """
     Procesa el archivo de colonias únicas y obtiene coordenadas para cada una.
     Si el archivo de salida existe, solo procesa colonias nuevas (modo incremental).
@@ -84,7 +51,11 @@ def procesar_colonias(archivo_colonias, archivo_salida, limite=None, delay=0.1):
         archivo_salida: Ruta donde guardar el resultado
         limite: Número máximo de colonias a procesar (None = todas)
         delay: Segundos de espera entre peticiones (para no exceder límites de API)
+        servicio: ServicioGeocodificacion a usar (default: el configurado por entorno)
     """
+    if servicio is None:
+        servicio = crear_servicio()
+    
     print("="*70)
     print("GEOCODIFICACIÓN DE COLONIAS - HERMOSILLO, SONORA")
     print("="*70)
@@ -129,7 +100,7 @@ def procesar_colonias(archivo_colonias, archivo_salida, limite=None, delay=0.1):
     no_encontradas = 0
     errores = 0
     
-    print(f"\n🌍 Iniciando geocodificación...")
+    print(f"\n🌍 Iniciando geocodificación (backend: {servicio.nombre})...")
     print(f"⏱️  Delay entre peticiones: {delay}s")
     print("-"*70)
     
@@ -143,7 +114,7 @@ def procesar_colonias(archivo_colonias, archivo_salida, limite=None, delay=0.1):
             print(f"Procesando: {contador}/{len(df_colonias)} ({contador/len(df_colonias)*100:.1f}%)")
         
         # Obtener coordenadas
-        info, tipo_resultado = obtener_coordenadas_google(colonia)
+        info, tipo_resultado = servicio.geocodificar(colonia)
         
         if tipo_resultado == 'success':
             # Extraer información relevante
@@ -235,10 +206,24 @@ def procesar_colonias(archivo_colonias, archivo_salida, limite=None, delay=0.1):
     return df_resultados, df_resultados_nuevos
 
 
-def main():
-    # Rutas de archivos usando Path para resolver rutas absolutas
-    archivo_colonias = project_root / 'data' / 'processed' / 'colonias_unicas_reportes_911.csv'
-    archivo_salida = project_root / 'data' / 'processed' / 'colonias_reportes_911_con_coordenadas.csv'
+def main(servicio=None):
+    """Geocodificación incremental; importable desde el runner del pipeline"""
+    if servicio is None:
+        servicio = crear_servicio()
+    
+    # Sin API key: omitir si el archivo de salida requerido ya existe
+    if servicio.nombre == 'google' and not servicio.disponible:
+        if archivo_salida.exists():
+            print(f"⚠️  ADVERTENCIA: Clave API no encontrada. Saltando geocodificación.")
+            print(f"✅ Continuando porque el archivo de salida requerido ya existe: {archivo_salida}")
+            return
+        # Si la clave no está Y el archivo tampoco existe, lanzamos el error original
+        raise ValueError(
+            "❌ ERROR: No se encontró la variable de entorno GOOGLE_MAPS_API_KEY\n"
+            "Y el archivo de coordenadas no existe. ¡No se puede continuar!\n"
+            "Por favor, crea un archivo .env, asegura la existencia del archivo de salida\n"
+            "o usa un backend offline (GEOCODIFICADOR=centroides)."
+        )
     
     # Procesar colonias (modo incremental automático)
     print("\n🌍 GEOCODIFICACIÓN INCREMENTAL")
@@ -249,7 +234,8 @@ def main():
         archivo_colonias=str(archivo_colonias),
         archivo_salida=str(archivo_salida),
         limite=None,  # None = procesar todas las colonias nuevas
-        delay=0.2     # 0.2 segundos entre peticiones (más seguro)
+        delay=0.2 if servicio.nombre == 'google' else 0,  # 0.2 s entre peticiones a la API
+        servicio=servicio
     )
     
     # Mostrar ejemplos de resultados exitosos (solo de nuevas geocodificaciones)
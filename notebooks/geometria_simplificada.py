@@ -0,0 +1,158 @@
+"""
+Niveles de geometría simplificada de los polígonos según el zoom
+
+Las geometrías INE a resolución completa (~25k vértices, ~1 MB de GeoJSON)
+son más detalle del que se distingue a zoom de ciudad. Se precalculan tres
+niveles con simplificación de cobertura (shapely.coverage_simplify): los
+bordes compartidos entre colonias vecinas se simplifican una sola vez, así
+que no aparecen huecos ni traslapes entre ellas.
+
+coverage_simplify solo garantiza eso si la entrada ya es una cobertura válida,
+y los polígonos INE no lo son: hay colonias dentro de otras sin el hueco
+correspondiente y bordes vecinos cuyos vértices no coinciden. Por eso antes
+de simplificar se repara (reparar_cobertura): las coordenadas se ajustan a la
+rejilla del nivel (shapely.set_precision) y cada traslape se recorta del
+polígono mayor, de modo que la colonia contenida queda completa. El resultado
+se comprueba con shapely.coverage_is_valid; si la reparación o la
+simplificación no dejan una cobertura válida se lanza ValueError en lugar de
+publicar geometrías con huecos o traslapes.
+
+Los niveles son solo para dibujar: la asignación de incidentes a polígonos
+(almacen_poligonos) usa las geometrías originales.
+
+    nivel   tolerancia          rejilla          zoom
+    bajo    1e-4° (~10 m)       1e-5° (~1 m)     < 12
+    medio   3e-5° (~3 m)        1e-5°            12-14
+    alto    sin simplificar     1e-6° (~0.1 m)   >= 14
+
+Se guardan en data/processed/unificado/poligonos_geometria_niveles.parquet
+(CVE_COL, nivel, geometry); si no existe se calculan al cargar (~1 s).
+"""
+
+import json
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from datos_unificados import UNIFICADO_DIR, _leer_parquet
+
+
+NIVELES_GEOMETRIA = 'poligonos_geometria_niveles'
+
+# nivel → (tolerancia de simplificación, tamaño de rejilla), en grados
+NIVELES = {
+    'bajo': (1e-4, 1e-5),
+    'medio': (3e-5, 1e-5),
+    'alto': (0.0, 1e-6),
+}
+
+# (zoom mínimo, nivel), de mayor a menor zoom
+ZOOM_NIVELES = [(14, 'alto'), (12, 'medio'), (0, 'bajo')]
+
+
+def nivel_por_zoom(zoom):
+    """Nivel de geometría para un zoom de mapa (mapbox/leaflet)"""
+    for minimo, nivel in ZOOM_NIVELES:
+        if zoom >= minimo:
+            return nivel
+    return ZOOM_NIVELES[-1][1]
+
+
+def reparar_cobertura(geometrias, rejilla):
+    """
+    Convertir polígonos vecinos en una cobertura válida: ajustar a la rejilla
+    y recortar cada traslape del polígono de mayor área
+
+    Raises:
+        ValueError: si tras la reparación no es una cobertura válida
+    """
+    geometrias = shapely.set_precision(np.asarray(geometrias), rejilla)
+    i, j = shapely.STRtree(geometrias).query(geometrias, predicate='intersects')
+    area = shapely.area(geometrias)
+    # i pierde el traslape con j cuando es mayor (a igual área, el de índice mayor)
+    mayor = (area[i] > area[j]) | ((area[i] == area[j]) & (i > j))
+    i, j = i[mayor], j[mayor]
+    # Traslape = los interiores se intersecan (tocarse en el borde no cuenta)
+    traslapa = shapely.relate_pattern(geometrias[i], geometrias[j], 'T********')
+    i, j = i[traslapa], j[traslapa]
+
+    geometrias = geometrias.copy()
+    for indice in np.unique(i):
+        geometrias[indice] = shapely.difference(
+            geometrias[indice], shapely.union_all(geometrias[j[i == indice]]), grid_size=rejilla)
+    # El polígono menor conserva su área, pero necesita los vértices nuevos del
+    # recorte sobre su borde para que los bordes compartidos coincidan
+    for indice in np.unique(j):
+        geometrias[indice] = shapely.difference(
+            geometrias[indice], shapely.union_all(geometrias[i[j == indice]]), grid_size=rejilla)
+    _validar_cobertura(geometrias, 'reparación')
+    return geometrias
+
+
+def _validar_cobertura(geometrias, etapa):
+    if not shapely.coverage_is_valid(geometrias):
+        bordes = shapely.coverage_invalid_edges(geometrias)
+        invalidos = np.flatnonzero(~shapely.is_empty(bordes))
+        raise ValueError(f"Cobertura inválida tras la {etapa}: {len(invalidos)} polígonos con bordes "
+                         f"que no coinciden (posiciones {invalidos[:10].tolist()})")
+
+
+def simplificar_cobertura(geometrias, tolerancia, rejilla):
+    """
+    Simplificar un conjunto de polígonos vecinos conservando bordes compartidos
+
+    La entrada se repara con reparar_cobertura; el resultado es una cobertura
+    válida (sin huecos ni traslapes entre polígonos) ajustada a la rejilla.
+
+    Raises:
+        RuntimeError: si shapely no tiene coverage_simplify (requiere >= 2.1)
+        ValueError: si el resultado no es una cobertura válida
+    """
+    if tolerancia > 0 and not hasattr(shapely, 'coverage_simplify'):
+        raise RuntimeError("shapely.coverage_simplify no disponible (requiere shapely >= 2.1); "
+                           "actualice shapely para calcular los niveles de geometría")
+    geometrias = reparar_cobertura(geometrias, rejilla)
+    if tolerancia > 0:
+        geometrias = shapely.set_precision(shapely.coverage_simplify(geometrias, tolerancia), rejilla)
+        _validar_cobertura(geometrias, 'simplificación')
+    return geometrias
+
+
+def calcular_niveles(gdf_poligonos):
+    """GeoDataFrame largo (CVE_COL, nivel, geometry) con todos los niveles"""
+    partes = []
+    for nivel, (tolerancia, rejilla) in NIVELES.items():
+        partes.append(gpd.GeoDataFrame({
+            'CVE_COL': gdf_poligonos['CVE_COL'].to_numpy(),
+            'nivel': nivel,
+        }, geometry=simplificar_cobertura(gdf_poligonos.geometry.values, tolerancia, rejilla),
+            crs=gdf_poligonos.crs))
+    return pd.concat(partes, ignore_index=True)
+
+
+def cargar_niveles(gdf_poligonos, data_dir=UNIFICADO_DIR):
+    """
+    dict nivel → GeoSeries indexada como gdf_poligonos (precalculados si
+    existen y cubren los mismos CVE_COL; si no, se calculan)
+    """
+    niveles = _leer_parquet(Path(data_dir) / f'{NIVELES_GEOMETRIA}.parquet', gpd.read_parquet)
+    if niveles is None or not set(gdf_poligonos['CVE_COL']) <= set(niveles['CVE_COL']):
+        niveles = calcular_niveles(gdf_poligonos)
+    resultado = {}
+    for nivel, grupo in niveles.groupby('nivel', sort=False):
+        geometria = grupo.set_index('CVE_COL').geometry
+        resultado[nivel] = gpd.GeoSeries(geometria.reindex(gdf_poligonos['CVE_COL']).to_numpy(),
+                                         index=gdf_poligonos.index, crs=niveles.crs)
+    return resultado
+
+
+def geojson_por_nivel(gdf_poligonos, niveles):
+    """dict nivel → FeatureCollection (solo geometría, id de feature = CVE_COL)"""
+    ids = gdf_poligonos['CVE_COL'].astype(str).to_numpy()
+    return {
+        nivel: json.loads(gpd.GeoSeries(geometria.to_numpy(), index=ids, crs=geometria.crs).to_json())
+        for nivel, geometria in niveles.items()
+    }
@@ -0,0 +1,217 @@
+"""
+Índices por dimensión para seleccionar incidentes individuales
+
+El modo puntos del dashboard necesita las filas de incidentes (no solo
+conteos). En lugar de comparar columnas completas en cada callback, se
+construyen al arrancar:
+
+    - tiempo: posiciones ordenadas por día con offsets por día (calculados
+      una vez con searchsorted); los filtros año/mes/día y el rango del
+      slider de fechas se resuelven como rangos [inicio, fin) de códigos de
+      día (año, año+mes y el slider con searchsorted sobre la tabla de días,
+      sin recorrerla) y cada rango es una rebanada de ese orden entre dos
+      offsets.
+      Si la tabla ya viene ordenada por Timestamp, esos rangos son
+      directamente rebanadas de filas. Los incidentes sin fecha (código de
+      día -1) quedan antes del día 0 en ese orden, fuera de todo rango: no
+      los devuelve ningún filtro de fecha
+    - hora, categoría, severidad: listas de posiciones por valor (un solo
+      argsort estable por dimensión + offsets, tipo CSR)
+
+Una combinación de filtros se resuelve tomando el índice más selectivo y
+verificando los demás solo sobre esos candidatos (gather sobre los códigos).
+
+    indice = IndiceIncidentes.desde_incidentes(df_incidentes)
+    filas = indice.filtrar(año=2021, hora=14, severidad='ALTA')
+    df_incidentes.take(filas)
+    indice.por_ubicacion(filas)      # un renglón por punto geocodificado
+"""
+
+import numpy as np
+import pandas as pd
+
+from cubo_incidentes import _codigos, _sin_filtro, codificar_dias, codificar_horas, codificar_ubicacion, seleccionar_dias
+
+
+def rangos_dias(dias, año=None, mes=None, dia=None, rango_dias=None):
+    """
+    Rangos [inicio, fin) de códigos de día (arreglo n×2, ascendente) para los
+    filtros de fecha, o None si no restringen nada (igual que filtro_fechas)
+
+    Año, año+mes y el rango del slider son un solo rango, que se obtiene con
+    searchsorted sobre la tabla de días (ordenada). Mes sin año o día del
+    mes dan un rango por año/mes; esos se toman de la máscara de días.
+    """
+    n = len(dias)
+    if rango_dias is not None and rango_dias[0] <= 0 and rango_dias[1] >= n - 1:
+        rango_dias = None
+    if _sin_filtro(año) and _sin_filtro(mes) and _sin_filtro(dia) and rango_dias is None:
+        return None
+    if not _sin_filtro(dia) or (_sin_filtro(año) and not _sin_filtro(mes)):
+        sel = seleccionar_dias(dias, año, mes, dia, rango_dias)
+        return np.flatnonzero(np.diff(np.r_[0, sel.view(np.int8), 0])).reshape(-1, 2)
+
+    inicio, fin = 0, n
+    if rango_dias is not None:
+        inicio, fin = max(int(rango_dias[0]), 0), min(int(rango_dias[1]) + 1, n)
+    if not _sin_filtro(año):
+        desde = pd.Timestamp(int(año), 1 if _sin_filtro(mes) else int(mes), 1)
+        hasta = desde + (pd.DateOffset(years=1) if _sin_filtro(mes) else pd.DateOffset(months=1))
+        a, b = dias.searchsorted([desde, hasta])
+        inicio, fin = max(inicio, a), min(fin, b)
+    return np.array([[inicio, max(inicio, fin)]], dtype=np.int64)
+
+
+def en_rangos(rangos, cod_dia):
+    """cod_dia dentro de alguno de los rangos; los códigos -1 (sin fecha) nunca coinciden"""
+    if len(rangos) == 1:
+        return (cod_dia >= rangos[0, 0]) & (cod_dia < rangos[0, 1])
+    k = np.searchsorted(rangos[:, 0], cod_dia, side='right') - 1
+    return (k >= 0) & (cod_dia < rangos[np.maximum(k, 0), 1])
+
+
+def _orden_offsets(codigos, n_valores):
+    """Argsort estable de los códigos + offsets de cada valor (tipo CSR)"""
+    orden = np.argsort(codigos, kind='stable').astype(np.int32)
+    return orden, np.searchsorted(codigos[orden], np.arange(n_valores + 1))
+
+
+class _IndiceValores:
+    """Posiciones de fila por valor de una dimensión codificada"""
+
+    def __init__(self, codigos, etiquetas, orden, offsets):
+        self.codigos = codigos
+        self.etiquetas = etiquetas
+        self.orden = orden
+        self.offsets = offsets
+
+    def codigo(self, valor):
+        return self.etiquetas.get_loc(valor) if valor in self.etiquetas else None
+
+    def tamaño(self, codigo):
+        return 0 if codigo is None else int(self.offsets[codigo + 1] - self.offsets[codigo])
+
+    def posiciones(self, codigo):
+        """Filas con ese código, en orden ascendente"""
+        if codigo is None:
+            return np.empty(0, dtype=np.int64)
+        return self.orden[self.offsets[codigo]:self.offsets[codigo + 1]]
+
+
+class IndiceIncidentes:
+    """Índices de tiempo (rangos por día) y de valores (hora, categoría, severidad)"""
+
+    DIMENSIONES = ['hora', 'categoria', 'severidad']
+
+    def __init__(self, arreglos, dias, ubicacion, etiquetas):
+        """
+        Args:
+            arreglos: dict de arreglos por incidente/día (ver desde_incidentes;
+                pueden ser memmaps de artefactos_dashboard)
+            dias: DatetimeIndex código de día → fecha
+            ubicacion: DataFrame código de ubicación → COLUMNAS_UBICACION
+            etiquetas: {'categoria': Index, 'severidad': Index}
+        """
+        self.arreglos = arreglos
+        self.dias = dias
+        self.ubicacion = ubicacion
+        self.n = len(arreglos['cod_dia'])
+        self.cod_dia = arreglos['cod_dia']
+        self.orden_dia = arreglos['orden_dia']
+        self.offsets_dia = arreglos['offsets_dia']
+        self.ns = arreglos['ns']
+        self.cod_ubic = arreglos['cod_ubic']
+        etiquetas = dict(etiquetas, hora=pd.Index(range(24)))
+        self.valores = {
+            dim: _IndiceValores(arreglos[dim], etiquetas[dim], arreglos[f'{dim}_orden'], arreglos[f'{dim}_offsets'])
+            for dim in self.DIMENSIONES
+        }
+
+    @classmethod
+    def desde_incidentes(cls, incidentes):
+        """Construir los índices a partir de la tabla de incidentes"""
+        ts = pd.to_datetime(incidentes['Timestamp'])
+        cod_dia, dias = codificar_dias(ts)
+        cod_ubic, ubicacion = codificar_ubicacion(incidentes)
+        cod_cat, cat = _codigos(incidentes['Categoria_Incidente'])
+        cod_sev, sev = _codigos(incidentes['Nivel_Severidad'])
+
+        arreglos = {
+            'cod_dia': cod_dia.astype(np.int32),
+            'ns': ts.to_numpy().astype('datetime64[ns]').view(np.int64),
+            'cod_ubic': cod_ubic.astype(np.int32),
+            'hora': codificar_horas(ts).astype(np.int8),
+            'categoria': cod_cat.astype(np.int16),
+            'severidad': cod_sev.astype(np.int8),
+        }
+        arreglos['orden_dia'], arreglos['offsets_dia'] = _orden_offsets(arreglos['cod_dia'], len(dias))
+        for dim, n_valores in [('hora', 24), ('categoria', len(cat)), ('severidad', len(sev))]:
+            arreglos[f'{dim}_orden'], arreglos[f'{dim}_offsets'] = _orden_offsets(arreglos[dim], n_valores)
+        return cls(arreglos, dias, ubicacion, {'categoria': cat, 'severidad': sev})
+
+    def _posiciones_dias(self, rangos):
+        """Filas de los rangos de días (rebanadas de orden_dia entre offsets), ascendentes"""
+        filas = [self.orden_dia[self.offsets_dia[a]:self.offsets_dia[b]] for a, b in rangos if b > a]
+        if not filas:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(filas))
+
+    def filtrar(self, año=None, mes=None, dia=None, hora=None, categoria=None, severidad=None,
+                rango_dias=None):
+        """
+        Posiciones (ascendentes) de los incidentes que cumplen los filtros
+        ('todos'/'todas'/None = sin filtro; rango_dias = (primero, último)
+        códigos de día inclusivos)
+        """
+        # (tamaño, nombre, código) de cada índice activo
+        activos = []
+        rangos = rangos_dias(self.dias, año, mes, dia, rango_dias)
+        if rangos is not None:
+            tamaño = int((self.offsets_dia[rangos[:, 1]] - self.offsets_dia[rangos[:, 0]]).sum())
+            activos.append((tamaño, 'tiempo', None))
+        for nombre, valor in [('hora', hora), ('categoria', categoria), ('severidad', severidad)]:
+            if not _sin_filtro(valor):
+                indice = self.valores[nombre]
+                codigo = indice.codigo(valor)
+                activos.append((indice.tamaño(codigo), nombre, codigo))
+
+        if not activos:
+            return np.arange(self.n)
+
+        # El índice más selectivo da los candidatos; el resto se verifica sobre ellos
+        activos.sort(key=lambda a: a[0])
+        _, nombre, codigo = activos[0]
+        if nombre == 'tiempo':
+            filas = self._posiciones_dias(rangos)
+        else:
+            filas = self.valores[nombre].posiciones(codigo)
+        for _, nombre, codigo in activos[1:]:
+            if nombre == 'tiempo':
+                filas = filas[en_rangos(rangos, self.cod_dia[filas])]
+            else:
+                filas = filas[self.valores[nombre].codigos[filas] == codigo]
+        return filas
+
+    def por_ubicacion(self, filas, severidades=('ALTA', 'MEDIA', 'BAJA')):
+        """
+        Incidentes seleccionados apilados por punto geocodificado
+
+        Returns:
+            DataFrame con COLUMNAS_UBICACION, incidentes, una columna por
+            severidad (en minúsculas) y ultimo (Timestamp más reciente); solo
+            ubicaciones con al menos un incidente
+        """
+        n = len(self.ubicacion)
+        ubic = self.cod_ubic[filas]
+        conteo = np.bincount(ubic, minlength=n)
+        tabla = self.ubicacion.copy()
+        tabla['incidentes'] = conteo
+        sev = self.valores['severidad']
+        for nombre in severidades:
+            codigo = sev.codigo(nombre)
+            sel = sev.codigos[filas] == (-2 if codigo is None else codigo)
+            tabla[nombre.lower()] = np.bincount(ubic[sel], minlength=n)
+        ultimo = np.full(n, np.iinfo(np.int64).min)
+        np.maximum.at(ultimo, ubic, self.ns[filas])
+        tabla['ultimo'] = pd.to_datetime(ultimo, errors='coerce')
+        return tabla[conteo > 0].reset_index(drop=True)
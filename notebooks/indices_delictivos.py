@@ -0,0 +1,150 @@
+"""
+Motor de índices delictivos por polígono
+
+Cada índice es una fórmula vectorizada declarada sobre los arreglos de la
+tabla agregada (una entrada de FORMULAS). calcular() extrae las columnas una
+sola vez a NumPy, evalúa todas las fórmulas y devuelve los índices juntos.
+
+El índice de riesgo compuesto es una suma ponderada de componentes
+normalizados 0-1 (min-max sobre los polígonos completos). Los pesos son
+configurables y evaluar_escenarios() calcula muchos juegos de pesos a la vez
+(un producto matricial) para análisis de sensibilidad.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# Pesos por defecto del índice de riesgo compuesto (suman 1)
+PESOS_RIESGO = {
+    'tasa_incidentes_per_1k': 0.4,
+    'score_severidad': 0.3,
+    'IM_2020': 0.2,
+    'densidad_poblacional': 0.1,
+}
+
+
+def _por_poblacion(c, valores):
+    """Valores solo para polígonos con población (> 0); NaN en el resto"""
+    return np.where(c['con_poblacion'], valores, np.nan)
+
+
+# nombre del índice → fórmula sobre el dict de arreglos (en orden de cálculo;
+# una fórmula puede usar índices calculados antes)
+FORMULAS = {
+    'tasa_incidentes_per_1k': lambda c: _por_poblacion(
+        c, c['total_incidentes'] / c['poblacion_total'] * 1000),
+    'tasa_alta_severidad_per_1k': lambda c: _por_poblacion(
+        c, c['incidentes_alta'] / c['poblacion_total'] * 1000),
+    'score_severidad': lambda c: (
+        (c['incidentes_alta'] * 3 + c['incidentes_media'] * 2 + c['incidentes_baja'] * 1)
+        / np.where(c['total_incidentes'] == 0, 1, c['total_incidentes'])),
+    'densidad_poblacional': lambda c: _por_poblacion(
+        c, c['poblacion_total'] / c['area_km2']),
+}
+
+COLUMNAS_BASE = ['total_incidentes', 'incidentes_alta', 'incidentes_media',
+                 'incidentes_baja', 'poblacion_total', 'area_km2', 'IM_2020']
+
+
+def _arreglos(tabla):
+    """Columnas de la tabla agregada como arreglos float (NaN si falta la columna)"""
+    n = len(tabla)
+    c = {}
+    for columna in COLUMNAS_BASE:
+        if columna in tabla.columns:
+            c[columna] = pd.to_numeric(tabla[columna], errors='coerce').to_numpy(dtype=float)
+        else:
+            c[columna] = np.full(n, np.nan)
+    c['con_poblacion'] = ~np.isnan(c['poblacion_total']) & (c['poblacion_total'] > 0)
+    return c
+
+
+def _evaluar(c, formulas):
+    """Evaluar las fórmulas en orden, agregando cada resultado a c (divisiones entre 0 → inf/NaN)"""
+    resultado = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for nombre, formula in formulas.items():
+            resultado[nombre] = c[nombre] = formula(c)
+    return resultado
+
+
+def normalizar_minmax(matriz, mascara):
+    """
+    Escalar columnas a 0-1 con min/max de las filas en mascara (como MinMaxScaler)
+
+    Returns:
+        matriz (n × k) con NaN fuera de la máscara
+    """
+    sub = matriz[mascara]
+    minimo = np.nanmin(sub, axis=0)
+    rango = np.nanmax(sub, axis=0) - minimo
+    rango = np.where(rango == 0, 1, rango)
+    normalizada = np.full(matriz.shape, np.nan)
+    normalizada[mascara] = (sub - minimo) / rango
+    return normalizada
+
+
+def _componentes(c, componentes):
+    """Componentes normalizados + máscara de polígonos completos (con población e IM_2020)"""
+    completos = c['con_poblacion'] & ~np.isnan(c['IM_2020'])
+    matriz = np.column_stack([c[nombre] for nombre in componentes])
+    if not completos.any():
+        return np.full(matriz.shape, np.nan), completos
+    return normalizar_minmax(matriz, completos), completos
+
+
+def componentes_riesgo(tabla, componentes=tuple(PESOS_RIESGO), formulas=FORMULAS):
+    """
+    Componentes normalizados 0-1 del índice de riesgo
+
+    Returns:
+        (matriz n × k, máscara de polígonos completos)
+    """
+    c = _arreglos(tabla)
+    _evaluar(c, formulas)
+    return _componentes(c, componentes)
+
+
+def calcular(tabla, pesos=None, formulas=FORMULAS):
+    """
+    Evaluar todas las fórmulas y el índice de riesgo en una pasada
+
+    Args:
+        tabla: DataFrame agregado por polígono (total_incidentes, incidentes_*,
+            poblacion_total, area_km2 y opcionalmente IM_2020)
+        pesos: dict componente → peso del índice de riesgo (default PESOS_RIESGO)
+
+    Returns:
+        DataFrame con una columna por índice (mismo índice que tabla);
+        indice_riesgo solo si hay polígonos con población e IM_2020
+    """
+    pesos = PESOS_RIESGO if pesos is None else pesos
+    c = _arreglos(tabla)
+    resultado = _evaluar(c, formulas)
+
+    normalizados, completos = _componentes(c, tuple(pesos))
+    if completos.any():
+        resultado['indice_riesgo'] = normalizados @ np.array(list(pesos.values()), dtype=float) * 100
+
+    return pd.DataFrame(resultado, index=tabla.index)
+
+
+def evaluar_escenarios(tabla, escenarios, componentes=tuple(PESOS_RIESGO)):
+    """
+    Índice de riesgo para muchos juegos de pesos a la vez
+
+    Args:
+        tabla: DataFrame agregado por polígono
+        escenarios: dict nombre → pesos (dict componente → peso) o DataFrame
+            (una fila por escenario, una columna por componente)
+
+    Returns:
+        DataFrame (polígonos × escenarios) con el índice de riesgo 0-100
+    """
+    if not isinstance(escenarios, pd.DataFrame):
+        escenarios = pd.DataFrame.from_dict(escenarios, orient='index')
+    escenarios = escenarios.reindex(columns=list(componentes)).fillna(0)
+    normalizados, _ = componentes_riesgo(tabla, componentes=tuple(componentes))
+    matriz = normalizados @ escenarios.to_numpy(dtype=float).T * 100
+    return pd.DataFrame(matriz, index=tabla.index, columns=escenarios.index)
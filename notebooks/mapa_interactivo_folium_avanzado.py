@@ -8,12 +8,20 @@ import pandas as pd
 import geopandas as gpd
 import folium
 from folium import plugins
+from branca.element import MacroElement
+from jinja2 import Template
+import base64
 import json
+import warnings
 from pathlib import Path
 import numpy as np
 from datetime import datetime
 import branca.colormap as cm
 
+from agregacion_poligonos import ORDEN_SEVERIDAD, codificar, codigos_poligono, recientes_por_poligono, top_por_poligono
+from datos_unificados import cargar_desglose, cargar_incidentes_unificados, cargar_poligonos_unificados
+from geometria_simplificada import cargar_niveles
+
 def cargar_datos():
     """Cargar todos los datos necesarios"""
     print("Cargando datos...")
@@ -22,22 +30,29 @@ def cargar_datos():
     data_dir = project_root / 'data' / 'processed' / 'unificado'
     
     # Polígonos con métricas agregadas
-    gdf_poligonos = gpd.read_file(data_dir / 'poligonos_unificados_completo.geojson')
+    gdf_poligonos = cargar_poligonos_unificados(data_dir)
+    # Un solo nivel de geometría en el HTML estático: embeber los tres casi
+    # triplica el peso y repite cada coordenada por nivel. El cambio de nivel
+    # con el zoom queda en el dashboard; aquí se usa el intermedio
+    # (cobertura simplificada, sin huecos entre colonias vecinas)
+    gdf_poligonos = gdf_poligonos.set_geometry(cargar_niveles(gdf_poligonos, data_dir)['medio'])
     
     # Incidentes temporales
-    df_incidentes = pd.read_csv(data_dir / 'incidentes_con_poligono_temporal.csv')
-    df_incidentes['Timestamp'] = pd.to_datetime(df_incidentes['Timestamp'])
+    df_incidentes = cargar_incidentes_unificados(data_dir)
     
-    # Agregar columnas temporales
-    df_incidentes['Año'] = df_incidentes['Timestamp'].dt.year
-    df_incidentes['Mes'] = df_incidentes['Timestamp'].dt.month
-    df_incidentes['Trimestre'] = df_incidentes['Timestamp'].dt.quarter
+    # Agregar columnas temporales (enteros con nulos: sin fecha → <NA>)
+    df_incidentes['Año'] = df_incidentes['Timestamp'].dt.year.astype('Int64')
+    df_incidentes['Mes'] = df_incidentes['Timestamp'].dt.month.astype('Int64')
+    df_incidentes['Trimestre'] = df_incidentes['Timestamp'].dt.quarter.astype('Int64')
     df_incidentes['Fecha'] = df_incidentes['Timestamp'].dt.date
     
+    # Desglose por categoría / parte del día / día de la semana (formato largo)
+    desglose = cargar_desglose(data_dir)
+    
     print(f"✓ Polígonos: {len(gdf_poligonos):,}")
     print(f"✓ Incidentes: {len(df_incidentes):,}")
     
-    return gdf_poligonos, df_incidentes
+    return gdf_poligonos, df_incidentes, desglose
 
 
 def preparar_metricas_base(gdf_poligonos):
@@ -57,96 +72,207 @@ def preparar_metricas_base(gdf_poligonos):
     return metrics
 
 
-def crear_popup_html(row, df_incidentes_poligono):
-    """Crear popup HTML rico con toda la información"""
-    
-    # Datos básicos
-    colonia = row['COLONIA']
-    cve_col = row['CVE_COL']
-    
-    # Incidentes
-    total_inc = int(row['total_incidentes']) if pd.notna(row['total_incidentes']) else 0
-    alta = int(row['incidentes_alta']) if pd.notna(row['incidentes_alta']) else 0
-    media = int(row['incidentes_media']) if pd.notna(row['incidentes_media']) else 0
-    baja = int(row['incidentes_baja']) if pd.notna(row['incidentes_baja']) else 0
-    
-    # Demografía
-    poblacion = int(row['poblacion_total']) if pd.notna(row['poblacion_total']) else 'N/D'
-    viviendas = int(row['viviendas_totales']) if pd.notna(row['viviendas_totales']) else 'N/D'
-    escolaridad = f"{row['escolaridad_años_prom']:.1f}" if pd.notna(row['escolaridad_años_prom']) else 'N/D'
-    
-    # Índices
-    tasa = f"{row['tasa_incidentes_per_1k']:.1f}" if pd.notna(row['tasa_incidentes_per_1k']) else 'N/D'
-    score_sev = f"{row['score_severidad']:.2f}" if pd.notna(row['score_severidad']) else 'N/D'
-    indice = f"{row.get('indice_riesgo', row['score_severidad']):.1f}" if pd.notna(row.get('indice_riesgo', row['score_severidad'])) else 'N/D'
-    
-    # Categorías top 3 si existen
-    categorias_html = ""
-    if pd.notna(row['categorias_dict']) and row['categorias_dict'] != '{}':
-        try:
-            import ast
-            cats = ast.literal_eval(row['categorias_dict'])
-            top3 = sorted(cats.items(), key=lambda x: x[1], reverse=True)[:3]
-            categorias_html = "<br>".join([f"• {cat}: {cnt:,}" for cat, cnt in top3])
-        except:
-            categorias_html = "N/D"
-    
-    # Mini gráfica temporal (última semana si hay datos)
-    temporal_html = ""
-    if len(df_incidentes_poligono) > 0:
-        # Últimos 30 días
-        ultimos_30 = df_incidentes_poligono[
-            df_incidentes_poligono['Timestamp'] >= 
-            (df_incidentes_poligono['Timestamp'].max() - pd.Timedelta(days=30))
-        ]
-        if len(ultimos_30) > 0:
-            temporal_html = f"<br><small>Últimos 30 días: {len(ultimos_30):,} incidentes</small>"
-    
-    html = f"""
+def estadisticas_popup(gdf_poligonos, df_incidentes, desglose=None):
+    """
+    Estadísticas de popup de todos los polígonos, calculadas una sola vez
+
+    Returns:
+        DataFrame indexado por CVE_COL con ultimos_30 (incidentes en los 30
+        días previos al más reciente del polígono), alta/media/baja y
+        top_categorias (lista de (categoría, incidentes))
+    """
+    cve = gdf_poligonos['CVE_COL']
+    top = top_por_poligono(desglose, 'categoria', 3) if desglose is not None else {}
+    stats = pd.DataFrame({
+        'ultimos_30': recientes_por_poligono(df_incidentes, cve, dias=30),
+        'alta': gdf_poligonos['incidentes_alta'].to_numpy(),
+        'media': gdf_poligonos['incidentes_media'].to_numpy(),
+        'baja': gdf_poligonos['incidentes_baja'].to_numpy(),
+        'top_categorias': [top.get(c, []) for c in cve],
+    }, index=pd.Index(cve, name='CVE_COL'))
+    return stats[~stats.index.duplicated()]
+
+
+def campos_popup(row, stats):
+    """
+    Campos ya formateados del popup de un polígono (stats: renglón de
+    estadisticas_popup); el HTML lo arma POPUP_JS en el navegador
+    """
+    def entero(valor, faltante='N/D'):
+        return f"{int(valor):,}" if pd.notna(valor) else faltante
+
+    def decimal(valor, decimales):
+        return f"{valor:.{decimales}f}" if pd.notna(valor) else 'N/D'
+
+    indice = row.get('indice_riesgo', row['score_severidad'])
+    return {
+        'colonia': row['COLONIA'],
+        'cve': str(row['CVE_COL']),
+        # Incidentes
+        'total': entero(row['total_incidentes'], '0'),
+        'alta': entero(stats['alta'], '0'),
+        'media': entero(stats['media'], '0'),
+        'baja': entero(stats['baja'], '0'),
+        'ultimos_30': entero(stats['ultimos_30']) if stats['ultimos_30'] > 0 else '',
+        # Demografía
+        'poblacion': str(int(row['poblacion_total'])) if pd.notna(row['poblacion_total']) else 'N/D',
+        'viviendas': str(int(row['viviendas_totales'])) if pd.notna(row['viviendas_totales']) else 'N/D',
+        'escolaridad': decimal(row['escolaridad_años_prom'], 1),
+        # Índices
+        'tasa': decimal(row['tasa_incidentes_per_1k'], 1),
+        'score_sev': decimal(row['score_severidad'], 2),
+        'indice': decimal(indice, 1),
+        # Categorías top 3
+        'categorias': [[cat, f"{cnt:,}"] for cat, cnt in stats['top_categorias']],
+    }
+
+
+# Popup HTML rico a partir de los campos de campos_popup (una sola plantilla
+# para todos los polígonos y capas, en lugar de un HTML completo por feature)
+POPUP_JS = """
+function popupPoligono(p) {
+    const categorias = p.categorias.map(([cat, cnt]) => `• ${cat}: ${cnt}`).join('<br>');
+    return `
     <div style="font-family: Arial; width: 350px;">
         <h3 style="margin: 0; padding: 10px; background: #2c3e50; color: white;">
-            {colonia}
+            ${p.colonia}
         </h3>
         
         <div style="padding: 10px;">
             <h4 style="margin: 5px 0; color: #e74c3c;">🚨 Incidentes Delictivos</h4>
             <table style="width: 100%; font-size: 12px;">
-                <tr><td><b>Total:</b></td><td>{total_inc:,}</td></tr>
-                <tr style="color: #c0392b;"><td>Alta severidad:</td><td>{alta:,}</td></tr>
-                <tr style="color: #e67e22;"><td>Media severidad:</td><td>{media:,}</td></tr>
-                <tr style="color: #f39c12;"><td>Baja severidad:</td><td>{baja:,}</td></tr>
+                <tr><td><b>Total:</b></td><td>${p.total}</td></tr>
+                <tr style="color: #c0392b;"><td>Alta severidad:</td><td>${p.alta}</td></tr>
+                <tr style="color: #e67e22;"><td>Media severidad:</td><td>${p.media}</td></tr>
+                <tr style="color: #f39c12;"><td>Baja severidad:</td><td>${p.baja}</td></tr>
             </table>
-            {temporal_html}
+            ${p.ultimos_30 ? `<br><small>Últimos 30 días: ${p.ultimos_30} incidentes</small>` : ''}
             
             <h4 style="margin: 10px 0 5px 0; color: #3498db;">👥 Demografía</h4>
             <table style="width: 100%; font-size: 12px;">
-                <tr><td><b>Población:</b></td><td>{poblacion}</td></tr>
-                <tr><td>Viviendas:</td><td>{viviendas}</td></tr>
-                <tr><td>Escolaridad (años):</td><td>{escolaridad}</td></tr>
+                <tr><td><b>Población:</b></td><td>${p.poblacion}</td></tr>
+                <tr><td>Viviendas:</td><td>${p.viviendas}</td></tr>
+                <tr><td>Escolaridad (años):</td><td>${p.escolaridad}</td></tr>
             </table>
             
             <h4 style="margin: 10px 0 5px 0; color: #9b59b6;">📊 Índices</h4>
             <table style="width: 100%; font-size: 12px;">
-                <tr><td><b>Tasa per 1k hab:</b></td><td>{tasa}</td></tr>
-                <tr><td>Score severidad:</td><td>{score_sev}</td></tr>
-                <tr><td>Índice de riesgo:</td><td>{indice}</td></tr>
+                <tr><td><b>Tasa per 1k hab:</b></td><td>${p.tasa}</td></tr>
+                <tr><td>Score severidad:</td><td>${p.score_sev}</td></tr>
+                <tr><td>Índice de riesgo:</td><td>${p.indice}</td></tr>
             </table>
             
             <h4 style="margin: 10px 0 5px 0; color: #16a085;">🏷️ Categorías Top 3</h4>
             <div style="font-size: 11px; line-height: 1.4;">
-                {categorias_html if categorias_html else "N/D"}
+                ${categorias || "N/D"}
             </div>
             
             <hr style="margin: 10px 0;">
-            <small style="color: #7f8c8d;">CVE: {cve_col}</small>
+            <small style="color: #7f8c8d;">CVE: ${p.cve}</small>
         </div>
     </div>
+    `;
+}
+"""
+
+class CapasPoligonos(MacroElement):
     """
-    
-    return html
+    Geometría de los polígonos embebida una sola vez para todas las capas de
+    métricas
+
+    Cada FeatureGroup registrado con agregar() funciona como selector en el
+    control de capas: al activarlo, los polígonos se vuelven a dibujar con
+    el color, el tooltip y el filtro de esa métrica (una métrica visible a
+    la vez). Color, tooltip y valor de cada métrica son arreglos en las
+    propiedades de cada feature, con null donde el polígono no aparece.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = (function() {
+            const mapa = {{ this._parent.get_name() }};
+            const datos = {{ this.datos | tojson }};
+            const grupos = [{% for grupo in this.grupos %}{{ grupo.get_name() }}, {% endfor %}];
+            let activa = null;
+            const capa = L.geoJson(null, {
+                filter: f => f.properties.color[activa] !== null,
+                style: f => ({
+                    fillColor: f.properties.color[activa],
+                    color: '#000000',
+                    weight: 1,
+                    fillOpacity: 0.6
+                }),
+                onEachFeature: (f, layer) => {
+                    layer.bindTooltip(f.properties.tooltip[activa], {sticky: true});
+                    layer.bindPopup(() => popupPoligono(f.properties.popup), {maxWidth: 400});
+                }
+            });
+            function mostrar(i) {
+                activa = i;
+                grupos.forEach(g => g.removeLayer(capa));
+                capa.clearLayers();
+                capa.addData(datos);
+                grupos[i].addLayer(capa);
+            }
+            function activar(i) {
+                if (!mapa.hasLayer(grupos[i])) mapa.addLayer(grupos[i]);
+                mostrar(i);
+                grupos.forEach((g, j) => { if (j !== i && mapa.hasLayer(g)) mapa.removeLayer(g); });
+            }
+            mapa.on('overlayadd', e => {
+                const i = grupos.indexOf(e.layer);
+                if (i >= 0) activar(i);
+            });
+            const inicial = grupos.findIndex(g => mapa.hasLayer(g));
+            if (inicial >= 0) mostrar(inicial);
+            // Reemplazar colores/tooltips de la métrica i (p. ej. desde los
+            // filtros temporales) y mostrarla
+            function actualizar(i, colores, tooltips) {
+                datos.features.forEach((f, p) => {
+                    f.properties.color[i] = colores[p];
+                    f.properties.tooltip[i] = tooltips[p];
+                });
+                activar(i);
+            }
+            return {datos: datos, activar: activar, actualizar: actualizar};
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, gdf_poligonos, popups):
+        super().__init__()
+        self._name = 'CapasPoligonos'
+        self.gdf = gdf_poligonos
+        self.popups = popups
+        self.grupos = []
+        self.capas = []
+
+    def agregar(self, grupo, indices, valores, colores, tooltips):
+        """Registrar una métrica: grupo selector + valores de los polígonos con etiquetas `indices`"""
+        pos = self.gdf.index.get_indexer(indices)
+        n = len(self.gdf)
+        capa = {'valor': [None] * n, 'color': [None] * n, 'tooltip': [None] * n}
+        for p, valor, color, tooltip in zip(pos, valores, colores, tooltips):
+            capa['valor'][p] = float(valor) if pd.notna(valor) else None
+            capa['color'][p] = color
+            capa['tooltip'][p] = tooltip
+        self.grupos.append(grupo)
+        self.capas.append(capa)
+
+    def render(self, **kwargs):
+        # Una feature por polígono; las métricas como arreglos paralelos a self.grupos
+        columnas = {
+            campo: [[capa[campo][p] for capa in self.capas] for p in range(len(self.gdf))]
+            for campo in ['valor', 'color', 'tooltip']
+        }
+        self.datos = gpd.GeoDataFrame(
+            dict(columnas, popup=[self.popups[cve] for cve in self.gdf['CVE_COL']]),
+            geometry=self.gdf.geometry.to_numpy(), crs=self.gdf.crs
+        ).to_crs('EPSG:4326').to_geo_dict(drop_id=True)
+        super().render(**kwargs)
 
 
-def crear_mapa_interactivo(gdf_poligonos, df_incidentes):
+def crear_mapa_interactivo(gdf_poligonos, df_incidentes, desglose=None):
     """Crear mapa interactivo completo"""
     
     print("\nCreando mapa interactivo...")
@@ -169,11 +295,21 @@ def crear_mapa_interactivo(gdf_poligonos, df_incidentes):
     # Preparar métricas
     metrics = preparar_metricas_base(gdf_poligonos)
     
+    # Popup de cada polígono: estadísticas en una sola pasada sobre los
+    # incidentes y campos formateados una vez para las cinco capas
+    stats = estadisticas_popup(gdf_poligonos, df_incidentes, desglose)
+    m.get_root().script.add_child(folium.Element(POPUP_JS))
+    popups = {cve: campos_popup(row, stats.loc[cve])
+              for cve, row in zip(gdf_poligonos['CVE_COL'], gdf_poligonos.to_dict('records'))}
+    
+    # Geometría compartida: cada capa solo aporta color, tooltip y valor
+    capas = CapasPoligonos(gdf_poligonos, popups)
+    
     # === CAPA 1: Polígonos por Total de Incidentes ===
     print("  Generando capa: Total Incidentes...")
     
     colormap_incidentes = cm.LinearColormap(
-        colors=['#ffffcc', '#ffeda0', '#fed976', '#feb24c', '#fd8d3c', '#fc4e2a', '#e31a1c', '#bd0026', '#800026'],
+        colors=COLORES_INCIDENTES,
         vmin=0,
         vmax=metrics['total_incidentes'].quantile(0.95),
         caption='Total de Incidentes'
@@ -181,26 +317,12 @@ def crear_mapa_interactivo(gdf_poligonos, df_incidentes):
     
     fg_incidentes = folium.FeatureGroup(name='🚨 Total Incidentes', show=True)
     
-    for idx, row in gdf_poligonos.iterrows():
-        # Filtrar incidentes de este polígono
-        df_inc_pol = df_incidentes[df_incidentes['CVE_COL'] == row['CVE_COL']]
-        
-        popup_html = crear_popup_html(row, df_inc_pol)
-        
-        valor = metrics['total_incidentes'].iloc[idx]
-        color = colormap_incidentes(valor) if valor > 0 else '#cccccc'
-        
-        folium.GeoJson(
-            row['geometry'].__geo_interface__,
-            style_function=lambda x, color=color: {
-                'fillColor': color,
-                'color': '#000000',
-                'weight': 1,
-                'fillOpacity': 0.6
-            },
-            popup=folium.Popup(popup_html, max_width=400),
-            tooltip=f"{row['COLONIA']}: {int(valor):,} incidentes"
-        ).add_to(fg_incidentes)
+    valores = metrics['total_incidentes']
+    capas.agregar(
+        fg_incidentes, gdf_poligonos.index, valores,
+        [colormap_incidentes(v) if v > 0 else '#cccccc' for v in valores],
+        [f"{colonia}: {int(v):,} incidentes" for colonia, v in zip(gdf_poligonos['COLONIA'], valores)]
+    )
     
     fg_incidentes.add_to(m)
     colormap_incidentes.add_to(m)
@@ -221,24 +343,12 @@ def crear_mapa_interactivo(gdf_poligonos, df_incidentes):
         
         fg_tasa = folium.FeatureGroup(name='📊 Tasa per 1k hab', show=False)
         
-        for idx, row in gdf_con_tasa.iterrows():
-            df_inc_pol = df_incidentes[df_incidentes['CVE_COL'] == row['CVE_COL']]
-            popup_html = crear_popup_html(row, df_inc_pol)
-            
-            valor = row['tasa_incidentes_per_1k']
-            color = colormap_tasa(valor)
-            
-            folium.GeoJson(
-                row['geometry'].__geo_interface__,
-                style_function=lambda x, color=color: {
-                    'fillColor': color,
-                    'color': '#000000',
-                    'weight': 1,
-                    'fillOpacity': 0.6
-                },
-                popup=folium.Popup(popup_html, max_width=400),
-                tooltip=f"{row['COLONIA']}: {valor:.1f} per 1k"
-            ).add_to(fg_tasa)
+        valores = gdf_con_tasa['tasa_incidentes_per_1k']
+        capas.agregar(
+            fg_tasa, gdf_con_tasa.index, valores,
+            [colormap_tasa(v) for v in valores],
+            [f"{colonia}: {v:.1f} per 1k" for colonia, v in zip(gdf_con_tasa['COLONIA'], valores)]
+        )
         
         fg_tasa.add_to(m)
     
@@ -257,24 +367,13 @@ def crear_mapa_interactivo(gdf_poligonos, df_incidentes):
         
         fg_riesgo = folium.FeatureGroup(name='⚠️ Índice de Riesgo' if 'indice_riesgo' in gdf_poligonos.columns else '⚠️ Severidad (Score)', show=False)
         
-        for idx, row in gdf_con_riesgo.iterrows():
-            df_inc_pol = df_incidentes[df_incidentes['CVE_COL'] == row['CVE_COL']]
-            popup_html = crear_popup_html(row, df_inc_pol)
-            
-            valor = metrics['indice_riesgo'].iloc[idx]
-            color = colormap_riesgo(valor)
-            
-            folium.GeoJson(
-                row['geometry'].__geo_interface__,
-                style_function=lambda x, color=color: {
-                    'fillColor': color,
-                    'color': '#000000',
-                    'weight': 1,
-                    'fillOpacity': 0.6
-                },
-                popup=folium.Popup(popup_html, max_width=400),
-                tooltip=f"{row['COLONIA']}: {valor:.1f}" + (" (riesgo)" if 'indice_riesgo' in gdf_poligonos.columns else " (severidad)")
-            ).add_to(fg_riesgo)
+        sufijo = " (riesgo)" if 'indice_riesgo' in gdf_poligonos.columns else " (severidad)"
+        valores = metrics['indice_riesgo'].loc[gdf_con_riesgo.index]
+        capas.agregar(
+            fg_riesgo, gdf_con_riesgo.index, valores,
+            [colormap_riesgo(v) for v in valores],
+            [f"{colonia}: {v:.1f}" + sufijo for colonia, v in zip(gdf_con_riesgo['COLONIA'], valores)]
+        )
         
         fg_riesgo.add_to(m)
     
@@ -290,25 +389,14 @@ def crear_mapa_interactivo(gdf_poligonos, df_incidentes):
     
     fg_severidad = folium.FeatureGroup(name='🔥 Severidad', show=False)
     
-    for idx, row in gdf_poligonos.iterrows():
-        if row['total_incidentes'] > 0:
-            df_inc_pol = df_incidentes[df_incidentes['CVE_COL'] == row['CVE_COL']]
-            popup_html = crear_popup_html(row, df_inc_pol)
-            
-            valor = metrics['score_severidad'].iloc[idx]
-            color = colormap_severidad(valor) if valor > 0 else '#cccccc'
-            
-            folium.GeoJson(
-                row['geometry'].__geo_interface__,
-                style_function=lambda x, color=color: {
-                    'fillColor': color,
-                    'color': '#000000',
-                    'weight': 1,
-                    'fillOpacity': 0.6
-                },
-                popup=folium.Popup(popup_html, max_width=400),
-                tooltip=f"{row['COLONIA']}: Severidad {valor:.2f}"
-            ).add_to(fg_severidad)
+    gdf_con_incidentes = gdf_poligonos[gdf_poligonos['total_incidentes'] > 0]
+    if len(gdf_con_incidentes) > 0:
+        valores = metrics['score_severidad'].loc[gdf_con_incidentes.index]
+        capas.agregar(
+            fg_severidad, gdf_con_incidentes.index, valores,
+            [colormap_severidad(v) if v > 0 else '#cccccc' for v in valores],
+            [f"{colonia}: Severidad {v:.2f}" for colonia, v in zip(gdf_con_incidentes['COLONIA'], valores)]
+        )
     
     fg_severidad.add_to(m)
     
@@ -327,27 +415,18 @@ def crear_mapa_interactivo(gdf_poligonos, df_incidentes):
         
         fg_poblacion = folium.FeatureGroup(name='👥 Población', show=False)
         
-        for idx, row in gdf_con_poblacion.iterrows():
-            df_inc_pol = df_incidentes[df_incidentes['CVE_COL'] == row['CVE_COL']]
-            popup_html = crear_popup_html(row, df_inc_pol)
-            
-            valor = row['poblacion_total']
-            color = colormap_poblacion(valor)
-            
-            folium.GeoJson(
-                row['geometry'].__geo_interface__,
-                style_function=lambda x, color=color: {
-                    'fillColor': color,
-                    'color': '#000000',
-                    'weight': 1,
-                    'fillOpacity': 0.6
-                },
-                popup=folium.Popup(popup_html, max_width=400),
-                tooltip=f"{row['COLONIA']}: {int(valor):,} hab"
-            ).add_to(fg_poblacion)
+        valores = gdf_con_poblacion['poblacion_total']
+        capas.agregar(
+            fg_poblacion, gdf_con_poblacion.index, valores,
+            [colormap_poblacion(v) for v in valores],
+            [f"{colonia}: {int(v):,} hab" for colonia, v in zip(gdf_con_poblacion['COLONIA'], valores)]
+        )
         
         fg_poblacion.add_to(m)
     
+    # Polígonos (una sola copia de la geometría) después de los grupos selectores
+    capas.add_to(m)
+    
     # Agregar controles
     folium.LayerControl(position='topright', collapsed=False).add_to(m)
     
@@ -371,12 +450,253 @@ def crear_mapa_interactivo(gdf_poligonos, df_incidentes):
     return m
 
 
+# Escala de la capa de total de incidentes (también la usa el filtro temporal)
+COLORES_INCIDENTES = ['#ffffcc', '#ffeda0', '#fed976', '#feb24c', '#fd8d3c', '#fc4e2a', '#e31a1c', '#bd0026', '#800026']
+
+# Cubo de conteos embebido para filtrar en el navegador: dimensiones en el
+# orden de los ejes, tamaño máximo (base64) en el HTML y orden en que se
+# descartan dimensiones si no cabe
+DIMENSIONES_FILTRO = [('año', 'Año'), ('trimestre', 'Trimestre'),
+                      ('categoria', 'Categoria_Incidente'), ('severidad', 'Nivel_Severidad')]
+PRESUPUESTO_CUBO_BYTES = 512 * 1024
+# Texto de las opciones del panel de filtros (valor = etiqueta del cubo)
+TEXTOS_TRIMESTRE = {'1': 'Q1 (Ene-Mar)', '2': 'Q2 (Abr-Jun)', '3': 'Q3 (Jul-Sep)', '4': 'Q4 (Oct-Dic)'}
+TEXTOS_SEVERIDAD = {'ALTA': '🔴 Alta', 'MEDIA': '🟡 Media', 'BAJA': '🟢 Baja'}
+ORDEN_DESCARTE = ['trimestre', 'severidad', 'categoria', 'año']
+
+
+def _b64(arreglo):
+    return base64.b64encode(np.ascontiguousarray(arreglo).tobytes()).decode('ascii')
+
+
+def _codificar_conteos(conteo):
+    """
+    Conteos planos del cubo → dict con arreglos tipados en base64
+    (little-endian), el que ocupe menos de:
+
+        - denso: un conteo por celda
+        - disperso: índices (uint32) de las celdas no vacías + sus conteos
+        - máscara: un bit por celda (1 = no vacía) + conteos de las no
+          vacías; gana a partir de ~1/32 de celdas ocupadas, lo habitual
+          en el cubo polígono × año × trimestre × categoría × severidad
+    """
+    tipo = next(t for t in ('uint8', 'uint16', 'uint32') if conteo.max(initial=0) <= np.iinfo(t).max)
+    dtype = np.dtype(tipo).newbyteorder('<')
+    denso = {'tipo': tipo, 'conteos': _b64(conteo.astype(dtype))}
+    celdas = np.flatnonzero(conteo)
+    no_vacios = _b64(conteo[celdas].astype(dtype))
+    disperso = {'tipo': tipo, 'celdas': _b64(celdas.astype('<u4')), 'conteos': no_vacios}
+    mascara = {'tipo': tipo, 'mascara': _b64(np.packbits(conteo > 0, bitorder='little')), 'conteos': no_vacios}
+    tamaño = lambda c: sum(len(v) for k, v in c.items() if k != 'tipo')
+    return min(denso, disperso, mascara, key=tamaño), tamaño
+
+
+def cubo_filtros(gdf_poligonos, df_incidentes, presupuesto=PRESUPUESTO_CUBO_BYTES):
+    """
+    Cubo compacto polígono × año × trimestre × categoría × severidad para
+    recolorear el mapa en el navegador sin servidor
+
+    Se codifica con la representación más chica de _codificar_conteos; solo
+    si aun así no cabe en el presupuesto se descartan dimensiones
+    (ORDEN_DESCARTE) hasta que quepa y los filtros de las descartadas se
+    deshabilitan.
+
+    Returns:
+        dict JSON: dims ([nombre, etiquetas] en el orden de los ejes, tras
+        el eje de polígonos), forma, descartadas, bytes y los arreglos de
+        _codificar_conteos
+    """
+    pos = codigos_poligono(df_incidentes, gdf_poligonos['CVE_COL'])
+    validos = pos >= 0
+    inc = df_incidentes[validos]
+    codigos, etiquetas = {}, {}
+    for nombre, columna in DIMENSIONES_FILTRO:
+        valores = inc[columna]
+        if nombre in ('año', 'trimestre'):
+            valores = valores.astype('Int64')
+        cod, etq = codificar(valores, ORDEN_SEVERIDAD if nombre == 'severidad' else None)
+        etq = [str(e) for e in etq]
+        if (cod < 0).any():
+            # Sin dato: solo cuenta cuando ese filtro está en "todos"
+            cod = np.where(cod < 0, len(etq), cod)
+            etq.append(None)
+        codigos[nombre], etiquetas[nombre] = cod, etq
+
+    for k in range(len(ORDEN_DESCARTE) + 1):
+        descartadas = ORDEN_DESCARTE[:k]
+        activas = [nombre for nombre, _ in DIMENSIONES_FILTRO if nombre not in descartadas]
+        forma = [len(gdf_poligonos)] + [len(etiquetas[nombre]) for nombre in activas]
+        celda = np.ravel_multi_index([pos[validos]] + [codigos[nombre] for nombre in activas], forma)
+        conteo = np.bincount(celda, minlength=int(np.prod(forma)))
+        arreglos, tamaño = _codificar_conteos(conteo)
+        if tamaño(arreglos) <= presupuesto:
+            break
+    if descartadas:
+        warnings.warn(f"Cubo de filtros sobre el presupuesto: sin {', '.join(descartadas)}")
+    # dims como lista: el orden de los ejes no depende del orden de claves del JSON
+    return dict(arreglos, dims=[[nombre, etiquetas[nombre]] for nombre in activas],
+                forma=forma, descartadas=descartadas, bytes=tamaño(arreglos))
+
+
+# Filtros en el navegador: suma del cubo por polígono para la combinación
+# elegida y recoloreado de la capa de total de incidentes
+FILTROS_JS = """
+const SELECTORES_FILTRO = {
+    'año': 'filtro-año', 'trimestre': 'filtro-trimestre',
+    'categoria': 'filtro-categoria', 'severidad': 'filtro-severidad'
+};
+
+function decodificarCubo(b64, tipo) {
+    const bytes = Uint8Array.from(atob(b64), c => c.charCodeAt(0));
+    const Tipo = {uint8: Uint8Array, uint16: Uint16Array, uint32: Uint32Array}[tipo];
+    return new Tipo(bytes.buffer);
+}
+
+const cuboConteos = decodificarCubo(CUBO_FILTROS.conteos, CUBO_FILTROS.tipo);
+// Índices de las celdas no vacías a partir de la máscara de bits (bit b del byte i = celda 8i + b)
+function celdasDeMascara(b64, n) {
+    const bits = decodificarCubo(b64, 'uint8');
+    const celdas = new Uint32Array(n);
+    let k = 0;
+    for (let i = 0; i < bits.length; i++) {
+        for (let b = 0; bits[i] >> b; b++) {
+            if ((bits[i] >> b) & 1) celdas[k++] = 8 * i + b;
+        }
+    }
+    return celdas;
+}
+
+const cuboCeldas = CUBO_FILTROS.celdas ? decodificarCubo(CUBO_FILTROS.celdas, 'uint32')
+    : CUBO_FILTROS.mascara ? celdasDeMascara(CUBO_FILTROS.mascara, cuboConteos.length) : null;
+const cuboDims = CUBO_FILTROS.dims.map(([dim, etiquetas]) => dim);
+const cuboEtiquetas = CUBO_FILTROS.dims.map(([dim, etiquetas]) => etiquetas);
+
+CUBO_FILTROS.descartadas.forEach(dim => {
+    const select = document.getElementById(SELECTORES_FILTRO[dim]);
+    select.disabled = true;
+    select.title = 'No disponible en este mapa (límite de tamaño de datos)';
+});
+
+function conteosFiltrados(seleccion) {
+    // seleccion[d]: código del valor elegido en la dimensión d, -1 = todos,
+    // -2 = valor sin incidentes (ninguna celda coincide)
+    const forma = CUBO_FILTROS.forma;
+    const totales = new Float64Array(forma[0]);
+    for (let k = 0; k < cuboConteos.length; k++) {
+        const n = cuboConteos[k];
+        if (!n) continue;
+        let resto = cuboCeldas ? cuboCeldas[k] : k;
+        let ok = true;
+        for (let d = forma.length - 1; d >= 1; d--) {
+            const v = resto % forma[d];
+            resto = (resto - v) / forma[d];
+            if (seleccion[d - 1] !== -1 && v !== seleccion[d - 1]) { ok = false; break; }
+        }
+        if (ok) totales[resto] += n;
+    }
+    return totales;
+}
+
+function cuantil(valores, q) {
+    // Interpolación lineal, como pandas.Series.quantile
+    const orden = Array.from(valores).sort((a, b) => a - b);
+    const h = (orden.length - 1) * q, i = Math.floor(h);
+    return i + 1 < orden.length ? orden[i] + (h - i) * (orden[i + 1] - orden[i]) : orden[i];
+}
+
+let originalesFiltro = null;
+
+function aplicarFiltros() {
+    const valores = {};
+    Object.entries(SELECTORES_FILTRO).forEach(([dim, id]) => valores[dim] = document.getElementById(id).value);
+    const activos = cuboDims.filter(dim => !['todos', 'todas'].includes(valores[dim]));
+    
+    const features = CAPAS_FILTRO.datos.features;
+    if (originalesFiltro === null) {
+        originalesFiltro = {
+            colores: features.map(f => f.properties.color[CAPA_INCIDENTES]),
+            tooltips: features.map(f => f.properties.tooltip[CAPA_INCIDENTES])
+        };
+    }
+    
+    let texto = '<b>Filtros aplicados:</b><br>';
+    if (activos.length === 0) {
+        CAPAS_FILTRO.actualizar(CAPA_INCIDENTES, originalesFiltro.colores, originalesFiltro.tooltips);
+        texto += 'Ninguno (mapa original)';
+    } else {
+        const seleccion = cuboDims.map((dim, d) => {
+            if (!activos.includes(dim)) return -1;
+            const codigo = cuboEtiquetas[d].indexOf(valores[dim]);
+            return codigo >= 0 ? codigo : -2;
+        });
+        const totales = conteosFiltrados(seleccion);
+        const vmax = cuantil(totales, 0.95);
+        const colores = Array.from(totales, n => n > 0
+            ? PALETA_INCIDENTES[vmax > 0 ? Math.min(255, Math.round(255 * n / vmax)) : 255]
+            : '#cccccc');
+        const tooltips = features.map((f, p) =>
+            `${f.properties.popup.colonia}: ${totales[p].toLocaleString('en-US')} incidentes`);
+        CAPAS_FILTRO.actualizar(CAPA_INCIDENTES, colores, tooltips);
+        
+        if (valores['año'] !== 'todos' && activos.includes('año')) texto += `Año: ${valores['año']}<br>`;
+        if (valores['trimestre'] !== 'todos' && activos.includes('trimestre')) texto += `Trimestre: Q${valores['trimestre']}<br>`;
+        if (valores['categoria'] !== 'todas' && activos.includes('categoria')) texto += `Categoría: ${valores['categoria'].substring(0,20)}...<br>`;
+        if (valores['severidad'] !== 'todas' && activos.includes('severidad')) texto += `Severidad: ${valores['severidad']}<br>`;
+        const total = totales.reduce((a, b) => a + b, 0);
+        const colonias = totales.filter(n => n > 0).length;
+        texto += `<br>${total.toLocaleString('en-US')} incidentes en ${colonias.toLocaleString('en-US')} colonias`;
+    }
+    
+    document.getElementById('texto-resultados').innerHTML = texto;
+    document.getElementById('resultados-filtros').style.display = 'block';
+}
+"""
+
+
+class FiltrosCubo(MacroElement):
+    """Datos del cubo de filtros + FILTROS_JS, después de CapasPoligonos en el script del mapa"""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        const CUBO_FILTROS = {{ this.cubo | tojson }};
+        const PALETA_INCIDENTES = {{ this.paleta | tojson }};
+        const CAPAS_FILTRO = {{ this.capas.get_name() }};
+        const CAPA_INCIDENTES = {{ this.capa_incidentes }};
+        {{ this.js }}
+        {% endmacro %}
+    """)
+
+    def __init__(self, capas, cubo, capa_incidentes=0):
+        super().__init__()
+        self._name = 'FiltrosCubo'
+        self.capas = capas
+        self.cubo = cubo
+        self.capa_incidentes = capa_incidentes
+        # Escala de la capa de incidentes discretizada en 256 colores
+        escala = cm.LinearColormap(COLORES_INCIDENTES, vmin=0, vmax=255)
+        self.paleta = [escala(i) for i in range(256)]
+        self.js = FILTROS_JS
+
+
+def opciones_filtro(cubo, nombre, textos=None):
+    """
+    <option> de un filtro con las etiquetas exactas del cubo (las que busca
+    FILTROS_JS); sin el valor nulo y vacío si la dimensión se descartó
+    """
+    etiquetas = dict(cubo['dims']).get(nombre, [])
+    textos = textos or {}
+    return ''.join(f'<option value="{e}">{textos.get(e, e[:30])}</option>' for e in etiquetas if e is not None)
+
+
 def agregar_filtros_temporales(m, df_incidentes, gdf_poligonos):
-    """Agregar panel de filtros HTML/JS personalizado"""
+    """Agregar panel de filtros HTML/JS que recolorea el mapa en el navegador (cubo embebido)"""
     
-    # Obtener años disponibles
-    años = sorted(df_incidentes['Año'].unique())
-    categorias = sorted(df_incidentes['Categoria_Incidente'].unique())
+    # Cubo compacto embebido: los filtros recolorean la capa de total de
+    # incidentes en el navegador (primera métrica de CapasPoligonos); las
+    # opciones de cada filtro salen de sus etiquetas
+    cubo = cubo_filtros(gdf_poligonos, df_incidentes)
+    print(f"  Cubo de filtros: {cubo['bytes'] / 1024:.0f} KB "
+          f"({', '.join(nombre for nombre, _ in cubo['dims'])}; presupuesto {PRESUPUESTO_CUBO_BYTES / 1024:.0f} KB)")
     
     # HTML para panel de filtros
     filtros_html = f"""
@@ -401,7 +721,7 @@ def agregar_filtros_temporales(m, df_incidentes, gdf_poligonos):
             <label><b>📅 Año:</b></label><br>
             <select id="filtro-año" style="width: 100%; padding: 5px;">
                 <option value="todos">Todos</option>
-                {''.join([f'<option value="{año}">{año}</option>' for año in años])}
+                {opciones_filtro(cubo, 'año')}
             </select>
         </div>
         
@@ -409,10 +729,7 @@ def agregar_filtros_temporales(m, df_incidentes, gdf_poligonos):
             <label><b>📆 Trimestre:</b></label><br>
             <select id="filtro-trimestre" style="width: 100%; padding: 5px;">
                 <option value="todos">Todos</option>
-                <option value="1">Q1 (Ene-Mar)</option>
-                <option value="2">Q2 (Abr-Jun)</option>
-                <option value="3">Q3 (Jul-Sep)</option>
-                <option value="4">Q4 (Oct-Dic)</option>
+                {opciones_filtro(cubo, 'trimestre', TEXTOS_TRIMESTRE)}
             </select>
         </div>
         
@@ -420,7 +737,7 @@ def agregar_filtros_temporales(m, df_incidentes, gdf_poligonos):
             <label><b>🏷️ Categoría:</b></label><br>
             <select id="filtro-categoria" style="width: 100%; padding: 5px; font-size: 10px;">
                 <option value="todas">Todas</option>
-                {''.join([f'<option value="{cat}">{cat[:30]}</option>' for cat in categorias])}
+                {opciones_filtro(cubo, 'categoria')}
             </select>
         </div>
         
@@ -428,9 +745,7 @@ def agregar_filtros_temporales(m, df_incidentes, gdf_poligonos):
             <label><b>⚠️ Severidad:</b></label><br>
             <select id="filtro-severidad" style="width: 100%; padding: 5px;">
                 <option value="todas">Todas</option>
-                <option value="ALTA">🔴 Alta</option>
-                <option value="MEDIA">🟡 Media</option>
-                <option value="BAJA">🟢 Baja</option>
+                {opciones_filtro(cubo, 'severidad', TEXTOS_SEVERIDAD)}
             </select>
         </div>
         
@@ -458,33 +773,13 @@ def agregar_filtros_temporales(m, df_incidentes, gdf_poligonos):
         </div>
     </div>
     
-    <script>
-    function aplicarFiltros() {{
-        const año = document.getElementById('filtro-año').value;
-        const trimestre = document.getElementById('filtro-trimestre').value;
-        const categoria = document.getElementById('filtro-categoria').value;
-        const severidad = document.getElementById('filtro-severidad').value;
-        
-        // Mostrar resultados
-        const resultDiv = document.getElementById('resultados-filtros');
-        const textoDiv = document.getElementById('texto-resultados');
-        
-        let texto = '<b>Filtros aplicados:</b><br>';
-        if (año !== 'todos') texto += `Año: ${{año}}<br>`;
-        if (trimestre !== 'todos') texto += `Trimestre: Q${{trimestre}}<br>`;
-        if (categoria !== 'todas') texto += `Categoría: ${{categoria.substring(0,20)}}...<br>`;
-        if (severidad !== 'todas') texto += `Severidad: ${{severidad}}<br>`;
-        
-        textoDiv.innerHTML = texto;
-        resultDiv.style.display = 'block';
-        
-        alert('Filtros aplicados. En una versión con backend, esto actualizaría el mapa en tiempo real.');
-    }}
-    </script>
     """
     
     m.get_root().html.add_child(folium.Element(filtros_html))
     
+    capas = next(c for c in m._children.values() if isinstance(c, CapasPoligonos))
+    FiltrosCubo(capas, cubo, capa_incidentes=0).add_to(m)
+    
     return m
 
 
@@ -529,10 +824,10 @@ def main():
     print("="*70)
     
     # 1. Cargar datos
-    gdf_poligonos, df_incidentes = cargar_datos()
+    gdf_poligonos, df_incidentes, desglose = cargar_datos()
     
     # 2. Crear mapa base con capas
-    m = crear_mapa_interactivo(gdf_poligonos, df_incidentes)
+    m = crear_mapa_interactivo(gdf_poligonos, df_incidentes, desglose)
     
     # 3. Agregar filtros personalizados
     m = agregar_filtros_temporales(m, df_incidentes, gdf_poligonos)
@@ -553,7 +848,7 @@ def main():
     print("\n🎯 Características:")
     print("   • 5 capas de visualización (incidentes, tasa, riesgo, severidad, población)")
     print("   • Popups detallados con demografía e incidentes")
-    print("   • Panel de filtros (año, trimestre, categoría, severidad)")
+    print("   • Panel de filtros (año, trimestre, categoría, severidad) sin servidor")
     print("   • Controles: zoom, capas, búsqueda, medición, pantalla completa")
     print("   • Mini mapa de navegación")
     print("="*70)
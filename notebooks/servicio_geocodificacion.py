@@ -0,0 +1,250 @@
+"""
+Servicio de geocodificación de colonias con backends intercambiables
+
+Permite importar los scripts de geocodificación como librería (sin efectos
+secundarios al importar). El cliente de Google Maps solo se construye la
+primera vez que realmente se necesita una petición.
+
+Backends disponibles:
+    - 'google':     Google Maps Geocoding API (requiere GOOGLE_MAPS_API_KEY)
+    - 'centroides': Índice offline con centroides de poligonos_hermosillo.csv
+    - 'local':      Stub con coordenadas conocidas (dict o CSV), sin red
+"""
+
+import os
+from pathlib import Path
+import unicodedata
+
+import pandas as pd
+
+
+project_root = Path(__file__).parent.parent
+POLIGONOS_PATH = project_root / 'data' / 'raw' / 'poligonos_hermosillo.csv'
+
+
+def normalizar_nombre(nombre):
+    """Normalizar nombre de colonia para búsquedas (mayúsculas, sin acentos ni espacios extra)"""
+    if nombre is None or (isinstance(nombre, float) and pd.isna(nombre)):
+        return ''
+    texto = unicodedata.normalize('NFKD', str(nombre).upper())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.split())
+
+
+def _resultado_formato_google(lat, lng, direccion, tipo_ubicacion, place_id='', tipos=None):
+    """Construir un resultado con la misma forma que devuelve googlemaps.Client.geocode()[0]"""
+    return {
+        'geometry': {
+            'location': {'lat': float(lat), 'lng': float(lng)},
+            'location_type': tipo_ubicacion,
+        },
+        'formatted_address': direccion,
+        'place_id': place_id,
+        'types': tipos or [],
+    }
+
+
+class BackendGoogle:
+    """Backend de Google Maps con creación perezosa del cliente"""
+
+    nombre = 'google'
+
+    def __init__(self, api_key=None):
+        self._api_key = api_key
+        self._cliente = None
+
+    @property
+    def api_key(self):
+        if self._api_key is None:
+            from dotenv import load_dotenv
+            load_dotenv()
+            self._api_key = os.environ.get('GOOGLE_MAPS_API_KEY')
+        return self._api_key
+
+    @property
+    def disponible(self):
+        return bool(self.api_key)
+
+    @property
+    def cliente(self):
+        """Crear el cliente de googlemaps la primera vez que se usa"""
+        if self._cliente is None:
+            if not self.api_key:
+                raise ValueError(
+                    "❌ ERROR: No se encontró la variable de entorno GOOGLE_MAPS_API_KEY\n"
+                    "Por favor, crea un archivo .env en la raíz del proyecto con:\n"
+                    "GOOGLE_MAPS_API_KEY=tu_api_key_aqui\n"
+                    "o usa un backend offline (GEOCODIFICADOR=centroides)."
+                )
+            import googlemaps
+            self._cliente = googlemaps.Client(key=self.api_key)
+        return self._cliente
+
+    def geocode(self, direccion, colonia):
+        return self.cliente.geocode(direccion)
+
+
+class BackendCentroides:
+    """
+    Backend offline: busca la colonia por nombre en los polígonos INE
+    y devuelve el centroide (punto representativo) del polígono.
+    """
+
+    nombre = 'centroides'
+
+    def __init__(self, poligonos_path=POLIGONOS_PATH):
+        self.poligonos_path = Path(poligonos_path)
+        self._indice = None
+
+    @property
+    def disponible(self):
+        return self.poligonos_path.exists()
+
+    @property
+    def indice(self):
+        """Construir el índice nombre → (lat, lng, cve_col) la primera vez que se usa"""
+        if self._indice is None:
+            from almacen_poligonos import cargar_almacen
+
+            almacen = cargar_almacen(self.poligonos_path)
+            poligonos = almacen.gdf
+            # Punto representativo precalculado en el almacén (siempre dentro del polígono)
+            geometria = almacen.geometria
+
+            self._indice = {}
+            for nom_col, cve_col, lat, lng in zip(poligonos['nom_col'], poligonos['cve_col'],
+                                                  geometria['punto_y'], geometria['punto_x']):
+                clave = normalizar_nombre(nom_col)
+                # Si hay nombres repetidos se conserva el primero (comportamiento determinista)
+                if clave and clave not in self._indice:
+                    self._indice[clave] = (lat, lng, str(cve_col), nom_col)
+        return self._indice
+
+    def geocode(self, direccion, colonia):
+        encontrado = self.indice.get(normalizar_nombre(colonia))
+        if encontrado is None:
+            return []
+        lat, lng, cve_col, nom_col = encontrado
+        return [_resultado_formato_google(
+            lat, lng,
+            direccion=f"{nom_col}, Hermosillo, Son., México",
+            tipo_ubicacion='CENTROIDE_POLIGONO',
+            place_id=cve_col,
+            tipos=['colonia_ine'],
+        )]
+
+
+class BackendLocal:
+    """
+    Stub local sin red: responde con coordenadas conocidas.
+
+    Args:
+        coordenadas: dict {colonia: (lat, lng)} o ruta a un CSV con
+                     columnas COLONIA, LATITUD, LONGITUD
+    """
+
+    nombre = 'local'
+
+    def __init__(self, coordenadas=None):
+        self._fuente = coordenadas
+        self._indice = None
+
+    @property
+    def disponible(self):
+        return True
+
+    @property
+    def indice(self):
+        if self._indice is None:
+            fuente = self._fuente
+            if fuente is None:
+                fuente = {}
+            elif not isinstance(fuente, dict):
+                df = pd.read_csv(fuente).dropna(subset=['LATITUD', 'LONGITUD'])
+                fuente = dict(zip(df['COLONIA'], zip(df['LATITUD'], df['LONGITUD'])))
+            self._indice = {normalizar_nombre(k): v for k, v in fuente.items()}
+        return self._indice
+
+    def geocode(self, direccion, colonia):
+        encontrado = self.indice.get(normalizar_nombre(colonia))
+        if encontrado is None:
+            return []
+        lat, lng = encontrado
+        return [_resultado_formato_google(
+            lat, lng, direccion=direccion, tipo_ubicacion='LOCAL', tipos=['stub_local']
+        )]
+
+
+BACKENDS = {
+    'google': BackendGoogle,
+    'centroides': BackendCentroides,
+    'local': BackendLocal,
+}
+
+
+class ServicioGeocodificacion:
+    """
+    Fachada de geocodificación usada por los scripts del pipeline.
+
+    Args:
+        backend: instancia de backend o nombre ('google', 'centroides', 'local')
+        ciudad, estado, pais: componentes de la dirección a geocodificar
+    """
+
+    def __init__(self, backend='google', ciudad="Hermosillo", estado="Sonora", pais="México"):
+        if isinstance(backend, str):
+            if backend not in BACKENDS:
+                raise ValueError(f"Backend de geocodificación desconocido: {backend} "
+                                 f"(opciones: {', '.join(BACKENDS)})")
+            backend = BACKENDS[backend]()
+        self.backend = backend
+        self.ciudad = ciudad
+        self.estado = estado
+        self.pais = pais
+
+    @property
+    def nombre(self):
+        return self.backend.nombre
+
+    @property
+    def disponible(self):
+        return self.backend.disponible
+
+    def geocodificar(self, colonia):
+        """
+        Obtiene coordenadas y información de una colonia
+
+        Returns:
+            tuple: (dict con información de ubicación, tipo de resultado)
+                   tipo de resultado: 'success', 'not_found', 'error'
+        """
+        direccion = f"{colonia}, {self.ciudad}, {self.estado}, {self.pais}"
+
+        try:
+            resultado = self.backend.geocode(direccion, colonia)
+
+            if resultado:
+                return resultado[0], 'success'
+            else:
+                print(f"  ⚠️  No se encontró: {colonia}")
+                return None, 'not_found'
+        except ValueError:
+            # Configuración inválida (p. ej. sin API key): no es un error por colonia
+            raise
+        except Exception as e:
+            print(f"  ❌ Error con {colonia}: {e}")
+            return None, 'error'
+
+
+def crear_servicio(backend=None):
+    """
+    Crear servicio de geocodificación.
+
+    Si no se especifica backend se usa la variable de entorno GEOCODIFICADOR
+    y, por defecto, 'google'.
+    """
+    if backend is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+        backend = os.environ.get('GEOCODIFICADOR', 'google')
+    return ServicioGeocodificacion(backend)
@@ -5,11 +5,20 @@ Usa spatial join para asignar incidentes a polígonos y calcula índices delicti
 
 import pandas as pd
 import geopandas as gpd
-from shapely import wkt
 from pathlib import Path
 import numpy as np
 from datetime import datetime
 
+from agregacion_poligonos import ORDEN_SEVERIDAD, a_formato_largo, conteos_desde_cubo
+from agregados_mensuales import actualizar_agregados, version_agregados
+from almacen_poligonos import cargar_almacen
+from artefactos_dashboard import preparar_artefactos
+from datos_unificados import (DESGLOSE, INCIDENTES, POLIGONOS, UNIFICADO_DIR,
+                              guardar_incidentes_compactos, guardar_parquet)
+from geometria_simplificada import NIVELES_GEOMETRIA, calcular_niveles
+from indices_delictivos import calcular as calcular_indices_delictivos
+
+
 def cargar_datos_base():
     """Cargar todos los datasets necesarios"""
     print("="*70)
@@ -18,25 +27,10 @@ def cargar_datos_base():
     
     project_root = Path(__file__).parent.parent
     
-    # 1. Polígonos (BASE MAESTRA)
+    # 1. Polígonos (BASE MAESTRA) desde el almacén persistente (GeoParquet + índice)
     print("\n[1/6] Cargando polígonos (base maestra)...")
-    poligonos_path = project_root / 'data' / 'raw' / 'poligonos_hermosillo.csv'
-    poligonos = pd.read_csv(poligonos_path)
-    
-    # Detectar columna WKT y convertir a geometría (acepta 'POLIGONO_WKT' o 'geometry')
-    if 'POLIGONO_WKT' in poligonos.columns:
-        wkt_col = 'POLIGONO_WKT'
-    elif 'geometry' in poligonos.columns:
-        wkt_col = 'geometry'
-    else:
-        raise KeyError("No WKT column found in poligonos_hermosillo.csv (expected 'POLIGONO_WKT' or 'geometry')")
-
-    # Convertir WKT a geometría
-    gdf_poligonos = gpd.GeoDataFrame(
-        poligonos,
-        geometry=poligonos[wkt_col].apply(wkt.loads),
-        crs='EPSG:4326'
-    )
+    almacen = cargar_almacen()
+    gdf_poligonos = almacen.gdf.copy()
     print(f"   Polígonos cargados: {len(gdf_poligonos):,}")
 
     # Normalizar nombres de columnas para compatibilidad con el resto del script
@@ -90,37 +84,36 @@ def preparar_incidentes_con_geometria(reportes, mapeo, coords):
     """
     Crear GeoDataFrame de incidentes con coordenadas
     Cada incidente hereda las coordenadas de su colonia
+
+    En lugar de unir mapeo y coordenadas contra los ~2.3M reportes, COLONIA se
+    codifica a un id entero y la normalización, las coordenadas y el filtro
+    geográfico se resuelven sobre arreglos de una entrada por colonia distinta;
+    el único DataFrame del tamaño de los reportes es el resultado final.
     """
     print("\n" + "="*70)
     print("PREPARANDO INCIDENTES CON GEOMETRÍA")
     print("="*70)
     
-    # Normalizar nombres de colonias
+    # Código entero por colonia (una sola pasada sobre los reportes)
     print("\nNormalizando nombres de colonias...")
-    reportes_norm = reportes.merge(
-        mapeo, 
-        left_on='COLONIA', 
-        right_on='COLONIA_ORIGINAL',
-        how='left'
-    )
+    codigos, colonias = pd.factorize(reportes['COLONIA'])
+    conteo_colonia = np.bincount(codigos[codigos >= 0], minlength=len(colonias))
     
     # Llenar NaN en COLONIA_NORMALIZADA (colonias que no necesitaron normalización)
-    reportes_norm['COLONIA_NORMALIZADA'] = reportes_norm['COLONIA_NORMALIZADA'].fillna(reportes_norm['COLONIA'])
+    mapeo_unico = mapeo.drop_duplicates(subset=['COLONIA_ORIGINAL']).set_index('COLONIA_ORIGINAL')
+    normalizada = mapeo_unico['COLONIA_NORMALIZADA'].reindex(colonias)
+    normalizada = normalizada.fillna(pd.Series(colonias, index=normalizada.index))
     
-    # Agregar coordenadas
+    # Agregar coordenadas (por colonia distinta)
     print("Agregando coordenadas...")
-    reportes_geo = reportes_norm.merge(
-        coords[['COLONIA', 'LATITUD', 'LONGITUD']], 
-        left_on='COLONIA_NORMALIZADA', 
-        right_on='COLONIA',
-        how='left',
-        suffixes=('', '_coord')
-    )
+    coords_unico = coords.drop_duplicates(subset=['COLONIA']).set_index('COLONIA')
+    latitud = coords_unico['LATITUD'].reindex(normalizada.to_numpy()).to_numpy(dtype=float)
+    longitud = coords_unico['LONGITUD'].reindex(normalizada.to_numpy()).to_numpy(dtype=float)
     
     # Filtrar solo los que tienen coordenadas
-    antes = len(reportes_geo)
-    reportes_geo = reportes_geo.dropna(subset=['LATITUD', 'LONGITUD'])
-    con_coords = len(reportes_geo)
+    tiene_coords = ~np.isnan(latitud) & ~np.isnan(longitud)
+    antes = len(reportes)
+    con_coords = int(conteo_colonia[tiene_coords].sum())
     
     print(f"   Incidentes con coordenadas: {con_coords:,} ({con_coords/antes*100:.1f}%)")
     print(f"   Incidentes sin coordenadas: {antes - con_coords:,} ({(antes-con_coords)/antes*100:.1f}%)")
@@ -132,56 +125,95 @@ def preparar_incidentes_con_geometria(reportes, mapeo, coords):
         'min_lat': 28.95, 'max_lat': 29.2
     }
     
-    dentro_bounds = (
-        (reportes_geo['LONGITUD'] >= hermosillo_bounds['min_lon']) &
-        (reportes_geo['LONGITUD'] <= hermosillo_bounds['max_lon']) &
-        (reportes_geo['LATITUD'] >= hermosillo_bounds['min_lat']) &
-        (reportes_geo['LATITUD'] <= hermosillo_bounds['max_lat'])
+    dentro_bounds = tiene_coords & (
+        (longitud >= hermosillo_bounds['min_lon']) &
+        (longitud <= hermosillo_bounds['max_lon']) &
+        (latitud >= hermosillo_bounds['min_lat']) &
+        (latitud <= hermosillo_bounds['max_lat'])
     )
     
-    fuera_bounds = (~dentro_bounds).sum()
-    reportes_geo = reportes_geo[dentro_bounds]
+    # Filas que sobreviven: lookup del código en el arreglo por colonia (-1 → descartado)
+    conservar = np.append(dentro_bounds, False)[codigos]
+    filas = np.flatnonzero(conservar)
+    cod_filas = codigos[filas]
+    dentro = len(filas)
+    fuera_bounds = con_coords - dentro
     
-    print(f"   Incidentes dentro de Hermosillo: {len(reportes_geo):,} ({len(reportes_geo)/con_coords*100:.1f}%)")
+    print(f"   Incidentes dentro de Hermosillo: {dentro:,} ({dentro/con_coords*100:.1f}%)")
     print(f"   Incidentes fuera (outliers): {fuera_bounds:,} ({fuera_bounds/con_coords*100:.1f}%)")
     
-    # Crear geometría de puntos
+    # Crear geometría de puntos (un Point por colonia, compartido por sus incidentes)
     print("Creando geometría de puntos...")
+    puntos_colonia = gpd.points_from_xy(longitud, latitud)
+    cod_normalizada, normalizadas = pd.factorize(normalizada)
     gdf_reportes = gpd.GeoDataFrame(
-        reportes_geo,
-        geometry=gpd.points_from_xy(
-            reportes_geo['LONGITUD'], 
-            reportes_geo['LATITUD']
-        ),
+        reportes.iloc[filas],
+        geometry=puntos_colonia[cod_filas],
         crs='EPSG:4326'
     )
+    gdf_reportes['COLONIA_NORMALIZADA'] = pd.Categorical.from_codes(cod_normalizada[cod_filas], normalizadas)
+    gdf_reportes['LATITUD'] = latitud[cod_filas]
+    gdf_reportes['LONGITUD'] = longitud[cod_filas]
     
     return gdf_reportes
 
 
-def spatial_join_incidentes_poligonos(gdf_reportes, gdf_poligonos):
+def spatial_join_incidentes_poligonos(gdf_reportes, gdf_poligonos, almacen=None):
     """
     Asignar cada incidente al polígono que lo contiene mediante spatial join
+
+    Todos los incidentes de una colonia heredan la misma coordenada geocodificada,
+    así que el join se hace sobre los ~2k puntos distintos (LATITUD, LONGITUD) con
+    el índice persistido del almacén de polígonos, y el resultado se propaga a los
+    incidentes con un join por clave entera.
     """
     print("\n" + "="*70)
     print("SPATIAL JOIN: INCIDENTES → POLÍGONOS")
     print("="*70)
     
-    print("\nRealizando spatial join (esto puede tomar unos minutos)...")
+    if almacen is None:
+        almacen = cargar_almacen()
+    
+    # Clave entera por punto distinto (0..n_puntos-1)
+    punto_id = gdf_reportes.groupby(['LATITUD', 'LONGITUD'], sort=False, dropna=False).ngroup()
+    punto_id = punto_id.to_numpy()
+    primeros = np.unique(punto_id, return_index=True)[1]
+    
+    print(f"\nRealizando spatial join sobre {len(primeros):,} puntos distintos "
+          f"({len(gdf_reportes):,} incidentes)...")
     
-    # Spatial join: cada punto cae en UN polígono
-    incidentes_en_poligonos = gpd.sjoin(
-        gdf_reportes,
-        gdf_poligonos[['CVE_COL', 'COLONIA', 'CP', 'geometry']],
-        how='left',
-        predicate='within'
+    # Spatial join (predicado 'within'): cada punto cae en UN polígono
+    idx_punto, idx_poligono = almacen.localizar_pares(
+        gdf_reportes['LONGITUD'].to_numpy()[primeros],
+        gdf_reportes['LATITUD'].to_numpy()[primeros]
     )
+    pares = gdf_poligonos[['CVE_COL', 'COLONIA', 'CP']].iloc[idx_poligono].reset_index(names='index_right')
+    pares.insert(0, 'punto_id', idx_punto)
+    
+    # Left join: puntos fuera de todo polígono quedan con NaN
+    sin_match = np.setdiff1d(np.arange(len(primeros)), idx_punto)
+    if len(sin_match) > 0:
+        pares = pd.concat([pares, pd.DataFrame({'punto_id': sin_match})], ignore_index=True)
+    puntos_en_poligonos = pares.sort_values('punto_id', kind='stable')
+    
+    # Propagar CVE_COL (y columnas del polígono) a los incidentes por punto_id
+    cols_poligono = ['index_right', 'CVE_COL', 'COLONIA', 'CP']
+    incidentes_en_poligonos = gdf_reportes.rename(columns={'COLONIA': 'COLONIA_REPORTE'})
+    
+    if puntos_en_poligonos['punto_id'].is_unique:
+        # Caso normal (polígonos sin traslape): indexado directo con arrays
+        asignacion = puntos_en_poligonos.set_index('punto_id').sort_index()
+        incidentes_en_poligonos = incidentes_en_poligonos.assign(**{
+            col: asignacion[col].to_numpy()[punto_id] for col in cols_poligono
+        })
+    else:
+        # Puntos en polígonos traslapados: duplicar incidentes igual que sjoin por incidente
+        incidentes_en_poligonos = incidentes_en_poligonos.assign(punto_id=punto_id).join(
+            puntos_en_poligonos.set_index('punto_id')[cols_poligono], on='punto_id'
+        ).drop(columns='punto_id')
     
     # Renombrar para evitar confusión
-    incidentes_en_poligonos.rename(columns={
-        'COLONIA_right': 'COLONIA_POLIGONO',
-        'COLONIA_left': 'COLONIA_REPORTE'
-    }, inplace=True)
+    incidentes_en_poligonos.rename(columns={'COLONIA': 'COLONIA_POLIGONO'}, inplace=True)
     
     # Estadísticas de cobertura
     con_poligono = incidentes_en_poligonos['CVE_COL'].notna().sum()
@@ -254,9 +286,17 @@ def merge_demografia_poligonos_por_clave(demografia, gdf_poligonos):
     return demografia_final
 
 
-def agregar_por_poligono(incidentes_en_poligonos, gdf_poligonos, demografia_por_poligono):
+def agregar_por_poligono(incidentes_en_poligonos, gdf_poligonos, demografia_por_poligono, reconstruir=False):
     """
     Agregar todos los incidentes por polígono y unir con demografía
+
+    Las métricas se suman a partir de los agregados mensuales materializados
+    (ver agregados_mensuales): solo se recalculan los meses nuevos o modificados.
+
+    Returns:
+        (resultado, desglose): polígonos con métricas agregadas y tabla larga
+        (CVE_COL, dimension, valor, incidentes) con los conteos por categoría,
+        parte del día, día de la semana y severidad
     """
     print("\n" + "="*70)
     print("AGREGACIÓN POR POLÍGONO")
@@ -266,28 +306,34 @@ def agregar_por_poligono(incidentes_en_poligonos, gdf_poligonos, demografia_por_
     inc_validos = incidentes_en_poligonos.dropna(subset=['CVE_COL'])
     print(f"\nIncidentes válidos para agregación: {len(inc_validos):,}")
     
-    # AGREGACIONES
-    print("Calculando agregaciones...")
-    
-    # Agregaciones simples
-    agg_dict = {
-        'total_incidentes': ('TIPO DE INCIDENTE', 'count'),
-        'incidentes_alta': ('Nivel_Severidad', lambda x: (x == 'ALTA').sum()),
-        'incidentes_media': ('Nivel_Severidad', lambda x: (x == 'MEDIA').sum()),
-        'incidentes_baja': ('Nivel_Severidad', lambda x: (x == 'BAJA').sum()),
-        'categorias_dict': ('Categoria_Incidente', lambda x: x.value_counts().to_dict()),
-        'partes_dia_dict': ('ParteDelDia', lambda x: x.value_counts().to_dict()),
-        'incidentes_fin_semana': ('EsFinDeSemana', 'sum'),
-        'incidentes_quincena': ('EsQuincena', 'sum'),
-        'dias_semana_dict': ('DiaDeLaSemana', lambda x: x.value_counts().to_dict()),
-        'fecha_inicio': ('Timestamp', 'min'),
-        'fecha_fin': ('Timestamp', 'max')
-    }
+    # AGREGADOS MENSUALES (incremental) → métricas por polígono sumando particiones
+    print("Actualizando agregados mensuales...")
+    cubo = actualizar_agregados(inc_validos, version=version_agregados(), reconstruir=reconstruir)
+    print(f"   Filas del cubo mensual: {len(cubo):,}")
     
-    agg_incidentes = inc_validos.groupby('CVE_COL').agg(**agg_dict).reset_index()
+    print("Calculando agregaciones...")
+    base, matrices = conteos_desde_cubo(cubo, gdf_poligonos['CVE_COL'])
+    severidad = matrices['severidad'].reindex(columns=ORDEN_SEVERIDAD, fill_value=0)
+    
+    agg_incidentes = pd.DataFrame({
+        'total_incidentes': base['total_incidentes'],
+        'incidentes_alta': severidad['ALTA'],
+        'incidentes_media': severidad['MEDIA'],
+        'incidentes_baja': severidad['BAJA'],
+        'incidentes_fin_semana': base['incidentes_fin_semana'],
+        'incidentes_quincena': base['incidentes_quincena'],
+        'fecha_inicio': base['fecha_inicio'],
+        'fecha_fin': base['fecha_fin']
+    })
+    # Solo polígonos con incidentes (los demás se rellenan al unir)
+    agg_incidentes = agg_incidentes[agg_incidentes.index.isin(cubo['CVE_COL'])].reset_index()
     
     print(f"   Polígonos con incidentes: {len(agg_incidentes):,}")
     
+    # Desglose por categoría / parte del día / día de la semana en formato largo
+    desglose = a_formato_largo(matrices)
+    print(f"   Filas de desglose (formato largo): {len(desglose):,}")
+    
     # UNIR CON POLÍGONOS (geometría + info base)
     print("Uniendo con polígonos...")
     resultado = gdf_poligonos.merge(agg_incidentes, on='CVE_COL', how='left')
@@ -311,12 +357,15 @@ def agregar_por_poligono(incidentes_en_poligonos, gdf_poligonos, demografia_por_
     con_demografia = resultado['poblacion_total'].notna().sum()
     print(f"   Polígonos con demografía: {con_demografia:,}")
     
-    return resultado
+    return resultado, desglose
 
 
-def calcular_indices(df_poligonos_completo):
+def calcular_indices(df_poligonos_completo, pesos=None):
     """
     Calcular índices per cápita y métricas derivadas
+
+    Las fórmulas y los pesos del índice de riesgo están declarados en
+    indices_delictivos (FORMULAS, PESOS_RIESGO) y se evalúan en una pasada.
     """
     print("\n" + "="*70)
     print("CALCULANDO ÍNDICES DELICTIVOS")
@@ -328,75 +377,29 @@ def calcular_indices(df_poligonos_completo):
     print(f"\nPolígonos con población: {con_poblacion.sum()}")
     print(f"Polígonos sin población: {(~con_poblacion).sum()}")
     
-    # TASAS POR 1000 HABITANTES
-    print("\nCalculando tasas per cápita...")
-    df_poligonos_completo.loc[con_poblacion, 'tasa_incidentes_per_1k'] = (
-        df_poligonos_completo.loc[con_poblacion, 'total_incidentes'] / 
-        df_poligonos_completo.loc[con_poblacion, 'poblacion_total'] * 1000
+    # ÁREA (insumo de la densidad poblacional), precalculada en el almacén de polígonos
+    print("\nLeyendo área proyectada de polígonos (almacén)...")
+    area_km2 = pd.Series(
+        cargar_almacen().geometria_por_cve(df_poligonos_completo['CVE_COL'])['area_km2'].to_numpy(),
+        index=df_poligonos_completo.index
     )
     
-    df_poligonos_completo.loc[con_poblacion, 'tasa_alta_severidad_per_1k'] = (
-        df_poligonos_completo.loc[con_poblacion, 'incidentes_alta'] / 
-        df_poligonos_completo.loc[con_poblacion, 'poblacion_total'] * 1000
-    )
+    # TASAS, SCORE DE SEVERIDAD, DENSIDAD E ÍNDICE DE RIESGO COMPUESTO (0-100)
+    print("Calculando tasas per cápita, score de severidad, densidad e índice de riesgo...")
+    indices = calcular_indices_delictivos(df_poligonos_completo.assign(area_km2=area_km2), pesos=pesos)
     
-    # SCORE DE SEVERIDAD (0-3, ponderado)
-    print("Calculando score de severidad...")
-    df_poligonos_completo['score_severidad'] = (
-        (df_poligonos_completo['incidentes_alta'] * 3 + 
-         df_poligonos_completo['incidentes_media'] * 2 + 
-         df_poligonos_completo['incidentes_baja'] * 1) / 
-        df_poligonos_completo['total_incidentes'].replace(0, 1)
-    )
-    
-    # DENSIDAD POBLACIONAL
-    print("Calculando densidad poblacional...")
-    df_poligonos_completo['area_km2'] = df_poligonos_completo.geometry.to_crs('EPSG:32612').area / 1e6
-    df_poligonos_completo.loc[con_poblacion, 'densidad_poblacional'] = (
-        df_poligonos_completo.loc[con_poblacion, 'poblacion_total'] / 
-        df_poligonos_completo.loc[con_poblacion, 'area_km2']
-    )
+    columnas = {
+        'tasa_incidentes_per_1k': indices['tasa_incidentes_per_1k'],
+        'tasa_alta_severidad_per_1k': indices['tasa_alta_severidad_per_1k'],
+        'score_severidad': indices['score_severidad'],
+        'area_km2': area_km2,
+        'densidad_poblacional': indices['densidad_poblacional'],
+    }
+    if 'indice_riesgo' in indices.columns:
+        columnas['indice_riesgo'] = indices['indice_riesgo']
+        print(f"   Indice de riesgo calculado para {indices['indice_riesgo'].notna().sum()} poligonos")
     
-    # ÍNDICE DE RIESGO COMPUESTO (0-100)
-    print("Calculando índice de riesgo compuesto...")
-    # Algunos datasets pueden no tener la columna 'IM_2020' (índice de marginación).
-    if 'IM_2020' in df_poligonos_completo.columns:
-        completos = con_poblacion & df_poligonos_completo['IM_2020'].notna()
-    else:
-        completos = pd.Series(False, index=df_poligonos_completo.index)
-
-    if completos.sum() > 0:
-        try:
-            from sklearn.preprocessing import MinMaxScaler
-            
-            componentes = df_poligonos_completo.loc[completos, [
-                'tasa_incidentes_per_1k',
-                'score_severidad',
-                'IM_2020',
-                'densidad_poblacional'
-            ]].copy()
-            
-            # Normalizar 0-1
-            scaler = MinMaxScaler()
-            componentes_norm = pd.DataFrame(
-                scaler.fit_transform(componentes),
-                index=componentes.index,
-                columns=componentes.columns
-            )
-            
-            # Índice ponderado
-            df_poligonos_completo.loc[completos, 'indice_riesgo'] = (
-                componentes_norm['tasa_incidentes_per_1k'] * 0.4 +
-                componentes_norm['score_severidad'] * 0.3 +
-                componentes_norm['IM_2020'] * 0.2 +
-                componentes_norm['densidad_poblacional'] * 0.1
-            ) * 100
-            
-            print(f"   Indice de riesgo calculado para {completos.sum()} poligonos")
-        except ImportError:
-            print("   ADVERTENCIA: sklearn no disponible, indice de riesgo no calculado")
-    
-    return df_poligonos_completo
+    return df_poligonos_completo.assign(**columnas)
 
 
 def generar_resumen(df_final, inc_en_poligonos):
@@ -434,8 +437,14 @@ def generar_resumen(df_final, inc_en_poligonos):
     return inc_en_poligonos.dropna(subset=['CVE_COL'])
 
 
-def main():
-    """Pipeline principal"""
+def main(exportar_geojson=False):
+    """
+    Pipeline principal
+
+    Args:
+        exportar_geojson: escribir también poligonos_unificados_completo.geojson
+            (el artefacto principal es el GeoParquet)
+    """
     print("\n" + "="*70)
     print("UNIFICACIÓN DE DATOS POR POLÍGONOS")
     print("="*70)
@@ -454,30 +463,42 @@ def main():
     incidentes_en_poligonos = spatial_join_incidentes_poligonos(gdf_reportes, gdf_poligonos)
     
     # 5. Agregar por polígono
-    df_poligonos_completo = agregar_por_poligono(incidentes_en_poligonos, gdf_poligonos, demografia_por_poligono)
+    df_poligonos_completo, desglose = agregar_por_poligono(incidentes_en_poligonos, gdf_poligonos, demografia_por_poligono)
     
     # 6. Calcular índices
     df_final = calcular_indices(df_poligonos_completo)
     
     # 6. Guardar resultados
-    project_root = Path(__file__).parent.parent
-    output_dir = project_root / 'data' / 'processed' / 'unificado'
+    output_dir = UNIFICADO_DIR
     output_dir.mkdir(exist_ok=True, parents=True)
     
     print("\n" + "="*70)
     print("GUARDANDO RESULTADOS")
     print("="*70)
     
+    # GeoParquet de polígonos (artefacto principal para mapa y dashboard)
+    print()
+    parquet_ok = guardar_parquet(df_final, POLIGONOS, output_dir)
+    # Geometría simplificada por nivel de zoom (dashboard y mapa folium)
+    guardar_parquet(calcular_niveles(df_final), NIVELES_GEOMETRIA, output_dir)
+    
     # CSV de polígonos agregados
     df_final_csv = df_final.drop(columns=['geometry'])
-    output_csv = output_dir / 'poligonos_unificados_completo.csv'
+    output_csv = output_dir / f'{POLIGONOS}.csv'
     df_final_csv.to_csv(output_csv, index=False, encoding='utf-8-sig')
-    print(f"\nGuardado: {output_csv.name}")
+    print(f"Guardado: {output_csv.name}")
+    
+    # GeoJSON de polígonos (opcional; obligatorio si no se pudo escribir el GeoParquet)
+    if exportar_geojson or not parquet_ok:
+        output_geojson = output_dir / f'{POLIGONOS}.geojson'
+        df_final.to_file(output_geojson, driver='GeoJSON')
+        print(f"Guardado: {output_geojson.name}")
     
-    # GeoJSON de polígonos
-    output_geojson = output_dir / 'poligonos_unificados_completo.geojson'
-    df_final.to_file(output_geojson, driver='GeoJSON')
-    print(f"Guardado: {output_geojson.name}")
+    # Desglose por polígono en formato largo (reemplaza las columnas *_dict)
+    if not guardar_parquet(desglose, DESGLOSE, output_dir):
+        output_desglose = output_dir / f'{DESGLOSE}.csv'
+        desglose.to_csv(output_desglose, index=False, encoding='utf-8-sig')
+        print(f"Guardado: {output_desglose.name}")
     
     # Incidentes individuales con CVE_COL (para mapa temporal)
     inc_validos = generar_resumen(df_final, incidentes_en_poligonos)
@@ -488,13 +509,24 @@ def main():
                     'Nivel_Severidad', 'LATITUD', 'LONGITUD']
     
     inc_temporal = inc_validos[cols_temporal].copy()
-    output_temporal = output_dir / 'incidentes_con_poligono_temporal.csv'
+    # Tabla de hechos compacta (claves enteras + diccionarios) para dashboard y mapas
+    guardar_incidentes_compactos(inc_temporal, output_dir)
+    output_temporal = output_dir / f'{INCIDENTES}.csv'
     inc_temporal.to_csv(output_temporal, index=False, encoding='utf-8-sig')
     print(f"Guardado: {output_temporal.name}")
     
+    # Cubo + índices del dashboard (arreglos .npy mapeados en memoria al arrancar)
+    preparar_artefactos(output_dir, reconstruir=True)
+    
     print(f"\nArchivos generados en: {output_dir}/")
     print("="*70)
 
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Unificar incidentes, demografía y polígonos")
+    parser.add_argument('--geojson', action='store_true',
+                        help="Exportar también poligonos_unificados_completo.geojson")
+    args = parser.parse_args()
+    main(exportar_geojson=args.geojson)
@@ -208,7 +208,8 @@ Write-Host "   • data/raw/poligonos_hermosillo.csv (700 colonias)" -Foregroun
 Write-Host "   • data/raw/reportes_de_incidentes_2018_2025.csv (500 MB)" -ForegroundColor Gray
 Write-Host "   • data/interim/reportes_de_incidentes_procesados_2018_2025.csv" -ForegroundColor Gray
 Write-Host "   • data/processed/unificado/poligonos_unificados_completo.csv (93 MB)" -ForegroundColor Gray
-Write-Host "   • data/processed/unificado/poligonos_unificados_completo.geojson (127 MB)" -ForegroundColor Gray
+Write-Host "   • data/processed/unificado/poligonos_unificados_completo.parquet (GeoParquet)" -ForegroundColor Gray
+Write-Host "   • data/processed/unificado/incidentes_hechos.parquet (+ incidentes_dim_*.parquet)" -ForegroundColor Gray
 Write-Host "   • mapa_interactivo_hermosillo.html (12 MB)" -ForegroundColor Green
 Write-Host ""
 Write-Host "🎯 Dashboard listo:" -ForegroundColor White
@@ -0,0 +1,35 @@
+"""notebooks/ en sys.path (los módulos del pipeline se importan entre sí como hermanos) y datos sintéticos compartidos"""
+
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'notebooks'))
+
+
+@pytest.fixture
+def incidentes():
+    """Incidentes sintéticos con las columnas de la tabla unificada (algunos sin fecha o sin categoría)"""
+    rng = np.random.default_rng(11)
+    n = 5000
+    ubicaciones = pd.DataFrame({
+        'CVE_COL': rng.integers(0, 25, 200).astype(float),
+        'LATITUD': 29.0 + rng.random(200) / 10,
+        'LONGITUD': -111.0 + rng.random(200) / 10,
+    })
+    ubicaciones['COLONIA_POLIGONO'] = 'COLONIA ' + ubicaciones['CVE_COL'].astype(int).astype(str)
+    ts = pd.Series(pd.Timestamp('2021-01-01') + pd.to_timedelta(rng.integers(0, 500 * 86400, n), unit='s'))
+    ts[rng.random(n) < 0.01] = pd.NaT
+    df = ubicaciones.iloc[rng.integers(0, len(ubicaciones), n)].reset_index(drop=True)
+    df['TIPO DE INCIDENTE'] = rng.choice(['RIÑA', 'ROBO', 'INCENDIO', 'CHOQUE'], n)
+    df['Timestamp'] = ts
+    df['ParteDelDia'] = rng.choice(['Madrugada', 'Mañana', 'Tarde', 'Noche'], n)
+    df['DiaDeLaSemana'] = rng.choice(['Lunes', 'Martes', 'Sábado'], n)
+    df['Categoria_Incidente'] = rng.choice(['CONVIVENCIA', 'VIOLENCIA', 'RESCATE', None], n)
+    df['Nivel_Severidad'] = rng.choice(['ALTA', 'MEDIA', 'BAJA'], n)
+    df['EsFinDeSemana'] = rng.random(n) < 0.3
+    df['EsQuincena'] = rng.random(n) < 0.1
+    return df
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from agregacion_poligonos import a_formato_largo, conteos_desde_cubo, conteos_por_poligono
+from agregados_mensuales import agregar_mensual
+
+
+def test_conteos_desde_cubo_coincide_con_groupby(incidentes):
+    cves = np.arange(30, dtype=float)   # incluye polígonos sin incidentes
+    base, matrices = conteos_desde_cubo(agregar_mensual(incidentes), cves)
+
+    grupos = incidentes.groupby('CVE_COL')
+    esperado = pd.DataFrame({
+        'total_incidentes': grupos.size(),
+        'incidentes_fin_semana': grupos['EsFinDeSemana'].sum(),
+        'incidentes_quincena': grupos['EsQuincena'].sum(),
+        'fecha_inicio': grupos['Timestamp'].min(),
+        'fecha_fin': grupos['Timestamp'].max(),
+    }).reindex(cves)
+    esperado[['total_incidentes', 'incidentes_fin_semana', 'incidentes_quincena']] = (
+        esperado[['total_incidentes', 'incidentes_fin_semana', 'incidentes_quincena']].fillna(0).astype(np.int64))
+    pd.testing.assert_frame_equal(base, esperado, check_names=False)
+
+    categorias = pd.crosstab(incidentes['CVE_COL'], incidentes['Categoria_Incidente'])
+    pd.testing.assert_frame_equal(
+        matrices['categoria'].loc[categorias.index, categorias.columns], categorias,
+        check_names=False, check_dtype=False)
+    assert (matrices['categoria'].drop(index=categorias.index) == 0).all().all()
+
+
+def test_conteos_desde_cubo_igual_a_conteos_por_poligono(incidentes):
+    cves = np.arange(30, dtype=float)
+    base_cubo, matrices_cubo = conteos_desde_cubo(agregar_mensual(incidentes), cves)
+    base, matrices = conteos_por_poligono(incidentes, cves)
+    pd.testing.assert_frame_equal(base_cubo, base, check_dtype=False)
+    pd.testing.assert_frame_equal(a_formato_largo(matrices_cubo), a_formato_largo(matrices))
+
+
+def test_total_incidentes_excluye_tipo_nulo_en_ambos_caminos(incidentes):
+    incidentes = incidentes.copy()
+    incidentes.loc[incidentes.index[::7], 'TIPO DE INCIDENTE'] = None
+    cves = np.arange(30, dtype=float)
+    base_cubo, _ = conteos_desde_cubo(agregar_mensual(incidentes), cves)
+    base, _ = conteos_por_poligono(incidentes, cves)
+
+    esperado = incidentes.groupby('CVE_COL')['TIPO DE INCIDENTE'].count().reindex(cves, fill_value=0)
+    np.testing.assert_array_equal(base_cubo['total_incidentes'], esperado.to_numpy())
+    pd.testing.assert_series_equal(base_cubo['total_incidentes'], base['total_incidentes'])
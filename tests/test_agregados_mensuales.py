@@ -0,0 +1,70 @@
+import pandas as pd
+import pytest
+
+import agregados_mensuales
+from agregados_mensuales import actualizar_agregados, agregar_mensual, clave_mes
+
+
+@pytest.fixture
+def recalculados(monkeypatch):
+    """Meses (YYYYMM) que actualizar_agregados vuelve a agregar en cada llamada"""
+    llamadas = []
+    original = agregados_mensuales.agregar_mensual
+
+    def registrar(incidentes):
+        llamadas.append(set(clave_mes(incidentes['Timestamp']).tolist()))
+        return original(incidentes)
+
+    monkeypatch.setattr(agregados_mensuales, 'agregar_mensual', registrar)
+
+    def ultimos():
+        return llamadas.pop() if llamadas else set()
+    return ultimos
+
+
+def ordenar(cubo):
+    # Parquet devuelve None donde agregar_mensual deja NaN
+    cubo = cubo.fillna({'Categoria_Incidente': '(sin dato)'})
+    return cubo.sort_values(list(cubo.columns[:6])).reset_index(drop=True)
+
+
+def test_reutiliza_meses_sin_cambios(incidentes, tmp_path, recalculados):
+    meses = set(clave_mes(incidentes['Timestamp']).tolist())
+    cubo = actualizar_agregados(incidentes, version='v1', directorio=tmp_path)
+    assert recalculados() == meses
+
+    # Mismo contenido en otro orden: no se recalcula nada
+    cubo_de_nuevo = actualizar_agregados(incidentes.sample(frac=1, random_state=0), version='v1', directorio=tmp_path)
+    assert recalculados() == set()
+    pd.testing.assert_frame_equal(ordenar(cubo_de_nuevo), ordenar(cubo))
+    pd.testing.assert_frame_equal(ordenar(cubo), ordenar(agregar_mensual(incidentes)))
+
+
+def test_invalida_mes_reclasificado_con_mismas_filas(incidentes, tmp_path, recalculados):
+    actualizar_agregados(incidentes, version='v1', directorio=tmp_path)
+    recalculados()
+
+    modificados = incidentes.copy()
+    filas = modificados.index[modificados['Timestamp'].dt.strftime('%Y%m') == '202103'][:10]
+    modificados.loc[filas, 'Categoria_Incidente'] = 'OTRA'
+    cubo = actualizar_agregados(modificados, version='v1', directorio=tmp_path)
+
+    assert recalculados() == {202103}
+    pd.testing.assert_frame_equal(ordenar(cubo), ordenar(agregar_mensual(modificados)))
+
+
+def test_mes_nuevo_mes_eliminado_y_cambio_de_version(incidentes, tmp_path, recalculados):
+    sin_ultimo = incidentes[incidentes['Timestamp'].isna() | (incidentes['Timestamp'] < '2022-05-01')]
+    actualizar_agregados(sin_ultimo, version='v1', directorio=tmp_path)
+    recalculados()
+
+    # Llega el mes siguiente y desaparece el primero
+    recortado = incidentes[incidentes['Timestamp'].isna() | (incidentes['Timestamp'] >= '2021-02-01')]
+    cubo = actualizar_agregados(recortado, version='v1', directorio=tmp_path)
+    assert recalculados() == {202205}
+    assert not (tmp_path / 'anio_mes=202101.parquet').exists()
+    pd.testing.assert_frame_equal(ordenar(cubo), ordenar(agregar_mensual(recortado)))
+
+    # Otra versión de las entradas (polígonos, mapeo, reglas): todo se recalcula
+    actualizar_agregados(recortado, version='v2', directorio=tmp_path)
+    assert recalculados() == set(clave_mes(recortado['Timestamp']).tolist())
@@ -0,0 +1,54 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Point, box
+
+from almacen_poligonos import AlmacenPoligonos, construir_indice_grid
+
+
+@pytest.fixture
+def poligonos():
+    """Malla 6×6 de cuadros vecinos + una colonia dentro de otra (traslape)"""
+    cajas = [box(-111 + i * 0.01, 29 + j * 0.01, -111 + (i + 1) * 0.01, 29 + (j + 1) * 0.01)
+             for j in range(6) for i in range(6)]
+    cajas.append(box(-110.995, 29.005, -110.985, 29.015))
+    return gpd.GeoDataFrame({'CVE_COL': np.arange(len(cajas))}, geometry=cajas, crs='EPSG:4326')
+
+
+def test_localizar_pares_coincide_con_sjoin(poligonos):
+    rng = np.random.default_rng(3)
+    x = np.concatenate([-111.01 + rng.random(3000) * 0.08, [-110.99, -110.98]])   # incluye puntos en bordes
+    y = np.concatenate([28.99 + rng.random(3000) * 0.08, [29.005, 29.03]])
+    almacen = AlmacenPoligonos(poligonos, construir_indice_grid(np.asarray(poligonos.geometry.values), celdas=4))
+
+    idx_punto, idx_poligono = almacen.localizar_pares(x, y)
+
+    puntos = gpd.GeoDataFrame(geometry=[Point(a, b) for a, b in zip(x, y)], crs=poligonos.crs)
+    unidos = gpd.sjoin(puntos, poligonos, predicate='within')
+    esperado = pd.DataFrame({'punto': unidos.index, 'poligono': unidos['index_right']}).sort_values(['punto', 'poligono'])
+    np.testing.assert_array_equal(idx_punto, esperado['punto'].to_numpy())
+    np.testing.assert_array_equal(idx_poligono, esperado['poligono'].to_numpy())
+
+
+def test_localizar_indices_primer_poligono(poligonos):
+    almacen = AlmacenPoligonos(poligonos, construir_indice_grid(np.asarray(poligonos.geometry.values)))
+    # Dentro de la colonia anidada (gana el cuadro, que va antes) y fuera de todo
+    resultado = almacen.localizar_indices((np.array([-110.994, -112.0]), np.array([29.006, 29.0])))
+    np.testing.assert_array_equal(resultado, [0, -1])
+
+
+@pytest.mark.parametrize('claves', [
+    np.arange(2603000016735, 2603000016772, dtype=np.int64),     # enteras de 13 dígitos
+    [f'COL{i:02d}' for i in range(37)],                          # texto
+])
+def test_locate_conserva_tipo_de_clave(poligonos, claves):
+    poligonos = poligonos.assign(CVE_COL=claves)
+    almacen = AlmacenPoligonos(poligonos, construir_indice_grid(np.asarray(poligonos.geometry.values)))
+
+    resultado = almacen.locate((np.array([-110.994, -112.0, -110.955]), np.array([29.006, 29.0, 29.055])))
+
+    assert resultado[0] == claves[0]
+    assert resultado[2] == claves[34]
+    assert pd.isna(resultado[1])
+    assert resultado.dtype.kind != 'f'
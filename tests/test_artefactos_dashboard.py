@@ -0,0 +1,39 @@
+import os
+
+import pandas as pd
+
+from artefactos_dashboard import cargar_artefactos, guardar_artefactos, version_incidentes
+from cubo_incidentes import CuboIncidentes
+from datos_unificados import INCIDENTES
+from indice_incidentes import IndiceIncidentes
+
+
+def test_artefactos_sin_fechas_ida_y_vuelta(incidentes, tmp_path):
+    incidentes['Timestamp'] = pd.NaT
+    cubo = CuboIncidentes.desde_incidentes(incidentes)
+    indice = IndiceIncidentes.desde_incidentes(incidentes)
+    guardar_artefactos(cubo, indice, 'v', tmp_path)
+
+    cargados = cargar_artefactos('v', tmp_path)
+    assert cargados is not None
+    cubo_cargado, indice_cargado = cargados
+    assert len(cubo_cargado.dias) == 0
+    assert indice_cargado.n == len(incidentes)
+    serie, _ = cubo_cargado.serie_temporal()
+    assert serie.empty
+
+
+def test_version_incidentes_depende_del_contenido(tmp_path):
+    csv = tmp_path / f'{INCIDENTES}.csv'
+    csv.write_text('a,b\n1,2\n', encoding='utf-8')
+    for parquet in ('incidentes_hechos.parquet', 'incidentes_dim_categoria.parquet'):
+        (tmp_path / parquet).write_bytes(parquet.encode())
+    version = version_incidentes(tmp_path)
+
+    # Tocar los archivos no cambia la versión
+    for ruta in tmp_path.iterdir():
+        os.utime(ruta, (0, 0))
+    assert version_incidentes(tmp_path) == version
+
+    (tmp_path / 'incidentes_hechos.parquet').write_bytes(b'otro contenido')
+    assert version_incidentes(tmp_path) != version
@@ -0,0 +1,135 @@
+import base64
+import re
+
+import folium
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import box
+
+from mapa_interactivo_folium_avanzado import (ORDEN_DESCARTE, CapasPoligonos, _codificar_conteos,
+                                              agregar_filtros_temporales, cubo_filtros)
+
+
+def decodificar(cubo):
+    """Conteos planos (uno por celda de cubo['forma']) a partir del dict de cubo_filtros"""
+    def arreglo(clave, tipo):
+        return np.frombuffer(base64.b64decode(cubo[clave]), dtype=np.dtype(tipo).newbyteorder('<'))
+
+    n = int(np.prod(cubo['forma']))
+    conteos = arreglo('conteos', cubo['tipo'])
+    if 'celdas' in cubo:
+        celdas = arreglo('celdas', 'uint32')
+    elif 'mascara' in cubo:
+        bits = np.unpackbits(arreglo('mascara', 'uint8'), bitorder='little')[:n]
+        celdas = np.flatnonzero(bits)
+    else:
+        return conteos.astype(np.int64)
+    denso = np.zeros(n, dtype=np.int64)
+    denso[celdas] = conteos
+    return denso
+
+
+@pytest.fixture
+def datos():
+    rng = np.random.default_rng(7)
+    n = 4000
+    poligonos = pd.DataFrame({'CVE_COL': [f'P{i:03d}' for i in range(40)]})
+    ts = pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.integers(0, 4 * 365, n), unit='D')
+    incidentes = pd.DataFrame({
+        # Algunos incidentes fuera de los polígonos
+        'CVE_COL': rng.choice(list(poligonos['CVE_COL']) + ['FUERA'], n),
+        'Año': ts.year,
+        'Trimestre': ts.quarter,
+        'Categoria_Incidente': rng.choice(['VIOLENCIA', 'CONVIVENCIA', 'RESCATE', None], n),
+        'Nivel_Severidad': rng.choice(['ALTA', 'MEDIA', 'BAJA'], n),
+    })
+    return poligonos, incidentes
+
+
+@pytest.mark.parametrize('ocupacion', [1.0, 0.2, 0.001])
+def test_codificar_conteos_ida_y_vuelta(ocupacion):
+    rng = np.random.default_rng(0)
+    conteo = np.where(rng.random(50_000) < ocupacion, rng.integers(1, 300, 50_000), 0)
+    arreglos, tamaño = _codificar_conteos(conteo)
+    cubo = dict(arreglos, forma=[len(conteo)])
+    np.testing.assert_array_equal(decodificar(cubo), conteo)
+    assert arreglos['tipo'] == 'uint16'
+    # Elige la representación más chica
+    esperado = {1.0: 'denso', 0.2: 'mascara', 0.001: 'celdas'}[ocupacion]
+    elegido = 'celdas' if 'celdas' in arreglos else 'mascara' if 'mascara' in arreglos else 'denso'
+    assert elegido == esperado
+
+
+def test_cubo_completo_coincide_con_groupby(datos):
+    poligonos, incidentes = datos
+    cubo = cubo_filtros(poligonos, incidentes)
+    assert cubo['descartadas'] == []
+    assert [d for d, _ in cubo['dims']] == ['año', 'trimestre', 'categoria', 'severidad']
+
+    conteos = decodificar(cubo).reshape(cubo['forma'])
+    etiquetas = dict(cubo['dims'])
+    # Categoría sin dato: bucket None al final, solo cuenta con el filtro en "todas"
+    assert etiquetas['categoria'][-1] is None
+
+    dentro = incidentes[incidentes['CVE_COL'] != 'FUERA']
+    esperado = dentro.groupby(['CVE_COL', 'Año', 'Trimestre', 'Categoria_Incidente', 'Nivel_Severidad']).size()
+    for (cve, año, trimestre, categoria, severidad), n in esperado.items():
+        p = poligonos.index[poligonos['CVE_COL'] == cve][0]
+        celda = (p, etiquetas['año'].index(str(año)), etiquetas['trimestre'].index(str(trimestre)),
+                 etiquetas['categoria'].index(categoria), etiquetas['severidad'].index(severidad))
+        assert conteos[celda] == n
+    totales = dentro['CVE_COL'].value_counts().reindex(poligonos['CVE_COL'], fill_value=0)
+    np.testing.assert_array_equal(conteos.reshape(len(poligonos), -1).sum(axis=1), totales.to_numpy())
+
+
+def test_presupuesto_descarta_dimensiones_en_orden(datos):
+    poligonos, incidentes = datos
+    completo = cubo_filtros(poligonos, incidentes)
+    presupuesto = completo['bytes'] // 3
+
+    assert cubo_filtros(poligonos, incidentes, presupuesto=completo['bytes'])['descartadas'] == []
+    with pytest.warns(UserWarning, match='presupuesto'):
+        cubo = cubo_filtros(poligonos, incidentes, presupuesto=presupuesto)
+
+    assert cubo['bytes'] <= presupuesto
+    assert cubo['descartadas'] == ORDEN_DESCARTE[:len(cubo['descartadas'])]
+    assert 'trimestre' in cubo['descartadas']
+    assert [d for d, _ in cubo['dims']] == [d for d, _ in completo['dims'] if d not in cubo['descartadas']]
+    # Los totales por polígono no dependen de las dimensiones que queden
+    np.testing.assert_array_equal(
+        decodificar(cubo).reshape(len(poligonos), -1).sum(axis=1),
+        decodificar(completo).reshape(len(poligonos), -1).sum(axis=1))
+
+
+def test_sin_fecha_ni_categoria_opciones_coinciden_con_etiquetas():
+    poligonos = gpd.GeoDataFrame({'CVE_COL': ['A', 'B']}, geometry=[box(0, 0, 1, 1), box(1, 0, 2, 1)])
+    ts = pd.Series(pd.to_datetime(['2021-03-01', '2022-07-15', None, '2021-11-30']))
+    incidentes = pd.DataFrame({
+        'CVE_COL': ['A', 'B', 'A', 'B'],
+        'Año': ts.dt.year,              # float con NaN por el NaT
+        'Trimestre': ts.dt.quarter,
+        'Categoria_Incidente': ['VIOLENCIA', np.nan, 'RESCATE', 'VIOLENCIA'],
+        'Nivel_Severidad': ['ALTA', 'BAJA', 'MEDIA', 'ALTA'],
+    })
+    cubo = cubo_filtros(poligonos, incidentes)
+    etiquetas = dict(cubo['dims'])
+    assert etiquetas['año'] == ['2021', '2022', None]
+    assert etiquetas['trimestre'] == ['1', '3', '4', None]
+    assert etiquetas['categoria'] == ['RESCATE', 'VIOLENCIA', None]
+
+    # El panel se arma sin ordenar valores mezclados y sus opciones son las etiquetas del cubo
+    m = folium.Map()
+    CapasPoligonos(poligonos, {}).add_to(m)
+    agregar_filtros_temporales(m, incidentes, poligonos)
+    html = m.get_root().html.render()
+    for nombre in ['año', 'trimestre', 'categoria', 'severidad']:
+        select = re.search(rf'<select id="filtro-{nombre}".*?</select>', html, re.S).group(0)
+        valores = re.findall(r'<option value="([^"]*)"', select)[1:]
+        assert valores == [e for e in etiquetas[nombre] if e is not None]
+
+    # Elegir 2021 cuenta los incidentes de ese año (el NaT solo entra en "todos")
+    conteos = decodificar(cubo).reshape(cubo['forma'])
+    np.testing.assert_array_equal(conteos[:, 0].reshape(2, -1).sum(axis=1), [1, 1])
+    np.testing.assert_array_equal(conteos.reshape(2, -1).sum(axis=1), [2, 2])
@@ -0,0 +1,24 @@
+import pandas as pd
+
+from datos_unificados import (COLUMNAS_INCIDENTES, cargar_incidentes_unificados, compactar_incidentes,
+                              expandir_incidentes, guardar_incidentes_compactos)
+
+
+def como_objetos(df):
+    return df[COLUMNAS_INCIDENTES].astype(object).where(df[COLUMNAS_INCIDENTES].notna(), None)
+
+
+def test_compactar_y_expandir_ida_y_vuelta(incidentes):
+    hechos, dimensiones = compactar_incidentes(incidentes)
+    assert len(dimensiones['ubicacion']) == incidentes[['CVE_COL', 'LATITUD', 'LONGITUD']].drop_duplicates().shape[0]
+    assert all(hechos[c].dtype.itemsize <= 2 for c in hechos.columns if c.startswith('id_'))
+
+    expandido = expandir_incidentes(hechos, dimensiones)
+    pd.testing.assert_frame_equal(como_objetos(expandido), como_objetos(incidentes))
+    pd.testing.assert_series_equal(expandido['Timestamp'], incidentes['Timestamp'])
+
+
+def test_guardar_y_cargar_compactos(incidentes, tmp_path):
+    assert guardar_incidentes_compactos(incidentes, tmp_path)
+    cargados = cargar_incidentes_unificados(tmp_path)
+    pd.testing.assert_frame_equal(como_objetos(cargados), como_objetos(incidentes))
@@ -0,0 +1,58 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cubo_incidentes import seleccionar_dias
+from indice_incidentes import IndiceIncidentes, rangos_dias
+
+
+def mascara_esperada(incidentes, dias, año, mes, hora, categoria, severidad, rango_dias):
+    ts = incidentes['Timestamp']
+    m = np.ones(len(incidentes), dtype=bool)
+    if rango_dias is not None:
+        dia = (ts.dt.normalize() - dias[0]).dt.days
+        m &= ((dia >= rango_dias[0]) & (dia <= rango_dias[1])).to_numpy()
+    for valor, columna in [(año, ts.dt.year), (mes, ts.dt.month), (hora, ts.dt.hour),
+                           (categoria, incidentes['Categoria_Incidente']),
+                           (severidad, incidentes['Nivel_Severidad'])]:
+        if valor not in ('todos', 'todas'):
+            m &= (columna == valor).to_numpy()
+    return m
+
+
+@pytest.mark.parametrize('año,mes,hora,categoria,severidad,rango_dias', list(itertools.product(
+    ['todos', 2021], ['todos', 3], ['todas', 5], ['todas', 'VIOLENCIA'], ['todas', 'ALTA'],
+    [None, (0, 400), (100, 250)])))
+def test_filtrar_coincide_con_mascara(incidentes, año, mes, hora, categoria, severidad, rango_dias):
+    indice = IndiceIncidentes.desde_incidentes(incidentes)
+    filas = indice.filtrar(año=año, mes=mes, hora=hora, categoria=categoria, severidad=severidad,
+                           rango_dias=rango_dias)
+    esperado = mascara_esperada(incidentes, indice.dias, año, mes, hora, categoria, severidad, rango_dias)
+    np.testing.assert_array_equal(filas, np.flatnonzero(esperado))
+
+
+def test_incidentes_sin_fecha_solo_sin_filtro_de_fechas(incidentes):
+    indice = IndiceIncidentes.desde_incidentes(incidentes)
+    sin_fecha = np.flatnonzero(incidentes['Timestamp'].isna().to_numpy())
+    assert len(sin_fecha) > 0
+    # El rango que cubre todos los días equivale a no filtrar por fecha
+    assert np.isin(sin_fecha, indice.filtrar()).all()
+    assert np.isin(sin_fecha, indice.filtrar(rango_dias=(0, len(indice.dias) - 1))).all()
+    assert not np.isin(sin_fecha, indice.filtrar(rango_dias=(0, len(indice.dias) - 2))).any()
+    assert not np.isin(sin_fecha, indice.filtrar(año=2021)).any()
+
+
+@pytest.mark.parametrize('año,mes,dia,rango_dias', list(itertools.product(
+    ['todos', 2020, 2021, 2022], ['todos', 2, 12], ['todos', 31], [None, (10, 300), (200, 100)])))
+def test_rangos_dias_coinciden_con_mascara_de_dias(año, mes, dia, rango_dias):
+    dias = pd.date_range('2021-01-01', '2022-05-15', freq='D')
+    rangos = rangos_dias(dias, año, mes, dia, rango_dias)
+    if rangos is None:
+        assert rango_dias is None and (año, mes, dia) == ('todos', 'todos', 'todos')
+        return
+    cubiertos = np.zeros(len(dias), dtype=bool)
+    for inicio, fin in rangos:
+        cubiertos[inicio:fin] = True
+    np.testing.assert_array_equal(cubiertos, seleccionar_dias(dias, año, mes, dia, rango_dias))